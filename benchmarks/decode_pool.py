@@ -0,0 +1,118 @@
+"""
+Throughput of decoding transactions in the decode pool with an increasing number of worker processes.
+
+Each transaction inserts 200 rows of 10 columns spread over 4 tables. Decoding in the main process with a
+ChangeTransformer is the baseline, the pool returns the same change events in commit order. Run with:
+
+    python benchmarks/decode_pool.py
+"""
+import time
+import typing
+from datetime import datetime, timezone
+
+from pypgoutput.reader import (
+    ChangeTransformer,
+    ColumnDefinition,
+    DecodeJob,
+    DecodePool,
+    ReplicationMessage,
+    SchemaRegistry,
+    TableSchema,
+    Transaction,
+    TransactionBatch,
+)
+
+N_TABLES = 4
+N_COLUMNS = 10
+ROWS_PER_TRANSACTION = 200
+N_TRANSACTIONS = 200
+WORKERS = (1, 2, 4)
+
+
+def make_schema(relation_id: int) -> TableSchema:
+    columns = [ColumnDefinition(name="id", part_of_pkey=True, type_id=23, type_name="integer", optional=False)]
+    for idx in range(1, N_COLUMNS):
+        columns.append(
+            ColumnDefinition(
+                name=f"col_{idx}", part_of_pkey=False, type_id=1184, type_name="timestamp with time zone", optional=True
+            )
+        )
+    return TableSchema(
+        column_definitions=columns,
+        db="bench",
+        schema_name="public",
+        table=f"table_{relation_id}",
+        relation_id=relation_id,
+    )
+
+
+def make_insert(relation_id: int, row_id: int) -> ReplicationMessage:
+    values = [str(row_id).encode("utf-8")] + [b"2022-01-14 17:22:10.298334+00"] * (N_COLUMNS - 1)
+    payload = b"I" + relation_id.to_bytes(4, "big") + b"N" + N_COLUMNS.to_bytes(2, "big")
+    payload += b"".join(b"t" + len(value).to_bytes(4, "big") + value for value in values)
+    return ReplicationMessage(
+        data_start=row_id,
+        payload=payload,
+        send_time=datetime.now(timezone.utc),
+        data_size=len(payload),
+        wal_end=row_id,
+    )
+
+
+def make_jobs(schemas: typing.Dict[int, TableSchema]) -> typing.List[DecodeJob]:
+    schema_registry = SchemaRegistry()
+    for table_schema in schemas.values():
+        schema_registry.register(table_schema)
+    jobs = []
+    for tx_id in range(N_TRANSACTIONS):
+        transaction = Transaction(tx_id=tx_id, begin_lsn=tx_id, commit_ts=datetime.now(timezone.utc))
+        job = DecodeJob(transaction=transaction)
+        for row_id in range(ROWS_PER_TRANSACTION):
+            job.add(message=make_insert(row_id % N_TABLES + 1, row_id), schema_registry=schema_registry)
+        job.commit = TransactionBatch(
+            xid=tx_id, begin_lsn=tx_id, commit_lsn=tx_id, end_lsn=tx_id, commit_ts=transaction.commit_ts
+        )
+        jobs.append(job)
+    return jobs
+
+
+def bench_sequential(jobs: typing.List[DecodeJob], schemas: typing.Dict[int, TableSchema]) -> float:
+    transformer = ChangeTransformer()
+    for table_schema in schemas.values():
+        transformer.set_table_schema(table_schema)
+    start = time.perf_counter()
+    n_events = 0
+    for job in jobs:
+        for message in job.messages:
+            n_events += len(list(transformer.process_change(message=message, transaction=job.transaction)))
+    return n_events / (time.perf_counter() - start)
+
+
+def bench_pool(jobs: typing.List[DecodeJob], workers: int) -> float:
+    pool = DecodePool(workers=workers)
+    # start the workers before measuring
+    pool.executor.submit(time.sleep, 0).result()
+    start = time.perf_counter()
+    n_events = 0
+    for job in jobs:
+        pool.submit(job=job)
+        for _, events in pool.completed():
+            n_events += len(events)
+    for _, events in pool.completed(block=True):
+        n_events += len(events)
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+    return n_events / elapsed
+
+
+def main() -> None:
+    schemas = {relation_id: make_schema(relation_id) for relation_id in range(1, N_TABLES + 1)}
+    jobs = make_jobs(schemas)
+    print(f"{'decoder':>12} {'events/s':>10}")
+    print(f"{'sequential':>12} {bench_sequential(jobs, schemas):>10.0f}")
+    for workers in WORKERS:
+        print(f"{f'{workers} workers':>12} {bench_pool(jobs, workers):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
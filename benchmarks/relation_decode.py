@@ -0,0 +1,39 @@
+"""
+Micro-benchmark of Relation message decoding time by number of columns.
+
+Relation messages are sent after every DDL change and on every reconnect, wide tables make the column name string
+reads the dominant cost. Run with:
+
+    python benchmarks/relation_decode.py
+"""
+import struct
+import timeit
+
+from pypgoutput import decoders
+
+COLUMN_COUNTS = [10, 100, 1600]  # 1600 is the maximum number of columns of a PostgreSQL table
+
+
+def build_relation_message(n_columns: int) -> bytes:
+    message = bytearray(b"R")
+    message += struct.pack("!i", 16385)
+    message += b"public\x00wide_table_with_a_long_name\x00d"
+    message += struct.pack("!h", n_columns)
+    for idx in range(n_columns):
+        message += struct.pack("!b", 1 if idx == 0 else 0)
+        message += f"column_name_number_{idx}".encode("utf-8") + b"\x00"
+        message += struct.pack("!ii", 23, -1)
+    return bytes(message)
+
+
+def main() -> None:
+    print(f"{'columns':>8} {'bytes':>8} {'decode (us)':>12} {'per column (ns)':>16}")
+    for n_columns in COLUMN_COUNTS:
+        message = build_relation_message(n_columns)
+        number = max(10, 20000 // n_columns)
+        best = min(timeit.repeat(lambda: decoders.Relation(message), number=number, repeat=5)) / number
+        print(f"{n_columns:>8} {len(message):>8} {best * 1e6:>12.1f} {best * 1e9 / n_columns:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
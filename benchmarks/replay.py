@@ -0,0 +1,38 @@
+"""
+Decode throughput of replaying a capture file, written by a reader started with capture_path, without a database.
+
+Replays the capture in this process and with a decode pool, with ChangeEvents and CompactChangeEvents. Run with:
+
+    python benchmarks/replay.py capture.pgo [workers]
+"""
+import sys
+import time
+import typing
+
+from pypgoutput import ReplayReader
+
+
+def bench(path: str, **kwargs: typing.Any) -> typing.Tuple[int, float]:
+    reader = ReplayReader(path=path, **kwargs)
+    start = time.perf_counter()
+    n_events = sum(1 for _ in reader)
+    return n_events, time.perf_counter() - start
+
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    path = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    print(f"{'replay':>24} {'events':>8} {'events/s':>10}")
+    for name, kwargs in (
+        ("ChangeEvent", {}),
+        ("CompactChangeEvent", {"compact_events": True}),
+        (f"{workers} decode workers", {"compact_events": True, "decode_workers": workers}),
+    ):
+        n_events, elapsed = bench(path, **kwargs)
+        print(f"{name:>24} {n_events:>8} {n_events / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
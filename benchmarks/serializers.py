@@ -0,0 +1,98 @@
+"""
+Micro-benchmark of encoding a batch of change events for a sink.
+
+Compares pydantic's ChangeEvent.json() per event with the serializers encoding CompactChangeEvents: JSON Lines (orjson
+when installed, json otherwise), MessagePack when msgpack is installed and Avro. Rows have 12 columns of common types.
+Run with:
+
+    python benchmarks/serializers.py
+"""
+import timeit
+import typing
+from datetime import datetime, timezone
+
+from pypgoutput.reader import (
+    ChangeTransformer,
+    ColumnDefinition,
+    CompactChangeEvent,
+    ReplicationMessage,
+    TableSchema,
+    Transaction,
+)
+from pypgoutput.serializers import (
+    AvroSerializer,
+    JsonLinesSerializer,
+    MsgpackSerializer,
+)
+
+# (type_id, type_name, text value)
+COLUMN_TYPES = [
+    (23, "integer", b"123456"),
+    (1700, "numeric(10,2)", b"10.20"),
+    (1184, "timestamp with time zone", b"2022-01-14 17:22:10.298334+00"),
+    (25, "text", b"some text value"),
+]
+REPEAT_COLUMNS = 3
+BATCH_SIZE = 1000
+
+
+def build_events(compact_events: bool) -> typing.Tuple[ChangeTransformer, typing.List[typing.Any]]:
+    columns: typing.List[ColumnDefinition] = []
+    payload = b""
+    for idx in range(REPEAT_COLUMNS):
+        for type_id, type_name, value in COLUMN_TYPES:
+            name = f"column_{len(columns)}"
+            part_of_pkey = idx == 0 and type_id == 23
+            columns.append(
+                ColumnDefinition(
+                    name=name, part_of_pkey=part_of_pkey, type_id=type_id, type_name=type_name, optional=True
+                )
+            )
+            payload += b"t" + len(value).to_bytes(4, "big") + value
+    payload = b"I\x00\x00@\x01N" + len(columns).to_bytes(2, "big") + payload
+    transformer = ChangeTransformer(compact_events=compact_events)
+    transformer.set_table_schema(
+        TableSchema(column_definitions=columns, db="bench", schema_name="public", table="events", relation_id=16385)
+    )
+    transaction = Transaction(tx_id=1, begin_lsn=1, commit_ts=datetime.now(timezone.utc))
+    events = []
+    for idx in range(BATCH_SIZE):
+        message = ReplicationMessage(
+            data_start=idx,
+            payload=payload,
+            send_time=datetime.now(timezone.utc),
+            data_size=len(payload),
+            wal_end=idx,
+        )
+        events.append(transformer.process_insert(message=message, transaction=transaction))
+    return transformer, events
+
+
+def main() -> None:
+    _, change_events = build_events(compact_events=False)
+    transformer, events = build_events(compact_events=True)
+    compact_events = typing.cast(typing.List[CompactChangeEvent], events)
+    json_lines = JsonLinesSerializer(schema_registry=transformer.schema_registry)
+    json_lines_stdlib = JsonLinesSerializer(schema_registry=transformer.schema_registry)
+    json_lines_stdlib.use_orjson = False
+    avro = AvroSerializer(schema_registry=transformer.schema_registry)
+
+    results = [
+        ("ChangeEvent.json()", lambda: [event.json() for event in change_events]),
+        (f"json lines ({'orjson' if json_lines.use_orjson else 'json'})", lambda: json_lines.encode(compact_events)),
+        ("json lines (json)", lambda: json_lines_stdlib.encode(compact_events)),
+        ("avro", lambda: avro.encode(compact_events)),
+    ]
+    try:
+        packer = MsgpackSerializer(schema_registry=transformer.schema_registry)
+        results.append(("msgpack", lambda: packer.encode(compact_events)))
+    except ImportError:
+        pass  # msgpack is not installed
+    print(f"{'serializer':>20} {'us/event':>9}")
+    for name, encode in results:
+        seconds = min(timeit.repeat(encode, number=5, repeat=5)) / 5
+        print(f"{name:>20} {seconds / BATCH_SIZE * 1e6:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
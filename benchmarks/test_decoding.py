@@ -0,0 +1,136 @@
+"""
+Offline decoder benchmark suite on synthetic pgoutput streams, with pytest-benchmark.
+
+Each scenario is a SyntheticStream of 10 transactions: narrow and wide tables, NULLs, unchanged TOASTed values of
+updated rows with REPLICA IDENTITY FULL and a mix of operations over several tables. Every scenario is measured at
+the stages of the pipeline: decoding the messages only (eagerly and lazily), decoding and mapping the tuples to
+dicts, building change events and replaying a capture file through the reader. Run with:
+
+    make bench-suite
+
+which saves the results in .benchmarks/ and compares them with the previous run, to track regressions across commits.
+"""
+import pathlib
+import typing
+from datetime import datetime, timezone
+
+import pytest
+
+from pypgoutput import ReplayReader, decoders
+from pypgoutput.converters import RowConverter
+from pypgoutput.reader import ChangeTransformer, Transaction, map_tuple_to_dict
+from pypgoutput.synthetic import SyntheticStream
+from pypgoutput.transport import RingMessage
+
+pytest.importorskip("pytest_benchmark")
+
+N_TRANSACTIONS = 10
+SCENARIOS: typing.Dict[str, typing.Dict[str, typing.Any]] = {
+    "narrow": dict(n_columns=5, value_size=16),
+    "wide": dict(n_columns=50, value_size=64),
+    "nulls": dict(n_columns=20, null_ratio=0.5),
+    "toast": dict(n_columns=20, value_size=256, toast_ratio=0.8, ops={"U": 1}, replica_identity_full=True),
+    "mixed": dict(n_columns=10, n_tables=4, ops={"I": 6, "U": 3, "D": 1}),
+}
+CHANGE_DECODERS: typing.Dict[str, typing.Type[decoders.PgoutputMessage]] = {
+    "I": decoders.Insert,
+    "U": decoders.Update,
+    "D": decoders.Delete,
+    "T": decoders.Truncate,
+}
+TRANSACTION = Transaction(tx_id=1, begin_lsn=1, commit_ts=datetime(2022, 1, 14, tzinfo=timezone.utc))
+
+
+def make_stream(scenario: str) -> SyntheticStream:
+    return SyntheticStream(transaction_size=100, **SCENARIOS[scenario])
+
+
+def change_payloads(stream: SyntheticStream) -> typing.List[bytes]:
+    return [payload for payload in stream.messages(N_TRANSACTIONS) if payload[:1] in (b"I", b"U", b"D", b"T")]
+
+
+def row_tuples(
+    messages: typing.Iterable[decoders.PgoutputMessage],
+) -> typing.Iterator[typing.Tuple[int, typing.Union[decoders.TupleData, decoders.LazyTupleData]]]:
+    """Relation id and the new tuple, or the old tuple of Deletes, of the messages with tuple data"""
+    for message in messages:
+        tuple_data = getattr(message, "new_tuple", None) or getattr(message, "old_tuple", None)
+        if tuple_data is not None:
+            yield getattr(message, "relation_id"), tuple_data
+
+
+@pytest.fixture(params=list(SCENARIOS))
+def scenario(request: pytest.FixtureRequest) -> str:
+    return str(request.param)
+
+
+@pytest.mark.parametrize("lazy", [False, True], ids=["eager", "lazy"])
+def test_decode(benchmark: typing.Any, scenario: str, lazy: bool) -> None:
+    payloads = change_payloads(make_stream(scenario))
+
+    def decode() -> int:
+        return len([CHANGE_DECODERS[chr(payload[0])](payload, lazy_tuples=lazy) for payload in payloads])
+
+    assert benchmark(decode) == N_TRANSACTIONS * 100
+
+
+def test_decode_map_tuple_to_dict(benchmark: typing.Any, scenario: str) -> None:
+    stream = make_stream(scenario)
+    schemas = {table_schema.relation_id: table_schema for table_schema in stream.table_schemas()}
+    payloads = change_payloads(stream)
+
+    def decode_map() -> int:
+        messages = [CHANGE_DECODERS[chr(payload[0])](payload) for payload in payloads]
+        rows = [
+            map_tuple_to_dict(tuple_data=tuple_data, relation=schemas[relation_id])
+            for relation_id, tuple_data in row_tuples(messages)
+        ]
+        return len(rows)
+
+    benchmark(decode_map)
+
+
+@pytest.mark.parametrize("lazy", [False, True], ids=["eager", "lazy"])
+def test_decode_row_converter(benchmark: typing.Any, scenario: str, lazy: bool) -> None:
+    stream = make_stream(scenario)
+    converters = {
+        table_schema.relation_id: RowConverter(columns=table_schema.column_definitions)
+        for table_schema in stream.table_schemas()
+    }
+    payloads = change_payloads(stream)
+
+    def decode_convert() -> int:
+        messages = [CHANGE_DECODERS[chr(payload[0])](payload, lazy_tuples=lazy) for payload in payloads]
+        rows = [converters[relation_id].convert(tuple_data) for relation_id, tuple_data in row_tuples(messages)]
+        return len(rows)
+
+    benchmark(decode_convert)
+
+
+@pytest.mark.parametrize("compact", [False, True], ids=["ChangeEvent", "CompactChangeEvent"])
+def test_change_events(benchmark: typing.Any, scenario: str, compact: bool) -> None:
+    stream = make_stream(scenario)
+    transformer = ChangeTransformer(compact_events=compact)
+    for table_schema in stream.table_schemas():
+        transformer.set_table_schema(table_schema)
+    messages = [RingMessage(idx, idx, 0, memoryview(payload)) for idx, payload in enumerate(change_payloads(stream))]
+
+    def transform() -> int:
+        return sum(
+            len(list(transformer.process_change(message=message, transaction=TRANSACTION))) for message in messages
+        )
+
+    assert benchmark(transform) >= N_TRANSACTIONS * 100
+
+
+def test_replay(benchmark: typing.Any, scenario: str, tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / f"{scenario}.pgo")
+    make_stream(scenario).write_capture(path=path, n_transactions=N_TRANSACTIONS)
+
+    def replay() -> int:
+        reader = ReplayReader(path=path, compact_events=True)
+        n_events = sum(1 for _ in reader)
+        reader.stop()
+        return n_events
+
+    assert benchmark(replay) >= N_TRANSACTIONS * 100
@@ -0,0 +1,124 @@
+"""
+Throughput of moving raw WAL payloads from the extractor process to the reader process.
+
+Compares the pipe transport (one frame per send, and batches of 100 frames as sent in batched mode, with pickled
+ReplicationMessages as sent before frames for reference) with the shared memory ring at 1KB and 64KB payloads. The consumer only touches the first byte of each payload,
+decoding is not measured. Run with:
+
+    python benchmarks/transport_throughput.py
+"""
+import multiprocessing
+import time
+from datetime import datetime
+from multiprocessing.connection import Connection
+
+from pypgoutput.reader import ReplicationMessage
+from pypgoutput.transport import SharedMemoryRing, decode_frames, encode_frame
+
+SCENARIOS = [(1024, 20000), (64 * 1024, 2000)]  # (payload size, number of messages)
+BATCH_SIZE = 100
+
+
+def make_message(idx: int, payload: bytes) -> ReplicationMessage:
+    return ReplicationMessage(
+        data_start=idx,
+        payload=payload,
+        send_time=datetime.now(),
+        data_size=len(payload),
+        wal_end=idx,
+    )
+
+
+def pickle_producer(conn: Connection, payload_size: int, n_messages: int) -> None:
+    payload = b"I" * payload_size
+    for idx in range(n_messages):
+        conn.send(make_message(idx, payload))
+
+
+def pipe_producer(conn: Connection, payload_size: int, n_messages: int, batch_size: int) -> None:
+    payload = b"I" * payload_size
+    now = int(time.time() * 1_000_000)
+    batch = []
+    for idx in range(n_messages):
+        batch.append(encode_frame(idx, idx, now, payload))
+        if len(batch) == batch_size:
+            conn.send_bytes(b"".join(batch))
+            batch = []
+    if batch:
+        conn.send_bytes(b"".join(batch))
+
+
+def ring_producer(ring_name: str, payload_size: int, n_messages: int) -> None:
+    ring = SharedMemoryRing(name=ring_name)
+    payload = b"I" * payload_size
+    now = int(time.time() * 1_000_000)
+    for idx in range(n_messages):
+        while not ring.try_write(idx, idx, now, payload):
+            time.sleep(0)
+    ring.close()
+
+
+def bench_pickle(payload_size: int, n_messages: int) -> float:
+    out_conn, in_conn = multiprocessing.Pipe(duplex=True)
+    producer = multiprocessing.Process(target=pickle_producer, args=(in_conn, payload_size, n_messages))
+    start = time.perf_counter()
+    producer.start()
+    for _ in range(n_messages):
+        assert out_conn.recv().payload[0] == ord("I")
+    elapsed = time.perf_counter() - start
+    producer.join()
+    return n_messages / elapsed
+
+
+def bench_pipe(payload_size: int, n_messages: int, batch_size: int) -> float:
+    out_conn, in_conn = multiprocessing.Pipe(duplex=True)
+    producer = multiprocessing.Process(target=pipe_producer, args=(in_conn, payload_size, n_messages, batch_size))
+    start = time.perf_counter()
+    producer.start()
+    received = 0
+    while received < n_messages:
+        for message in decode_frames(out_conn.recv_bytes()):
+            assert message.payload[0] == ord("I")
+            received += 1
+    elapsed = time.perf_counter() - start
+    producer.join()
+    return n_messages / elapsed
+
+
+def bench_ring(payload_size: int, n_messages: int) -> float:
+    ring = SharedMemoryRing(size=32 * 1024 * 1024)
+    producer = multiprocessing.Process(target=ring_producer, args=(ring.name, payload_size, n_messages))
+    start = time.perf_counter()
+    producer.start()
+    received = 0
+    while received < n_messages:
+        message = ring.read()
+        if message is None:
+            time.sleep(0)
+            continue
+        assert message.payload[0] == ord("I")
+        del message
+        received += 1
+    ring.release()
+    elapsed = time.perf_counter() - start
+    producer.join()
+    ring.close()
+    ring.unlink()
+    return n_messages / elapsed
+
+
+def main() -> None:
+    print(f"{'payload':>8} {'transport':>16} {'msg/s':>10} {'MB/s':>8}")
+    for payload_size, n_messages in SCENARIOS:
+        results = [
+            ("pipe pickled", bench_pickle(payload_size, n_messages)),
+            ("pipe", bench_pipe(payload_size, n_messages, batch_size=1)),
+            (f"pipe batches {BATCH_SIZE}", bench_pipe(payload_size, n_messages, batch_size=BATCH_SIZE)),
+            ("ring", bench_ring(payload_size, n_messages)),
+        ]
+        for transport, rate in results:
+            print(f"{payload_size // 1024:>6}KB {transport:>16} {rate:>10.0f} {rate * payload_size / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Micro-benchmark of converting the text values of a row to python values.
+
+Compares the OID keyed parsers of RowConverter with the previous path of mapping the tuple to a dict and validating it
+with a pydantic model created from the column type names (still used with strict_validation=True). Run with:
+
+    python benchmarks/type_parsers.py
+"""
+import timeit
+import typing
+
+import pydantic
+
+from pypgoutput import ColumnData, TupleData
+from pypgoutput.converters import RowConverter
+from pypgoutput.reader import ColumnDefinition, convert_pg_type_to_py_type
+
+# (type_id, type_name, text value)
+COLUMN_TYPES = [
+    (23, "integer", "123456"),
+    (20, "bigint", "9876543210"),
+    (1700, "numeric(10,2)", "10.20"),
+    (1184, "timestamp with time zone", "2022-01-14 17:22:10.298334+00"),
+    (25, "text", "some text value"),
+    (3802, "jsonb", '{"data": [1, 2, 3]}'),
+]
+REPEAT_COLUMNS = 5  # 30 columns per row
+
+
+def build_row() -> typing.Tuple[typing.List[ColumnDefinition], TupleData]:
+    columns: typing.List[ColumnDefinition] = []
+    column_data: typing.List[ColumnData] = []
+    for idx in range(REPEAT_COLUMNS):
+        for type_id, type_name, value in COLUMN_TYPES:
+            columns.append(
+                ColumnDefinition(
+                    name=f"column_{len(columns)}",
+                    part_of_pkey=idx == 0 and type_id == 23,
+                    type_id=type_id,
+                    type_name=type_name,
+                    optional=True,
+                )
+            )
+            column_data.append(ColumnData(col_data_category="t", col_data_length=len(value), col_data=value))
+    return columns, TupleData(n_columns=len(column_data), column_data=column_data)
+
+
+def main() -> None:
+    columns, tuple_data = build_row()
+    converter = RowConverter(columns=columns)
+    model = pydantic.create_model(
+        "BenchmarkModel",
+        **{c.name: (convert_pg_type_to_py_type(c.type_name), None) for c in columns},  # type: ignore[call-overload]
+    )
+
+    def pydantic_path() -> typing.Any:
+        raw = {c.name: d.col_data for c, d in zip(columns, tuple_data.column_data)}
+        return model(**raw)
+
+    number = 5000
+    print(f"{'converter':>10} {'row (us)':>10} {'per column (ns)':>16}")
+    for name, func in [("pydantic", pydantic_path), ("registry", lambda: converter.convert(tuple_data))]:
+        best = min(timeit.repeat(func, number=number, repeat=5)) / number
+        print(f"{name:>10} {best * 1e6:>10.1f} {best * 1e9 / len(columns):>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
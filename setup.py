@@ -27,4 +27,9 @@ setuptools.setup(
           'psycopg2',
           'pydantic',
     ],
+    extras_require={
+          'orjson': ['orjson'],
+          'msgpack': ['msgpack'],
+          'zstd': ['zstandard'],
+    },
 )
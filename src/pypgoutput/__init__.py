@@ -1,5 +1,7 @@
 import logging
 
+from pypgoutput.async_reader import AsyncLogicalReplicationReader
+from pypgoutput.checkpoint import CheckpointStore
 from pypgoutput.decoders import (
     Begin,
     ColumnData,
@@ -7,15 +9,32 @@ from pypgoutput.decoders import (
     Commit,
     Delete,
     Insert,
+    LazyTupleData,
     Origin,
     PgoutputMessage,
+    PgType,
     Relation,
+    StreamAbort,
+    StreamCommit,
+    StreamStart,
+    StreamStop,
     Truncate,
     TupleData,
     Update,
 )
-from pypgoutput.reader import ChangeEvent, ExtractRaw, LogicalReplicationReader
-from pypgoutput.utils import QueryError, SourceDBHandler
+from pypgoutput.filters import ChangeFilter
+from pypgoutput.metrics import CallbackSink, PrometheusSink, ReplicationMetrics
+from pypgoutput.profiling import StageProfiler
+from pypgoutput.reader import (
+    ChangeEvent,
+    CompactChangeEvent,
+    ExtractRaw,
+    LogicalReplicationReader,
+    SchemaRegistry,
+    TransactionBatch,
+)
+from pypgoutput.replay import ReplayReader
+from pypgoutput.utils import CatalogCache, QueryError, SourceDBHandler
 
 logging.getLogger("pypgoutput").addHandler(logging.NullHandler())
 
@@ -24,17 +43,35 @@ __all__ = [
     "Begin",
     "Commit",
     "Origin",
+    "PgType",
     "Relation",
     "TupleData",
+    "LazyTupleData",
     "Insert",
     "Update",
     "Delete",
     "Truncate",
+    "StreamStart",
+    "StreamStop",
+    "StreamCommit",
+    "StreamAbort",
     "ColumnData",
     "ColumnType",
     "SourceDBHandler",
+    "CatalogCache",
     "LogicalReplicationReader",
+    "AsyncLogicalReplicationReader",
     "QueryError",
     "ChangeEvent",
+    "CompactChangeEvent",
+    "SchemaRegistry",
+    "TransactionBatch",
     "ExtractRaw",
+    "ChangeFilter",
+    "CheckpointStore",
+    "ReplayReader",
+    "ReplicationMetrics",
+    "CallbackSink",
+    "PrometheusSink",
+    "StageProfiler",
 ]
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+import typing
+
+import psycopg2
+import psycopg2.extras
+
+from pypgoutput.reader import (
+    AnyChangeEvent,
+    FeedbackScheduler,
+    LogicalReplicationReader,
+    check_server_version,
+    replication_options,
+    start_replication,
+    transaction_end_lsn,
+)
+from pypgoutput.transport import RingMessage, datetime_to_micros
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLogicalReplicationReader(LogicalReplicationReader):
+    """
+    asyncio variant of LogicalReplicationReader, used with `async for event in reader`.
+
+    Streams, decodes and transforms in a single process: there is no ExtractRaw process and no pipe. Messages are
+    read from the replication connection without blocking, and when none are available the reader waits on the
+    connection's socket with an event loop reader callback instead of polling. The end LSN of a transaction is
+    confirmed once the consumer asks for the event after its last one, sent by a FeedbackScheduler like in the
+    batched transport, and recorded in the checkpoint with checkpoint_path. Requires an event loop with add_reader
+    support (the default on Unix).
+
+    Options are the same as for LogicalReplicationReader, except the transport options (batch_size,
+    batch_max_latency and shared_memory_size) which do not apply. decode_workers and capture_path need the extractor
+    process and raise a ValueError.
+    """
+
+    # seconds without server messages after which a keepalive status update is sent
+    keepalive_interval: float = 10.0
+
+    def setup(self) -> None:
+        if self.decode_workers:
+            raise ValueError(f"decode_workers is not supported by {type(self).__name__}")
+        if self.capture_path is not None:
+            raise ValueError(f"capture_path is not supported by {type(self).__name__}")
+        self.conn = psycopg2.extras.LogicalReplicationConnection(self.dsn)
+        self.cur = psycopg2.extras.ReplicationCursor(self.conn)
+        check_server_version(conn=self.conn, binary=self.binary, streaming=self.streaming)
+        options = replication_options(
+            publication_name=self.publication_name, binary=self.binary, streaming=self.streaming
+        )
+        start_replication(cur=self.cur, slot_name=self.slot_name, options=options, start_lsn=self.processed_lsn)
+        logger.info(f"Starting replication from slot: '{self.slot_name}'")
+        self.feedback = FeedbackScheduler(interval=self.feedback_interval, max_bytes=self.feedback_bytes)
+        self.events: typing.Iterator[AnyChangeEvent] = iter(())
+        self.setup_catalog()
+        self.setup_metrics()
+
+    def stop(self) -> None:
+        """Close the replication connection and the checkpoint"""
+        self.cur.close()
+        self.conn.close()
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+        if self.metrics is not None:
+            self.metrics.close()
+        if self.profiler is not None:
+            self.profiler.close()
+
+    @staticmethod
+    def to_raw_message(msg: psycopg2.extras.ReplicationMessage) -> RingMessage:
+        return RingMessage(msg.data_start, msg.wal_end, datetime_to_micros(msg.send_time), memoryview(msg.payload))
+
+    async def read_event(self) -> AnyChangeEvent:
+        while True:
+            event = next(self.events, None)
+            if event is not None:
+                return event
+            # the consumer asked for another event, so the transaction committed last was processed
+            if self.committed is not None:
+                self.feedback.processed(self.committed.end_lsn)
+                self.mark_processed(self.committed)
+                self.committed = None
+            self.feedback.maybe_send(self.cur)
+            msg = self.cur.read_message()
+            if msg is None:
+                self.flush_checkpoint()
+                if self.metrics is not None:
+                    self.metrics.maybe_report(time.monotonic())
+                await self.wait_for_data()
+                continue
+            end_lsn = transaction_end_lsn(msg.payload)
+            if end_lsn is not None:
+                self.feedback.sent_commit(end_lsn)
+            message = self.to_raw_message(msg)
+            if self.metrics is None:
+                self.events = iter(self.transform_message(msg=message))
+            else:
+                self.observe_received(message)
+                self.events = iter(self.measure_transform(msg=message))
+
+    async def wait_for_data(self) -> None:
+        """Wait until the connection is readable, sends a keepalive when nothing arrived for keepalive_interval"""
+        loop = asyncio.get_running_loop()
+        readable: "asyncio.Future[None]" = loop.create_future()
+
+        def on_readable() -> None:
+            if not readable.done():
+                readable.set_result(None)
+
+        timeout = self.keepalive_interval
+        keepalive = True
+        feedback_due = self.feedback.seconds_until_due(time.monotonic())
+        if feedback_due is not None:
+            keepalive = False
+            timeout = min(timeout, feedback_due)
+        fileno = self.conn.fileno()
+        loop.add_reader(fileno, on_readable)
+        try:
+            await asyncio.wait_for(readable, timeout=timeout)
+        except asyncio.TimeoutError:
+            if keepalive:
+                self.cur.send_feedback()  # no messages for a while, keep the connection alive
+        finally:
+            loop.remove_reader(fileno)
+
+    def __iter__(self) -> typing.Any:
+        raise TypeError(f"{type(self).__name__} is iterated with 'async for'")
+
+    def __aiter__(self) -> "AsyncLogicalReplicationReader":
+        return self
+
+    async def __anext__(self) -> AnyChangeEvent:
+        try:
+            return await self.read_event()
+        except Exception as err:
+            self.stop()
+            raise StopAsyncIteration from err
@@ -0,0 +1,178 @@
+import dataclasses
+import io
+import json
+import logging
+import struct
+import typing
+
+from pypgoutput.transport import FRAME_HEADER, RingMessage
+from pypgoutput.utils import CatalogCache, CatalogColumn
+
+try:
+    import zstandard
+except ImportError:  # optional, capture files can only be written and read uncompressed
+    zstandard = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# file header: magic, format version, compression of the records following the header
+CAPTURE_HEADER = struct.Struct("!6sBB")
+CAPTURE_MAGIC = b"PGOCAP"
+CAPTURE_VERSION = 1
+COMPRESSION_NONE = 0
+COMPRESSION_ZSTD = 1
+
+# every record starts with its type: a message is followed by a frame header (as in the shared memory ring) and the
+# payload, metadata and catalog records by the length of their JSON document and the document
+MESSAGE_RECORD = b"M"
+METADATA_RECORD = b"H"
+CATALOG_RECORD = b"C"
+JSON_LENGTH = struct.Struct("!i")
+
+READ_BUFFER_SIZE = 1024 * 1024
+
+
+class CapturedCatalog(CatalogCache):
+    """
+    Catalog cache answering from the catalog records of a capture file instead of the source database. A catalog
+    record is written before the Relation message it describes, so relations are resolved like in the live reader.
+    """
+
+    def __init__(self) -> None:
+        self.entries = dict()
+        self.loaded = dict()
+        self.captured: typing.Dict[int, typing.Dict[str, CatalogColumn]] = dict()
+
+    def add(self, relation_id: int, columns: typing.Sequence[CatalogColumn]) -> None:
+        self.captured[relation_id] = {column.name: column for column in columns}
+        self.entries.pop(relation_id, None)
+
+    def load(self, relation_id: int) -> typing.Dict[str, CatalogColumn]:
+        return self.captured.get(relation_id, dict())
+
+    def fallback_column(
+        self, table_schema: str, table_name: str, name: str, type_id: int, atttypmod: int
+    ) -> CatalogColumn:
+        # the capture has no catalog record matching the Relation message, there is no database to ask
+        return CatalogColumn(name=name, type_id=type_id, atttypmod=atttypmod, type_name="unknown", optional=True)
+
+
+class CaptureWriter:
+    """
+    Writes raw pgoutput messages with their data_start, wal_end and send time to a capture file, along with metadata
+    about the source and catalog records describing the columns of the relations. Records are length prefixed and
+    optionally compressed with zstd (requires zstandard).
+    """
+
+    def __init__(self, path: str, compress: bool = False, compression_level: int = 3) -> None:
+        if compress and zstandard is None:
+            raise ImportError("zstandard is required to write compressed capture files")
+        self.path = path
+        self.file = open(path, "wb")
+        compression = COMPRESSION_ZSTD if compress else COMPRESSION_NONE
+        self.file.write(CAPTURE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, compression))
+        self.stream: typing.BinaryIO = self.file
+        if compress:
+            self.stream = zstandard.ZstdCompressor(level=compression_level).stream_writer(self.file)
+        # records written since the last flush
+        self.dirty = False
+
+    def write_message(self, data_start: int, wal_end: int, send_time_micros: int, payload: bytes) -> None:
+        self.stream.write(MESSAGE_RECORD + FRAME_HEADER.pack(data_start, wal_end, send_time_micros, len(payload)))
+        self.stream.write(payload)
+        self.dirty = True
+
+    def write_json(self, record_type: bytes, document: typing.Dict[str, typing.Any]) -> None:
+        data = json.dumps(document).encode("utf-8")
+        self.stream.write(record_type + JSON_LENGTH.pack(len(data)) + data)
+        self.dirty = True
+
+    def write_metadata(self, **metadata: typing.Any) -> None:
+        self.write_json(METADATA_RECORD, metadata)
+
+    def write_catalog(self, relation_id: int, columns: typing.Sequence[CatalogColumn]) -> None:
+        self.write_json(
+            CATALOG_RECORD,
+            {"relation_id": relation_id, "columns": [dataclasses.astuple(column) for column in columns]},
+        )
+
+    def flush(self) -> None:
+        if self.dirty:
+            self.stream.flush()
+            self.file.flush()
+            self.dirty = False
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        self.flush()
+        # closing the zstd writer ends the frame and closes the file
+        self.stream.close()
+        self.file.close()
+
+
+class CaptureReader:
+    """
+    Reads a capture file, iterating yields its messages as RingMessages. Metadata records are collected in metadata
+    and catalog records are added to catalog as they are read, before the Relation messages they describe.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, "rb", buffering=0)
+        magic, version, compression = CAPTURE_HEADER.unpack(self.file.read(CAPTURE_HEADER.size))
+        if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+            raise ValueError(f"{path} is not a capture file of version {CAPTURE_VERSION}")
+        raw: typing.Any = self.file
+        if compression == COMPRESSION_ZSTD:
+            if zstandard is None:
+                raise ImportError("zstandard is required to read compressed capture files")
+            raw = zstandard.ZstdDecompressor().stream_reader(self.file)
+        elif compression != COMPRESSION_NONE:
+            raise ValueError(f"Unknown compression {compression} of capture file {path}")
+        self.stream = io.BufferedReader(raw, buffer_size=READ_BUFFER_SIZE)
+        self.metadata: typing.Dict[str, typing.Any] = dict()
+        self.catalog = CapturedCatalog()
+        # the metadata is written first, available before iterating
+        if self.stream.peek(1)[:1] == METADATA_RECORD:
+            self.stream.read(1)
+            self.metadata.update(self.read_json())
+
+    def read_json(self) -> typing.Dict[str, typing.Any]:
+        (length,) = JSON_LENGTH.unpack(self.stream.read(JSON_LENGTH.size))
+        document: typing.Dict[str, typing.Any] = json.loads(self.stream.read(length))
+        return document
+
+    def __iter__(self) -> typing.Iterator[RingMessage]:
+        read = self.stream.read
+        header_size = FRAME_HEADER.size
+        unpack_header = FRAME_HEADER.unpack
+        while True:
+            record_type = read(1)
+            if record_type == MESSAGE_RECORD:
+                header = read(header_size)
+                if len(header) < header_size:
+                    break
+                data_start, wal_end, send_time_micros, length = unpack_header(header)
+                payload = read(length)
+                if len(payload) < length:
+                    break
+                yield RingMessage(data_start, wal_end, send_time_micros, memoryview(payload))
+            elif record_type == CATALOG_RECORD:
+                document = self.read_json()
+                self.catalog.add(
+                    relation_id=document["relation_id"],
+                    columns=[CatalogColumn(*column) for column in document["columns"]],
+                )
+            elif record_type == METADATA_RECORD:
+                self.metadata.update(self.read_json())
+            elif not record_type:
+                return
+            else:
+                raise ValueError(f"Unknown record type {record_type!r} in capture file {self.path}")
+        # the capture was not closed cleanly
+        logger.warning(f"Capture file {self.path} ends with a partial message")
+
+    def close(self) -> None:
+        self.stream.close()
+        self.file.close()
@@ -0,0 +1,118 @@
+import logging
+import os
+import struct
+import time
+import typing
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# commit LSN and end LSN of a delivered transaction, followed by the CRC32 of both
+CHECKPOINT_RECORD = struct.Struct("!QQI")
+LSN_PAIR = struct.Struct("!QQ")
+
+
+class CheckpointStore:
+    """
+    Durable record of the last transaction fully delivered by the consumer, kept in an append-only file.
+
+    Each update appends a fixed size record, the last record with a valid checksum is the checkpoint, so a torn write
+    at a crash falls back to the previous record. Updates are group committed: record only keeps the position in
+    memory, it is written and fsynced once flush_interval seconds passed since the last flush, or on flush. Every
+    transaction recorded since the last flush is made durable by a single fsync. Once the file reaches max_size it is
+    replaced by a file holding only the last record.
+
+    commit_lsn is compared with the commit LSN of Begin messages to skip the transactions already delivered, end_lsn
+    is where replication restarts.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.1, max_size: int = 1024 * 1024) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_size = max(max_size, CHECKPOINT_RECORD.size)
+        # last recorded position, durable once flushed
+        self.commit_lsn = 0
+        self.end_lsn = 0
+        self.flushed_end_lsn = 0
+        self.last_flush = time.monotonic()
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self.size = self.load()
+
+    def load(self) -> int:
+        """Read the last valid record, a partially written record is cut off. Returns the size of the valid file"""
+        size = os.fstat(self.fd).st_size
+        valid_size = size - size % CHECKPOINT_RECORD.size
+        while valid_size:
+            record = os.pread(self.fd, CHECKPOINT_RECORD.size, valid_size - CHECKPOINT_RECORD.size)
+            commit_lsn, end_lsn, crc = CHECKPOINT_RECORD.unpack(record)
+            if zlib.crc32(record[: LSN_PAIR.size]) == crc:
+                self.commit_lsn = commit_lsn
+                self.end_lsn = self.flushed_end_lsn = end_lsn
+                break
+            logger.warning(f"Skipping corrupt record at offset {valid_size - CHECKPOINT_RECORD.size} of {self.path}")
+            valid_size -= CHECKPOINT_RECORD.size
+        if valid_size != size:
+            os.ftruncate(self.fd, valid_size)
+        return valid_size
+
+    def is_delivered(self, commit_lsn: int) -> bool:
+        """Whether the transaction committed at commit_lsn was recorded as delivered"""
+        return commit_lsn <= self.commit_lsn
+
+    def record(self, commit_lsn: int, end_lsn: int, now: typing.Optional[float] = None) -> bool:
+        """Record a delivered transaction, flushes if flush_interval passed since the last flush. Returns if flushed"""
+        if end_lsn <= self.end_lsn:
+            return False
+        self.commit_lsn = commit_lsn
+        self.end_lsn = end_lsn
+        now = time.monotonic() if now is None else now
+        if now - self.last_flush < self.flush_interval:
+            return False
+        self.flush(now=now)
+        return True
+
+    def flush(self, now: typing.Optional[float] = None) -> None:
+        """Write and fsync the last recorded position"""
+        self.last_flush = time.monotonic() if now is None else now
+        if self.end_lsn == self.flushed_end_lsn:
+            return
+        lsn_pair = LSN_PAIR.pack(self.commit_lsn, self.end_lsn)
+        record = lsn_pair + zlib.crc32(lsn_pair).to_bytes(4, "big")
+        if self.size + len(record) > self.max_size:
+            self.compact(record)
+        else:
+            os.write(self.fd, record)
+            os.fsync(self.fd)
+            self.size += len(record)
+        self.flushed_end_lsn = self.end_lsn
+
+    def compact(self, record: bytes) -> None:
+        """Replace the file by one holding only record"""
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, record)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, self.path)
+        # make the rename durable
+        dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        os.close(self.fd)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_APPEND)
+        self.size = len(record)
+
+    def close(self) -> None:
+        """Flush the last recorded position and close the file"""
+        if self.fd < 0:
+            return
+        self.flush()
+        os.close(self.fd)
+        self.fd = -1
+
+    def __repr__(self) -> str:
+        return f"CheckpointStore(path={self.path!r}, commit_lsn={self.commit_lsn}, end_lsn={self.end_lsn})"
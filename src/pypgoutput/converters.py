@@ -0,0 +1,505 @@
+import json
+import re
+import struct
+import typing
+import uuid
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from decimal import Decimal
+
+import pypgoutput.decoders as decoders
+
+# parses the text value of one column
+ColumnParser = typing.Callable[[str], typing.Any]
+# parses the value of one column in the binary send format of its type
+BinaryColumnParser = typing.Callable[[bytes], typing.Any]
+
+TIMESTAMP_PATTERN = re.compile(
+    r"(\d{4})-(\d\d)-(\d\d)[ T](\d\d):(\d\d):(\d\d)(?:\.(\d{1,6}))?(?:([+-])(\d\d)(?::?(\d\d))?(?::?(\d\d))?)?$"
+)
+TIME_PATTERN = re.compile(r"(\d\d):(\d\d):(\d\d)(?:\.(\d{1,6}))?(?:([+-])(\d\d)(?::?(\d\d))?(?::?(\d\d))?)?$")
+BYTEA_ESCAPE_PATTERN = re.compile(rb"\\(\\|[0-7]{3})")
+
+FLOAT4_STRUCT = struct.Struct("!f")
+FLOAT8_STRUCT = struct.Struct("!d")
+# ndigits, weight, sign, dscale
+NUMERIC_HEADER = struct.Struct("!hhHh")
+# ndim, has nulls flag, element type OID
+ARRAY_HEADER = struct.Struct("!iii")
+# dimension length, lower bound
+ARRAY_DIMENSION = struct.Struct("!ii")
+ARRAY_ELEMENT_LENGTH = struct.Struct("!i")
+NUMERIC_NEGATIVE = 0x4000
+NUMERIC_SPECIAL_VALUES = {0xC000: Decimal("NaN"), 0xD000: Decimal("Infinity"), 0xF000: Decimal("-Infinity")}
+# dates and times are sent relative to the PostgreSQL epoch
+PG_EPOCH = datetime(2000, 1, 1)
+PG_EPOCH_DATE = PG_EPOCH.date()
+# infinity and -infinity of timestamps (Int64) and dates (Int32) in binary format
+TIMESTAMP_INFINITY = {2**63 - 1: "infinity", -(2**63): "-infinity"}
+DATE_INFINITY = {2**31 - 1: "infinity", -(2**31): "-infinity"}
+
+
+class ColumnLike(typing.Protocol):
+    name: str
+    type_id: int
+    type_name: str
+    part_of_pkey: bool
+
+
+def parse_text(value: str) -> str:
+    return value
+
+
+def parse_bool(value: str) -> bool:
+    return value == "t"
+
+
+def parse_tz(
+    sign: typing.Optional[str], hours: str, minutes: typing.Optional[str], seconds: typing.Optional[str]
+) -> typing.Optional[tzinfo]:
+    if sign is None:
+        return None
+    offset = timedelta(hours=int(hours), minutes=int(minutes or 0), seconds=int(seconds or 0))
+    if not offset:
+        return timezone.utc
+    return timezone(-offset if sign == "-" else offset)
+
+
+def parse_timestamp(value: str) -> typing.Union[datetime, str]:
+    """
+    Parse the PostgreSQL text output of timestamp and timestamptz, e.g. '2020-01-01 00:00:00.5+00'. Values datetime
+    can't represent, infinity, -infinity, BC and years after 9999, are returned as the text value.
+    """
+    match = TIMESTAMP_PATTERN.match(value)
+    if match is None:
+        return value
+    year, month, day, hour, minute, second, fraction, tz_sign, tz_hour, tz_minute, tz_second = match.groups()
+    try:
+        return datetime(
+            int(year),
+            int(month),
+            int(day),
+            int(hour),
+            int(minute),
+            int(second),
+            int(fraction.ljust(6, "0")) if fraction else 0,
+            tzinfo=parse_tz(tz_sign, tz_hour, tz_minute, tz_second),
+        )
+    except ValueError:
+        return value
+
+
+def parse_date(value: str) -> typing.Union[date, str]:
+    """
+    Parse the PostgreSQL ISO text output of date, e.g. '2020-01-01'. Values date can't represent, infinity,
+    -infinity, BC and years after 9999, are returned as the text value.
+    """
+    if len(value) != 10:
+        return value
+    try:
+        return date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+    except ValueError:
+        return value
+
+
+def parse_time(value: str) -> typing.Union[time, str]:
+    """
+    Parse the PostgreSQL text output of time and timetz, e.g. '12:00:00.5' or '12:00:00+02'. 24:00:00, which time
+    can't represent, is returned as the text value.
+    """
+    match = TIME_PATTERN.match(value)
+    if match is None:
+        return value
+    hour, minute, second, fraction, tz_sign, tz_hour, tz_minute, tz_second = match.groups()
+    try:
+        return time(
+            int(hour),
+            int(minute),
+            int(second),
+            int(fraction.ljust(6, "0")) if fraction else 0,
+            tzinfo=parse_tz(tz_sign, tz_hour, tz_minute, tz_second),
+        )
+    except ValueError:
+        return value
+
+
+def _unescape_bytea(match: typing.Match[bytes]) -> bytes:
+    escaped = match.group(1)
+    return b"\\" if escaped == b"\\" else bytes([int(escaped, 8)])
+
+
+def parse_bytea(value: str) -> bytes:
+    """Parse bytea in the default hex output format, e.g. '\\x0102', the legacy escape format is also supported"""
+    if value[:2] == "\\x":
+        return bytes.fromhex(value[2:])
+    return BYTEA_ESCAPE_PATTERN.sub(_unescape_bytea, value.encode("utf-8"))
+
+
+def parse_array_elements(value: str) -> typing.List[typing.Optional[str]]:
+    """
+    Split the text output of a one dimensional array, e.g. '{1,NULL,"a b"}', into the text values of the elements.
+    Unquoted NULL is a null element, quoted elements may contain backslash escaped quotes and backslashes.
+    """
+    if value[:1] != "{" or value[-1:] != "}" or value[1:2] == "{":
+        raise ValueError(f"not a one dimensional array: '{value}'")
+    elements: typing.List[typing.Optional[str]] = []
+    end = len(value) - 1
+    idx = 1
+    if idx == end:
+        return elements
+    while idx <= end:
+        if value[idx] == '"':
+            chars = []
+            idx += 1
+            while value[idx] != '"':
+                if value[idx] == "\\":
+                    idx += 1
+                chars.append(value[idx])
+                idx += 1
+            elements.append("".join(chars))
+            # skip the closing quote
+            idx += 1
+        else:
+            next_comma = value.find(",", idx, end)
+            element_end = end if next_comma == -1 else next_comma
+            element = value[idx:element_end]
+            elements.append(None if element == "NULL" else element)
+            idx = element_end
+        # skip the delimiter, or step past the closing brace
+        idx += 1
+    return elements
+
+
+def array_parser(element_parser: ColumnParser) -> ColumnParser:
+    """
+    Parser of the text output of a one dimensional array of element_parser values. Multi-dimensional arrays and arrays
+    with explicit bounds, e.g. '[0:1]={1,2}', share the type OID and are returned as the text value.
+    """
+
+    def parse_array(value: str) -> typing.Union[typing.List[typing.Any], str]:
+        try:
+            elements = parse_array_elements(value)
+        except ValueError:
+            return value
+        return [None if element is None else element_parser(element) for element in elements]
+
+    return parse_array
+
+
+def parse_binary_int(value: bytes) -> int:
+    """int2, int4 and int8 are big endian two's complement integers of 2, 4 and 8 bytes"""
+    return int.from_bytes(value, "big", signed=True)
+
+
+def parse_binary_float4(value: bytes) -> float:
+    result: float = FLOAT4_STRUCT.unpack(value)[0]
+    return result
+
+
+def parse_binary_float8(value: bytes) -> float:
+    result: float = FLOAT8_STRUCT.unpack(value)[0]
+    return result
+
+
+def parse_binary_bool(value: bytes) -> bool:
+    return value != b"\x00"
+
+
+def parse_binary_text(value: bytes) -> str:
+    return str(value, "utf-8")
+
+
+def parse_binary_bytea(value: bytes) -> bytes:
+    return value
+
+
+def parse_binary_jsonb(value: bytes) -> typing.Any:
+    """jsonb is sent as a version byte (1) followed by the json text"""
+    return json.loads(value[1:])
+
+
+def parse_binary_uuid(value: bytes) -> uuid.UUID:
+    return uuid.UUID(bytes=value)
+
+
+def parse_binary_timestamp(value: bytes) -> typing.Union[datetime, str, bytes]:
+    """
+    Microseconds since the PostgreSQL epoch. infinity and -infinity are returned as in text format, other values
+    datetime can't represent (BC and years after 9999) as the raw bytes.
+    """
+    micros = int.from_bytes(value, "big", signed=True)
+    if micros in TIMESTAMP_INFINITY:
+        return TIMESTAMP_INFINITY[micros]
+    try:
+        return PG_EPOCH + timedelta(microseconds=micros)
+    except OverflowError:
+        return value
+
+
+def parse_binary_timestamptz(value: bytes) -> typing.Union[datetime, str, bytes]:
+    micros = int.from_bytes(value, "big", signed=True)
+    if micros in TIMESTAMP_INFINITY:
+        return TIMESTAMP_INFINITY[micros]
+    try:
+        return decoders.convert_pg_ts(micros)
+    except OverflowError:
+        return value
+
+
+def parse_binary_date(value: bytes) -> typing.Union[date, str, bytes]:
+    """Days since the PostgreSQL epoch, unrepresentable values as in parse_binary_timestamp"""
+    days = int.from_bytes(value, "big", signed=True)
+    if days in DATE_INFINITY:
+        return DATE_INFINITY[days]
+    try:
+        return PG_EPOCH_DATE + timedelta(days=days)
+    except OverflowError:
+        return value
+
+
+def parse_binary_time(value: bytes) -> typing.Union[time, bytes]:
+    """Microseconds since midnight, 24:00:00 is returned as the raw bytes"""
+    micros = int.from_bytes(value, "big", signed=True)
+    seconds, microsecond = divmod(micros, 1_000_000)
+    minutes, second = divmod(seconds, 60)
+    hour, minute = divmod(minutes, 60)
+    if hour > 23:
+        return value
+    return time(hour, minute, second, microsecond)
+
+
+def parse_binary_numeric(value: bytes) -> Decimal:
+    """
+    numeric is sent as a header followed by ndigits Int16 base 10000 digits, the first digit is multiplied by
+    10000^weight. dscale is the number of decimal digits after the decimal point.
+    """
+    ndigits, weight, sign, dscale = NUMERIC_HEADER.unpack_from(value)
+    if sign in NUMERIC_SPECIAL_VALUES:
+        return NUMERIC_SPECIAL_VALUES[sign]
+    digits_start = NUMERIC_HEADER.size
+    digits_end = digits_start + 2 * ndigits
+    base_10000_digits = struct.unpack(f"!{ndigits}h", value[digits_start:digits_end])
+    digits = "".join([f"{digit:04d}" for digit in base_10000_digits])
+    exponent = (weight + 1 - ndigits) * 4
+    if exponent > -dscale:
+        # trailing zero digits are not sent
+        digits += "0" * (exponent + dscale)
+    elif exponent < -dscale:
+        # the last base 10000 digit is padded with zeros beyond dscale
+        digits = digits[: len(digits) + exponent + dscale]
+    return Decimal(f"{'-' if sign == NUMERIC_NEGATIVE else ''}{digits or '0'}E{-dscale}")
+
+
+def binary_array_parser(element_parser: BinaryColumnParser) -> BinaryColumnParser:
+    """Parser of one dimensional arrays of element_parser values, multi-dimensional arrays are returned as raw bytes"""
+
+    def parse_binary_array(value: bytes) -> typing.Union[typing.List[typing.Any], bytes]:
+        ndim, _, _ = ARRAY_HEADER.unpack_from(value)
+        if ndim == 0:
+            return []
+        if ndim > 1:
+            return value
+        n_elements, _ = ARRAY_DIMENSION.unpack_from(value, ARRAY_HEADER.size)
+        offset = ARRAY_HEADER.size + ARRAY_DIMENSION.size
+        elements: typing.List[typing.Any] = []
+        for _ in range(n_elements):
+            length = ARRAY_ELEMENT_LENGTH.unpack_from(value, offset)[0]
+            offset += ARRAY_ELEMENT_LENGTH.size
+            if length == -1:
+                elements.append(None)
+                continue
+            end = offset + length
+            elements.append(element_parser(value[offset:end]))
+            offset = end
+        return elements
+
+    return parse_binary_array
+
+
+# parsers of the text output format by type OID, see pg_type.dat in the PostgreSQL sources
+TEXT_PARSERS: typing.Dict[int, ColumnParser] = {
+    16: parse_bool,  # bool
+    17: parse_bytea,  # bytea
+    18: parse_text,  # char
+    19: parse_text,  # name
+    20: int,  # int8
+    21: int,  # int2
+    23: int,  # int4
+    25: parse_text,  # text
+    26: int,  # oid
+    114: json.loads,  # json
+    700: float,  # float4
+    701: float,  # float8
+    1042: parse_text,  # bpchar
+    1043: parse_text,  # varchar
+    1082: parse_date,  # date
+    1083: parse_time,  # time
+    1114: parse_timestamp,  # timestamp
+    1184: parse_timestamp,  # timestamptz
+    1266: parse_time,  # timetz
+    1700: Decimal,  # numeric
+    2950: uuid.UUID,  # uuid
+    3802: json.loads,  # jsonb
+}
+
+# parsers of the binary send format by type OID, used with the binary option of pgoutput
+BINARY_PARSERS: typing.Dict[int, BinaryColumnParser] = {
+    16: parse_binary_bool,  # bool
+    17: parse_binary_bytea,  # bytea
+    18: parse_binary_text,  # char
+    19: parse_binary_text,  # name
+    20: parse_binary_int,  # int8
+    21: parse_binary_int,  # int2
+    23: parse_binary_int,  # int4
+    25: parse_binary_text,  # text
+    26: parse_binary_int,  # oid, unsigned but always below 2^31 for built-in types
+    114: json.loads,  # json
+    700: parse_binary_float4,  # float4
+    701: parse_binary_float8,  # float8
+    1042: parse_binary_text,  # bpchar
+    1043: parse_binary_text,  # varchar
+    1082: parse_binary_date,  # date
+    1083: parse_binary_time,  # time
+    1114: parse_binary_timestamp,  # timestamp
+    1184: parse_binary_timestamptz,  # timestamptz
+    1700: parse_binary_numeric,  # numeric
+    2950: parse_binary_uuid,  # uuid
+    3802: parse_binary_jsonb,  # jsonb
+}
+
+# array type OID to element type OID
+ARRAY_ELEMENT_TYPES: typing.Dict[int, int] = {
+    199: 114,  # json[]
+    1000: 16,  # bool[]
+    1001: 17,  # bytea[]
+    1003: 19,  # name[]
+    1005: 21,  # int2[]
+    1007: 23,  # int4[]
+    1009: 25,  # text[]
+    1014: 1042,  # bpchar[]
+    1015: 1043,  # varchar[]
+    1016: 20,  # int8[]
+    1021: 700,  # float4[]
+    1022: 701,  # float8[]
+    1028: 26,  # oid[]
+    1115: 1114,  # timestamp[]
+    1182: 1082,  # date[]
+    1183: 1083,  # time[]
+    1185: 1184,  # timestamptz[]
+    1231: 1700,  # numeric[]
+    1270: 1266,  # timetz[]
+    2951: 2950,  # uuid[]
+    3807: 3802,  # jsonb[]
+}
+
+
+class ParserRegistry:
+    """
+    Text and binary format parsers by type OID. Types without a parser, e.g. enums or other user defined types, stay
+    strings in text format and bytes in binary format. Parsers registered by the user take precedence over the
+    defaults, and are also used for the elements of the matching built-in array type.
+    """
+
+    def __init__(
+        self,
+        overrides: typing.Optional[typing.Mapping[int, ColumnParser]] = None,
+        binary_overrides: typing.Optional[typing.Mapping[int, BinaryColumnParser]] = None,
+    ) -> None:
+        self.parsers: typing.Dict[int, ColumnParser] = dict(TEXT_PARSERS)
+        self.binary_parsers: typing.Dict[int, BinaryColumnParser] = dict(BINARY_PARSERS)
+        for type_id, element_type_id in ARRAY_ELEMENT_TYPES.items():
+            self.parsers[type_id] = array_parser(TEXT_PARSERS[element_type_id])
+            if element_type_id in BINARY_PARSERS:
+                self.binary_parsers[type_id] = binary_array_parser(BINARY_PARSERS[element_type_id])
+        if overrides:
+            for type_id, parser in overrides.items():
+                self.register(type_id, parser)
+        if binary_overrides:
+            for type_id, binary_parser in binary_overrides.items():
+                self.register_binary(type_id, binary_parser)
+
+    def register(self, type_id: int, parser: ColumnParser) -> None:
+        self.parsers[type_id] = parser
+        for array_type_id, element_type_id in ARRAY_ELEMENT_TYPES.items():
+            if element_type_id == type_id:
+                self.parsers[array_type_id] = array_parser(parser)
+
+    def register_binary(self, type_id: int, parser: BinaryColumnParser) -> None:
+        self.binary_parsers[type_id] = parser
+        for array_type_id, element_type_id in ARRAY_ELEMENT_TYPES.items():
+            if element_type_id == type_id:
+                self.binary_parsers[array_type_id] = binary_array_parser(parser)
+
+    def get(self, type_id: int) -> ColumnParser:
+        return self.parsers.get(type_id, parse_text)
+
+    def get_binary(self, type_id: int) -> BinaryColumnParser:
+        return self.binary_parsers.get(type_id, parse_binary_bytea)
+
+
+DEFAULT_REGISTRY = ParserRegistry()
+
+
+class RowConverter:
+    """
+    Converts the tuple data of one relation to a dict of typed values.
+
+    Built once per Relation message: the column names and a tuple of per column parsers are resolved up front, so
+    converting a row is a single pass mapping the values positionally. Text values (str) and binary values (bytes)
+    each have their own parser. NULL and unchanged TOASTed values are None.
+
+    With positions only the columns at these positions of the tuple are converted, the others are never decoded when
+    the tuple is a LazyTupleData.
+    """
+
+    __slots__ = ("names", "parsers", "binary_parsers", "key_positions", "positions")
+
+    def __init__(
+        self,
+        columns: typing.Sequence[ColumnLike],
+        registry: ParserRegistry = DEFAULT_REGISTRY,
+        positions: typing.Optional[typing.Sequence[int]] = None,
+    ) -> None:
+        self.names: typing.Tuple[str, ...] = tuple(c.name for c in columns)
+        self.parsers: typing.Tuple[ColumnParser, ...] = tuple(registry.get(c.type_id) for c in columns)
+        self.binary_parsers: typing.Tuple[BinaryColumnParser, ...] = tuple(
+            registry.get_binary(c.type_id) for c in columns
+        )
+        self.positions: typing.Optional[typing.Tuple[int, ...]] = None if positions is None else tuple(positions)
+        # before tuples with REPLICA IDENTITY DEFAULT only hold the primary key columns
+        self.key_positions: typing.Tuple[int, ...] = tuple(
+            idx for idx, c in enumerate(columns) if c.part_of_pkey and (positions is None or idx in positions)
+        )
+
+    def convert(
+        self, tuple_data: typing.Union[decoders.TupleData, decoders.LazyTupleData]
+    ) -> typing.Dict[str, typing.Any]:
+        if self.positions is not None:
+            return self.convert_positions(tuple_data, self.positions)
+        values: typing.Iterable[typing.Optional[typing.Union[str, bytes]]]
+        if isinstance(tuple_data, decoders.LazyTupleData):
+            values = map(tuple_data.get_value, range(tuple_data.n_columns))
+        else:
+            values = (col.col_data for col in tuple_data.column_data)
+        return {
+            name: None if value is None else parse(value) if isinstance(value, str) else parse_binary(value)
+            for name, parse, parse_binary, value in zip(self.names, self.parsers, self.binary_parsers, values)
+        }
+
+    def convert_key(
+        self, tuple_data: typing.Union[decoders.TupleData, decoders.LazyTupleData]
+    ) -> typing.Dict[str, typing.Any]:
+        return self.convert_positions(tuple_data, self.key_positions)
+
+    def convert_positions(
+        self, tuple_data: typing.Union[decoders.TupleData, decoders.LazyTupleData], positions: typing.Tuple[int, ...]
+    ) -> typing.Dict[str, typing.Any]:
+        output: typing.Dict[str, typing.Any] = dict()
+        for idx in positions:
+            value = tuple_data.get_value(idx)
+            if value is None:
+                output[self.names[idx]] = None
+            elif isinstance(value, str):
+                output[self.names[idx]] = self.parsers[idx](value)
+            else:
+                output[self.names[idx]] = self.binary_parsers[idx](value)
+        return output
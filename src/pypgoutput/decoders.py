@@ -1,8 +1,10 @@
-import io
+import re
+import struct
 from abc import ABC, abstractmethod
+from array import array
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Union
+from typing import Any, ClassVar, Iterator, List, Optional, Tuple, Union
 
 # integer byte lengths
 INT8 = 1
@@ -10,6 +12,17 @@ INT16 = 2
 INT32 = 4
 INT64 = 8
 
+# precompiled network byte order (big endian) layouts, all integers in pgoutput are signed
+INT8_STRUCT = struct.Struct("!b")
+INT16_STRUCT = struct.Struct("!h")
+INT32_STRUCT = struct.Struct("!i")
+INT64_STRUCT = struct.Struct("!q")
+# transaction ids are unsigned
+UINT32_STRUCT = struct.Struct("!I")
+
+# strings in pgoutput messages are NUL terminated
+STRING_TERMINATOR = re.compile(b"\x00")
+
 
 def convert_pg_ts(_ts_in_microseconds: int) -> datetime:
     ts = datetime(2000, 1, 1, 0, 0, 0, 0, tzinfo=timezone.utc)
@@ -20,19 +33,20 @@ def convert_bytes_to_int(_in_bytes: bytes) -> int:
     return int.from_bytes(_in_bytes, byteorder="big", signed=True)
 
 
-def convert_bytes_to_utf8(_in_bytes: Union[bytes, bytearray]) -> str:
-    return (_in_bytes).decode("utf-8")
+def convert_bytes_to_utf8(_in_bytes: Union[bytes, bytearray, memoryview]) -> str:
+    return str(_in_bytes, "utf-8")
 
 
 @dataclass(frozen=True)
 class ColumnData:
-    # col_data_category is NOT the type. it means null value/toasted(not sent)/text formatted
+    # col_data_category is NOT the type. it means null value/toasted(not sent)/text formatted/binary formatted
     col_data_category: Optional[str]
     col_data_length: Optional[int] = None
-    col_data: Optional[str] = None
+    # str for text formatted values, bytes in the type's binary send format for binary formatted values
+    col_data: Optional[Union[str, bytes]] = None
 
     def __repr__(self) -> str:
-        return f"[col_data_category='{self.col_data_category}', col_data_length={self.col_data_length}, col_data='{self.col_data}']"
+        return f"[col_data_category='{self.col_data_category}', col_data_length={self.col_data_length}, col_data={self.col_data!r}]"
 
 
 @dataclass(frozen=True)
@@ -50,13 +64,89 @@ class TupleData:
     n_columns: int
     column_data: List[ColumnData]
 
+    def get_value(self, idx: int) -> Optional[Union[str, bytes]]:
+        """Value of one column, same as LazyTupleData.get_value"""
+        return self.column_data[idx].col_data
+
+    def get_category(self, idx: int) -> str:
+        """Category of one column, same as LazyTupleData.get_category"""
+        return self.column_data[idx].col_data_category or ""
+
     def __repr__(self) -> str:
         return f"n_columns: {self.n_columns}, data: {self.column_data}"
 
 
+class LazyTupleData:
+    """
+    TupleData variant that defers per column decoding until a column is accessed.
+
+    The first pass over the payload only records the category, offset and length of each column in compact arrays.
+    ColumnData objects (or just the decoded value) are created when a column is indexed, so consumers that only look at
+    a few columns of a wide row do not pay for decoding the rest.
+    """
+
+    __slots__ = ("n_columns", "_buffer", "_categories", "_offsets", "_lengths")
+
+    def __init__(
+        self, n_columns: int, buffer: memoryview, categories: bytes, offsets: "array[int]", lengths: "array[int]"
+    ) -> None:
+        self.n_columns = n_columns
+        self._buffer = buffer
+        self._categories = categories
+        self._offsets = offsets
+        self._lengths = lengths
+
+    def __len__(self) -> int:
+        return self.n_columns
+
+    def __getitem__(self, idx: int) -> ColumnData:
+        col_data_category = chr(self._categories[idx])
+        if col_data_category in ("t", "b"):
+            return ColumnData(
+                col_data_category=col_data_category, col_data_length=self._lengths[idx], col_data=self.get_value(idx)
+            )
+        return ColumnData(col_data_category=col_data_category)
+
+    def __iter__(self) -> Iterator[ColumnData]:
+        for idx in range(self.n_columns):
+            yield self[idx]
+
+    def get_category(self, idx: int) -> str:
+        return chr(self._categories[idx])
+
+    def get_value(self, idx: int) -> Optional[Union[str, bytes]]:
+        """Decode only the value of one column, None for NULL and unchanged TOASTed columns"""
+        category = self._categories[idx]
+        if category != 116 and category != 98:  # ord("t"), ord("b")
+            return None
+        offset = self._offsets[idx]
+        end = offset + self._lengths[idx]
+        if category == 98:
+            return bytes(self._buffer[offset:end])
+        return convert_bytes_to_utf8(self._buffer[offset:end])
+
+    @property
+    def column_data(self) -> List[ColumnData]:
+        """Materialize all columns, compatible with TupleData.column_data"""
+        return list(self)
+
+    def __repr__(self) -> str:
+        return f"n_columns: {self.n_columns}, data: {self.column_data} (lazy)"
+
+
 class PgoutputMessage(ABC):
-    def __init__(self, buffer: bytes):
-        self.buffer: io.BytesIO = io.BytesIO(buffer)
+    """
+    Messages are decoded in place: the payload is wrapped in a memoryview and every read unpacks directly from it at
+    the current offset, so no intermediate bytes objects are created for the fixed size fields.
+    """
+
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview], lazy_tuples: bool = False, streamed: bool = False):
+        self.buffer: memoryview = memoryview(buffer)
+        self.offset: int = 0
+        # only used by messages containing tuple data
+        self.lazy_tuples = lazy_tuples
+        # messages sent between Stream Start and Stream Stop (protocol version 2) are prefixed with the xid
+        self.streamed = streamed
         self.byte1: str = self.read_utf8(1)
         self.decode_buffer()
 
@@ -68,32 +158,72 @@ class PgoutputMessage(ABC):
     def __repr__(self) -> str:
         """Implemented for each message type"""
 
+    def read_struct(self, layout: struct.Struct) -> Tuple[Any, ...]:
+        """Unpack a precompiled layout at the current offset and move past it"""
+        values = layout.unpack_from(self.buffer, self.offset)
+        self.offset += layout.size
+        return values
+
     def read_int8(self) -> int:
-        return convert_bytes_to_int(self.buffer.read(INT8))
+        value: int = INT8_STRUCT.unpack_from(self.buffer, self.offset)[0]
+        self.offset += INT8
+        return value
 
     def read_int16(self) -> int:
-        return convert_bytes_to_int(self.buffer.read(INT16))
+        value: int = INT16_STRUCT.unpack_from(self.buffer, self.offset)[0]
+        self.offset += INT16
+        return value
 
     def read_int32(self) -> int:
-        return convert_bytes_to_int(self.buffer.read(INT32))
+        value: int = INT32_STRUCT.unpack_from(self.buffer, self.offset)[0]
+        self.offset += INT32
+        return value
 
     def read_int64(self) -> int:
-        return convert_bytes_to_int(self.buffer.read(INT64))
+        value: int = INT64_STRUCT.unpack_from(self.buffer, self.offset)[0]
+        self.offset += INT64
+        return value
+
+    def read_uint32(self) -> int:
+        value: int = UINT32_STRUCT.unpack_from(self.buffer, self.offset)[0]
+        self.offset += INT32
+        return value
+
+    def read_xid(self) -> Optional[int]:
+        """Int32 xid of the (sub)transaction, only present in streamed messages"""
+        if not self.streamed:
+            return None
+        return self.read_uint32()
 
     def read_utf8(self, n: int = 1) -> str:
-        return convert_bytes_to_utf8(self.buffer.read(n))
+        end = self.offset + n
+        if end > len(self.buffer):
+            raise ValueError(f"cannot read {n} bytes at position {self.offset}, buffer length is {len(self.buffer)}")
+        offset = self.offset
+        value = convert_bytes_to_utf8(self.buffer[offset:end])
+        self.offset = end
+        return value
 
     def read_timestamp(self) -> datetime:
         # 8 chars -> int64 -> timestamp
         return convert_pg_ts(_ts_in_microseconds=self.read_int64())
 
     def read_string(self) -> str:
-        output = bytearray()
-        while (next_char := self.buffer.read(1)) != b"\x00":
-            output += next_char
-        return convert_bytes_to_utf8(output)
-
-    def read_tuple_data(self) -> TupleData:
+        """Locate the NUL terminator with a single search over the buffer and decode the string in one call"""
+        offset = self.offset
+        terminator = STRING_TERMINATOR.search(self.buffer, offset)
+        if terminator is None:
+            raise ValueError(f"no string terminator found after position {offset}")
+        end = terminator.start()
+        self.offset = end + 1
+        return convert_bytes_to_utf8(self.buffer[offset:end])
+
+    def read_tuple_data(self) -> Union[TupleData, LazyTupleData]:
+        if self.lazy_tuples:
+            return self.read_lazy_tuple_data()
+        return self.read_eager_tuple_data()
+
+    def read_eager_tuple_data(self) -> TupleData:
         """
         TupleData
         Int16  Number of columns.
@@ -105,19 +235,38 @@ class PgoutputMessage(ABC):
                 Byte1('t') Identifies the data as text formatted value.
                 Int32 Length of the column value.
                 Byten The value of the column, in text format. (A future release might support additional formats.) n is the above length.
+            Or
+                Byte1('b') Identifies the data as binary formatted value (PG14+ with the binary option).
+                Int32 Length of the column value.
+                Byten The value of the column, in binary format. n is the above length.
         """
         # TODO: investigate what happens with the generated columns
         column_data = list()
         n_columns = self.read_int16()
+        # locals avoid attribute lookups in the per column loop
+        buffer = self.buffer
+        buffer_length = len(buffer)
+        offset = self.offset
+        unpack_length = INT32_STRUCT.unpack_from
         for column in range(n_columns):
-            col_data_category = self.read_utf8()
+            col_data_category = chr(buffer[offset])
+            offset += INT8
             if col_data_category in ("n", "u"):
-                # "n"=NULL, "t"=TOASTed
+                # "n"=NULL, "u"=TOASTed
                 column_data.append(ColumnData(col_data_category=col_data_category))
-            elif col_data_category == "t":
-                # t = tuple
-                col_data_length = self.read_int32()
-                col_data = self.read_utf8(col_data_length)
+            elif col_data_category in ("t", "b"):
+                # t = text, b = binary
+                col_data_length = unpack_length(buffer, offset)[0]
+                offset += INT32
+                end = offset + col_data_length
+                if end > buffer_length:
+                    raise ValueError(f"column data of length {col_data_length} exceeds buffer at position {offset}")
+                col_data: Union[str, bytes]
+                if col_data_category == "t":
+                    col_data = convert_bytes_to_utf8(buffer[offset:end])
+                else:
+                    col_data = bytes(buffer[offset:end])
+                offset = end
                 column_data.append(
                     ColumnData(
                         col_data_category=col_data_category,
@@ -125,8 +274,37 @@ class PgoutputMessage(ABC):
                         col_data=col_data,
                     )
                 )
+        self.offset = offset
         return TupleData(n_columns=n_columns, column_data=column_data)
 
+    def read_lazy_tuple_data(self) -> LazyTupleData:
+        """Same wire format as read_eager_tuple_data, but only records where each column value is in the buffer"""
+        n_columns = self.read_int16()
+        buffer = self.buffer
+        buffer_length = len(buffer)
+        offset = self.offset
+        unpack_length = INT32_STRUCT.unpack_from
+        categories = bytearray(n_columns)
+        offsets = array("l", [0]) * n_columns
+        lengths = array("l", [0]) * n_columns
+        for column in range(n_columns):
+            category = buffer[offset]
+            categories[column] = category
+            offset += INT8
+            if category == 116 or category == 98:  # ord("t"), ord("b")
+                col_data_length = unpack_length(buffer, offset)[0]
+                offset += INT32
+                end = offset + col_data_length
+                if end > buffer_length:
+                    raise ValueError(f"column data of length {col_data_length} exceeds buffer at position {offset}")
+                offsets[column] = offset
+                lengths[column] = col_data_length
+                offset = end
+        self.offset = offset
+        return LazyTupleData(
+            n_columns=n_columns, buffer=buffer, categories=bytes(categories), offsets=offsets, lengths=lengths
+        )
+
 
 class Begin(PgoutputMessage):
     """
@@ -139,6 +317,8 @@ class Begin(PgoutputMessage):
     tx_xid Int32 Xid of the transaction.
     """
 
+    layout: ClassVar[struct.Struct] = struct.Struct("!qqI")
+
     byte1: str
     lsn: int
     commit_ts: datetime
@@ -147,9 +327,8 @@ class Begin(PgoutputMessage):
     def decode_buffer(self) -> None:
         if self.byte1 != "B":
             raise ValueError("first byte in buffer does not match Begin message")
-        self.lsn = self.read_int64()
-        self.commit_ts = self.read_timestamp()
-        self.tx_xid = self.read_int64()
+        self.lsn, commit_ts, self.tx_xid = self.read_struct(self.layout)
+        self.commit_ts = convert_pg_ts(commit_ts)
 
     def __repr__(self) -> str:
         return (
@@ -167,6 +346,8 @@ class Commit(PgoutputMessage):
     Int64 Commit timestamp of the transaction. The value is in number of microseconds since PostgreSQL epoch (2000-01-01).
     """
 
+    layout: ClassVar[struct.Struct] = struct.Struct("!bqqq")
+
     byte1: str
     flags: int
     lsn_commit: int
@@ -176,10 +357,8 @@ class Commit(PgoutputMessage):
     def decode_buffer(self) -> None:
         if self.byte1 != "C":
             raise ValueError("first byte in buffer does not match Commit message")
-        self.flags = self.read_int8()
-        self.lsn_commit = self.read_int64()
-        self.lsn = self.read_int64()
-        self.commit_ts = self.read_timestamp()
+        self.flags, self.lsn_commit, self.lsn, commit_ts = self.read_struct(self.layout)
+        self.commit_ts = convert_pg_ts(commit_ts)
 
     def __repr__(self) -> str:
         return (
@@ -188,7 +367,7 @@ class Commit(PgoutputMessage):
         )
 
 
-class Origin:
+class Origin(PgoutputMessage):
     """
     Byte1('O') Identifies the message as an origin message.
     Int64  The LSN of the commit on the origin server.
@@ -197,12 +376,27 @@ class Origin:
     This seems to be what origin means: https://www.postgresql.org/docs/12/replication-origins.html
     """
 
-    pass
+    byte1: str
+    origin_lsn: int
+    origin_name: str
+
+    def decode_buffer(self) -> None:
+        if self.byte1 != "O":
+            raise ValueError(f"first byte in buffer does not match Origin message (expected 'O', got '{self.byte1}'")
+        self.origin_lsn = self.read_int64()
+        self.origin_name = self.read_string()
+
+    def __repr__(self) -> str:
+        return (
+            f"ORIGIN \n\tbyte1: '{self.byte1}', \n\torigin_lsn: {self.origin_lsn}"
+            f", \n\torigin_name: '{self.origin_name}'"
+        )
 
 
 class Relation(PgoutputMessage):
     """
     Byte1('R')  Identifies the message as a relation message.
+    Int32 Xid of the transaction (only present for streamed transactions). This field is available since protocol version 2.
     Int32 ID of the relation.
     String Namespace (empty string for pg_catalog).
     String Relation name.
@@ -218,7 +412,10 @@ class Relation(PgoutputMessage):
         Int32 Type modifier of the column (atttypmod).
     """
 
+    column_layout: ClassVar[struct.Struct] = struct.Struct("!ii")
+
     byte1: str
+    xid: Optional[int]
     relation_id: int
     namespace: str
     relation_name: str
@@ -229,6 +426,7 @@ class Relation(PgoutputMessage):
     def decode_buffer(self) -> None:
         if self.byte1 != "R":
             raise ValueError("first byte in buffer does not match Relation message")
+        self.xid = self.read_xid()
         self.relation_id = self.read_int32()
         self.namespace = self.read_string()
         self.relation_name = self.read_string()
@@ -239,10 +437,9 @@ class Relation(PgoutputMessage):
         for column in range(self.n_columns):
             part_of_pkey = self.read_int8()
             col_name = self.read_string()
-            data_type_id = self.read_int32()
             # TODO: check on use of signed / unsigned
             # check with select oid from pg_type where typname = <type>; timestamp == 1184, int4 = 23
-            col_modifier = self.read_int32()
+            data_type_id, col_modifier = self.read_struct(self.column_layout)
             self.columns.append(
                 ColumnType(
                     part_of_pkey=part_of_pkey,
@@ -261,35 +458,57 @@ class Relation(PgoutputMessage):
         )
 
 
-class PgType:
+class PgType(PgoutputMessage):
     """
     Renamed to PgType not to collide with "type"
 
     Byte1('Y') Identifies the message as a type message.
+    Int32 Xid of the transaction (only present for streamed transactions). This field is available since protocol version 2.
     Int32 ID of the data type.
     String Namespace (empty string for pg_catalog).
     String Name of the data type.
     """
 
-    pass
+    byte1: str
+    xid: Optional[int]
+    type_id: int
+    namespace: str
+    type_name: str
+
+    def decode_buffer(self) -> None:
+        if self.byte1 != "Y":
+            raise ValueError(f"first byte in buffer does not match Type message (expected 'Y', got '{self.byte1}'")
+        self.xid = self.read_xid()
+        self.type_id = self.read_int32()
+        self.namespace = self.read_string()
+        self.type_name = self.read_string()
+
+    def __repr__(self) -> str:
+        return (
+            f"TYPE \n\tbyte1: '{self.byte1}', \n\ttype_id: {self.type_id}"
+            f",\n\tnamespace: '{self.namespace}',\n\ttype_name: '{self.type_name}'"
+        )
 
 
 class Insert(PgoutputMessage):
     """
     Byte1('I')  Identifies the message as an insert message.
+    Int32 Xid of the transaction (only present for streamed transactions). This field is available since protocol version 2.
     Int32 ID of the relation corresponding to the ID in the relation message.
     Byte1('N') Identifies the following TupleData message as a new tuple.
     TupleData TupleData message part representing the contents of new tuple.
     """
 
     byte1: str
+    xid: Optional[int]
     relation_id: int
     new_tuple_byte: str
-    new_tuple: TupleData
+    new_tuple: Union[TupleData, LazyTupleData]
 
     def decode_buffer(self) -> None:
         if self.byte1 != "I":
             raise ValueError(f"first byte in buffer does not match Insert message (expected 'I', got '{self.byte1}'")
+        self.xid = self.read_xid()
         self.relation_id = self.read_int32()
         self.new_tuple_byte = self.read_utf8()
         self.new_tuple = self.read_tuple_data()
@@ -304,6 +523,7 @@ class Insert(PgoutputMessage):
 class Update(PgoutputMessage):
     """
     Byte1('U')      Identifies the message as an update message.
+    Int32           Xid of the transaction (only present for streamed transactions). This field is available since protocol version 2.
     Int32           ID of the relation corresponding to the ID in the relation message.
     Byte1('K')      Identifies the following TupleData submessage as a key. This field is optional and is only present if the update changed data in any of the column(s) that are part of the REPLICA IDENTITY index.
     Byte1('O')      Identifies the following TupleData submessage as an old tuple. This field is optional and is only present if table in which the update happened has REPLICA IDENTITY set to FULL.
@@ -315,18 +535,20 @@ class Update(PgoutputMessage):
     """
 
     byte1: str
+    xid: Optional[int]
     relation_id: int
     next_byte_identifier: Optional[str]
     optional_tuple_identifier: Optional[str]
-    old_tuple: Optional[TupleData]
+    old_tuple: Optional[Union[TupleData, LazyTupleData]]
     new_tuple_byte: str
-    new_tuple: TupleData
+    new_tuple: Union[TupleData, LazyTupleData]
 
     def decode_buffer(self) -> None:
         self.optional_tuple_identifier = None
         self.old_tuple = None
         if self.byte1 != "U":
             raise ValueError(f"first byte in buffer does not match Update message (expected 'U', got '{self.byte1}'")
+        self.xid = self.read_xid()
         self.relation_id = self.read_int32()
         # TODO test update to PK, test update with REPLICA IDENTITY = FULL
         self.next_byte_identifier = self.read_utf8()  # one of K, O or N
@@ -339,7 +561,7 @@ class Update(PgoutputMessage):
         if self.new_tuple_byte != "N":
             # TODO: test exception handling
             raise ValueError(
-                f"did not find new_tuple_byte ('N') at position: {self.buffer.tell()}, found: '{self.new_tuple_byte}'"
+                f"did not find new_tuple_byte ('N') at position: {self.offset}, found: '{self.new_tuple_byte}'"
             )
         self.new_tuple = self.read_tuple_data()
 
@@ -354,6 +576,7 @@ class Update(PgoutputMessage):
 class Delete(PgoutputMessage):
     """
     Byte1('D')      Identifies the message as a delete message.
+    Int32           Xid of the transaction (only present for streamed transactions). This field is available since protocol version 2.
     Int32           ID of the relation corresponding to the ID in the relation message.
     Byte1('K')      Identifies the following TupleData submessage as a key. This field is present if the table in which the delete has happened uses an index as REPLICA IDENTITY.
     Byte1('O')      Identifies the following TupleData message as a old tuple. This field is present if the table in which the delete has happened has REPLICA IDENTITY set to FULL.
@@ -363,13 +586,15 @@ class Delete(PgoutputMessage):
     """
 
     byte1: str
+    xid: Optional[int]
     relation_id: int
     message_type: str
-    old_tuple: TupleData
+    old_tuple: Union[TupleData, LazyTupleData]
 
     def decode_buffer(self) -> None:
         if self.byte1 != "D":
             raise ValueError(f"first byte in buffer does not match Delete message (expected 'D', got '{self.byte1}'")
+        self.xid = self.read_xid()
         self.relation_id = self.read_int32()
         self.message_type = self.read_utf8()
         # TODO: test with replica identity full
@@ -387,12 +612,16 @@ class Delete(PgoutputMessage):
 class Truncate(PgoutputMessage):
     """
     Byte1('T')      Identifies the message as a truncate message.
+    Int32           Xid of the transaction (only present for streamed transactions). This field is available since protocol version 2.
     Int32           Number of relations
     Int8            Option bits for TRUNCATE: 1 for CASCADE, 2 for RESTART IDENTITY
     Int32           ID of the relation corresponding to the ID in the relation message. This field is repeated for each relation.
     """
 
+    layout: ClassVar[struct.Struct] = struct.Struct("!ib")
+
     byte1: str
+    xid: Optional[int]
     number_of_relations: int
     option_bits: int
     relation_ids: List[int]
@@ -400,14 +629,113 @@ class Truncate(PgoutputMessage):
     def decode_buffer(self) -> None:
         if self.byte1 != "T":
             raise ValueError(f"first byte in buffer does not match Truncate message (expected 'T', got '{self.byte1}'")
-        self.number_of_relations = self.read_int32()
-        self.option_bits = self.read_int8()
-        self.relation_ids = []
-        for relation in range(self.number_of_relations):
-            self.relation_ids.append(self.read_int32())
+        self.xid = self.read_xid()
+        self.number_of_relations, self.option_bits = self.read_struct(self.layout)
+        self.relation_ids = list(struct.unpack_from(f"!{self.number_of_relations}i", self.buffer, self.offset))
+        self.offset += INT32 * self.number_of_relations
 
     def __repr__(self) -> str:
         return (
             f"TRUNCATE \n\tbyte1: {self.byte1} \n\tn_relations: {self.number_of_relations} "
             f"option_bits: {self.option_bits}, relation_ids: {self.relation_ids}"
         )
+
+
+class StreamStart(PgoutputMessage):
+    """
+    Byte1('S')      Identifies the message as a stream start message.
+    Int32           Xid of the transaction.
+    Int8            A value of 1 indicates this is the first stream segment for this XID, 0 for any other stream segment.
+    """
+
+    layout: ClassVar[struct.Struct] = struct.Struct("!Ib")
+
+    byte1: str
+    xid: int
+    first_segment: bool
+
+    def decode_buffer(self) -> None:
+        if self.byte1 != "S":
+            raise ValueError(
+                f"first byte in buffer does not match Stream Start message (expected 'S', got '{self.byte1}'"
+            )
+        self.xid, first_segment = self.read_struct(self.layout)
+        self.first_segment = first_segment == 1
+
+    def __repr__(self) -> str:
+        return f"STREAM START \n\tbyte1: '{self.byte1}', \n\txid: {self.xid}, \n\tfirst_segment: {self.first_segment}"
+
+
+class StreamStop(PgoutputMessage):
+    """
+    Byte1('E')      Identifies the message as a stream stop message.
+    """
+
+    byte1: str
+
+    def decode_buffer(self) -> None:
+        if self.byte1 != "E":
+            raise ValueError(
+                f"first byte in buffer does not match Stream Stop message (expected 'E', got '{self.byte1}'"
+            )
+
+    def __repr__(self) -> str:
+        return f"STREAM STOP \n\tbyte1: '{self.byte1}'"
+
+
+class StreamCommit(PgoutputMessage):
+    """
+    Byte1('c')      Identifies the message as a stream commit message.
+    Int32           Xid of the transaction.
+    Int8            Flags; currently unused (must be 0).
+    Int64           The LSN of the commit.
+    Int64           The end LSN of the transaction.
+    Int64           Commit timestamp of the transaction. The value is in number of microseconds since PostgreSQL epoch (2000-01-01).
+    """
+
+    layout: ClassVar[struct.Struct] = struct.Struct("!Ibqqq")
+
+    byte1: str
+    xid: int
+    flags: int
+    lsn_commit: int
+    lsn: int
+    commit_ts: datetime
+
+    def decode_buffer(self) -> None:
+        if self.byte1 != "c":
+            raise ValueError(
+                f"first byte in buffer does not match Stream Commit message (expected 'c', got '{self.byte1}'"
+            )
+        self.xid, self.flags, self.lsn_commit, self.lsn, commit_ts = self.read_struct(self.layout)
+        self.commit_ts = convert_pg_ts(commit_ts)
+
+    def __repr__(self) -> str:
+        return (
+            f"STREAM COMMIT \n\tbyte1: '{self.byte1}', \n\txid: {self.xid}, \n\tflags {self.flags}"
+            f", \n\tlsn_commit: {self.lsn_commit}, \n\tLSN: {self.lsn}, \n\tcommit_ts {self.commit_ts}"
+        )
+
+
+class StreamAbort(PgoutputMessage):
+    """
+    Byte1('A')      Identifies the message as a stream abort message.
+    Int32           Xid of the transaction.
+    Int32           Xid of the subtransaction (will be same as xid of the transaction for top-level transactions).
+    """
+
+    layout: ClassVar[struct.Struct] = struct.Struct("!II")
+
+    byte1: str
+    xid: int
+    subxid: int
+
+    def decode_buffer(self) -> None:
+        if self.byte1 != "A":
+            raise ValueError(
+                f"first byte in buffer does not match Stream Abort message (expected 'A', got '{self.byte1}'"
+            )
+        self.xid, self.subxid = self.read_struct(self.layout)
+
+    def __repr__(self) -> str:
+        return f"STREAM ABORT \n\tbyte1: '{self.byte1}', \n\txid: {self.xid}, \n\tsubxid: {self.subxid}"
@@ -0,0 +1,184 @@
+import logging
+import typing
+from fnmatch import fnmatchcase
+
+import pypgoutput.decoders as decoders
+from pypgoutput.converters import (
+    BinaryColumnParser,
+    ColumnLike,
+    ColumnParser,
+    ParserRegistry,
+)
+
+logger = logging.getLogger(__name__)
+
+# message types of the changes that can be filtered
+CHANGE_OPS = frozenset("IUDT")
+
+# condition on the value of a column: a value it must equal, a list, tuple or set of values it must be one of, or a
+# callable taking the typed value (None for NULL) returning whether the row is kept
+Condition = typing.Any
+# position of a column, whether it is a key column, text values matching without parsing, test of the typed value,
+# parser and binary parser
+PredicateCheck = typing.Tuple[
+    int, bool, typing.FrozenSet[str], typing.Callable[[typing.Any], bool], ColumnParser, BinaryColumnParser
+]
+
+
+class ChangeFilter:
+    """
+    Selects the tables, columns and operations a reader emits change events for.
+
+    Tables are matched by "schema.table" against shell style patterns (fnmatch, case sensitive), a table is included
+    if it matches any include pattern (all tables without include patterns) and no exclude pattern. columns maps
+    table patterns to the columns to keep, the first matching pattern applies and tables without a match keep all
+    their columns. ops is the set of message types to keep, any of I, U, D and T. rows maps table patterns to the
+    conditions on column values rows must meet to be kept (see RowPredicate), the first matching pattern applies.
+
+    The filter is resolved once per Relation message, so filtered changes are skipped after reading their relation id
+    and the tuple data is only decoded for the kept columns.
+    """
+
+    def __init__(
+        self,
+        include_tables: typing.Optional[typing.Iterable[str]] = None,
+        exclude_tables: typing.Optional[typing.Iterable[str]] = None,
+        columns: typing.Optional[typing.Mapping[str, typing.Iterable[str]]] = None,
+        ops: typing.Optional[typing.Iterable[str]] = None,
+        rows: typing.Optional[typing.Mapping[str, typing.Mapping[str, Condition]]] = None,
+    ) -> None:
+        self.include_tables = None if include_tables is None else list(include_tables)
+        self.exclude_tables = [] if exclude_tables is None else list(exclude_tables)
+        self.columns = [] if columns is None else [(pattern, list(names)) for pattern, names in columns.items()]
+        self.rows = [] if rows is None else list(rows.items())
+        self.ops: typing.Optional[typing.FrozenSet[str]] = None if ops is None else frozenset(ops)
+        if self.ops is not None and not self.ops <= CHANGE_OPS:
+            raise ValueError(f"ops must be a subset of I, U, D and T, got {sorted(self.ops - CHANGE_OPS)}")
+
+    def accepts_table(self, schema_name: str, table: str) -> bool:
+        name = f"{schema_name}.{table}"
+        if self.include_tables is not None and not any(fnmatchcase(name, p) for p in self.include_tables):
+            return False
+        return not any(fnmatchcase(name, p) for p in self.exclude_tables)
+
+    def columns_for(self, schema_name: str, table: str) -> typing.Optional[typing.List[str]]:
+        """Names of the columns to keep, None to keep all of them"""
+        name = f"{schema_name}.{table}"
+        for pattern, names in self.columns:
+            if fnmatchcase(name, pattern):
+                return names
+        return None
+
+    def conditions_for(self, schema_name: str, table: str) -> typing.Optional[typing.Mapping[str, Condition]]:
+        """Conditions on the column values of the rows to keep, None to keep all rows"""
+        name = f"{schema_name}.{table}"
+        for pattern, conditions in self.rows:
+            if fnmatchcase(name, pattern):
+                return conditions
+        return None
+
+    def accepts_op(self, op: str) -> bool:
+        return self.ops is None or op in self.ops
+
+    def __repr__(self) -> str:
+        return (
+            f"ChangeFilter(include_tables={self.include_tables}, exclude_tables={self.exclude_tables}, "
+            f"columns={dict(self.columns)}, rows={dict(self.rows)}, "
+            f"ops={None if self.ops is None else ''.join(sorted(self.ops))})"
+        )
+
+
+class RowPredicate:
+    """
+    Conditions on the column values of a row, compiled for one relation with compile_predicate. All conditions must
+    hold for the row to be kept.
+
+    Evaluated on the raw values of the tuple data, before the row is converted: only the columns with a condition are
+    decoded and parsed. Text values equal to the text form of a condition value match without parsing them.
+
+    Conditions on values the tuple does not hold are not evaluated and don't drop the row: unchanged TOASTed columns
+    of an Update, and the non-key columns of a key only tuple (key_only, the old row of a Delete without REPLICA
+    IDENTITY FULL), which are sent as NULL.
+    """
+
+    __slots__ = ("checks",)
+
+    def __init__(self, checks: typing.Optional[typing.Sequence[PredicateCheck]]) -> None:
+        # None when a condition refers to a column the relation does not have, no row is kept
+        self.checks = checks
+
+    def __call__(
+        self, tuple_data: typing.Union[decoders.TupleData, decoders.LazyTupleData], key_only: bool = False
+    ) -> bool:
+        if self.checks is None:
+            return False
+        for position, key, texts, test, parse, parse_binary in self.checks:
+            if key_only and not key:
+                continue
+            value = tuple_data.get_value(position)
+            if value is None:
+                if tuple_data.get_category(position) != "u" and not test(None):
+                    return False
+            elif isinstance(value, str):
+                if value not in texts and not test(parse(value)):
+                    return False
+            elif not test(parse_binary(value)):
+                return False
+        return True
+
+
+def condition_test(condition: Condition) -> typing.Tuple[typing.Callable[[typing.Any], bool], typing.List[typing.Any]]:
+    """Test of a typed value for a condition, with the values it matches (none for callables)"""
+    if callable(condition):
+        return condition, []
+    values = list(condition) if isinstance(condition, (list, tuple, set, frozenset)) else [condition]
+    try:
+        hashed_values = frozenset(values)
+    except TypeError:  # unhashable values, e.g. lists for array columns
+        return values.__contains__, values
+
+    def test(value: typing.Any) -> bool:
+        try:
+            return value in hashed_values
+        except TypeError:  # unhashable typed value, e.g. jsonb objects
+            return value in values
+
+    return test, values
+
+
+def compile_predicate(
+    conditions: typing.Mapping[str, Condition], columns: typing.Sequence[ColumnLike], registry: ParserRegistry
+) -> RowPredicate:
+    """
+    Resolve the conditions by column name to the positions of the columns in the tuple data and their parsers. A value
+    whose text form is parsed back to the same value is also matched by that text form before parsing.
+    """
+    positions = {column.name: idx for idx, column in enumerate(columns)}
+    checks: typing.List[PredicateCheck] = []
+    for name, condition in conditions.items():
+        if name not in positions:
+            logger.warning(f"Row filter on missing column {name}, no rows of the table are kept")
+            return RowPredicate(checks=None)
+        position = positions[name]
+        parse = registry.get(columns[position].type_id)
+        test, values = condition_test(condition)
+        texts = set()
+        for value in values:
+            if value is None or isinstance(value, bool):
+                continue
+            try:
+                if parse(str(value)) == value:
+                    texts.add(str(value))
+            except (ValueError, TypeError, ArithmeticError):
+                pass
+        checks.append(
+            (
+                position,
+                columns[position].part_of_pkey,
+                frozenset(texts),
+                test,
+                parse,
+                registry.get_binary(columns[position].type_id),
+            )
+        )
+    return RowPredicate(checks=checks)
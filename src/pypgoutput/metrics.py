@@ -0,0 +1,229 @@
+import bisect
+import http.server
+import logging
+import threading
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+# upper bounds in seconds of the decode latency histogram buckets, the last bucket is +Inf
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01, 0.1, 1.0)
+
+Snapshot = typing.Dict[str, typing.Any]
+
+
+class Histogram:
+    """Counts of observations by bucket, with their sum, as a Prometheus histogram"""
+
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: typing.Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> typing.List[typing.Tuple[str, int]]:
+        """(upper bound, number of observations less or equal) of every bucket"""
+        output = []
+        running = 0
+        for bound, count in zip([str(bucket) for bucket in self.buckets] + ["+Inf"], self.counts):
+            running += count
+            output.append((bound, running))
+        return output
+
+
+class MetricsSink:
+    """Receives the metrics of a reader, every report_interval seconds and when the reader stops"""
+
+    def start(self, metrics: "ReplicationMetrics") -> None:
+        pass
+
+    def report(self, metrics: "ReplicationMetrics") -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class CallbackSink(MetricsSink):
+    """Calls callback with a snapshot of the metrics, see ReplicationMetrics.snapshot"""
+
+    def __init__(self, callback: typing.Callable[[Snapshot], None]) -> None:
+        self.callback = callback
+
+    def report(self, metrics: "ReplicationMetrics") -> None:
+        self.callback(metrics.snapshot())
+
+
+class PrometheusSink(MetricsSink):
+    """
+    Serves the metrics in the Prometheus text exposition format on http://host:port/metrics from a daemon thread.
+    Metrics are rendered when scraped, there is nothing to do when reporting.
+    """
+
+    def __init__(self, port: int = 9187, host: str = "127.0.0.1") -> None:
+        self.port = port
+        self.host = host
+        self.server: typing.Optional[http.server.ThreadingHTTPServer] = None
+
+    def start(self, metrics: "ReplicationMetrics") -> None:
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.exposition().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: typing.Any) -> None:
+                logger.debug(format % args)
+
+        self.server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        # the actual port when started on port 0
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="pypgoutput-metrics", daemon=True).start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class ReplicationMetrics:
+    """
+    Metrics of the replication pipeline of a reader: messages and bytes received by message type, decode latency by
+    message type, change events by relation, the messages (or ring bytes) waiting in the transport, the replication lag
+    in bytes and seconds and the number of catalog queries. Pass it to a reader with metrics, without it the reader is
+    not instrumented at all.
+
+    Counters are plain dicts updated in the reader's thread. Gauges owned by the reader (transport depth, lag in bytes,
+    catalog queries) are functions evaluated when a snapshot is taken. Sinks get the metrics every report_interval
+    seconds, checked as messages are read.
+    """
+
+    def __init__(
+        self,
+        sinks: typing.Iterable[MetricsSink] = (),
+        report_interval: float = 10.0,
+        buckets: typing.Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.sinks = list(sinks)
+        self.report_interval = report_interval
+        self.buckets = tuple(buckets)
+        self.messages: typing.Dict[str, int] = dict()
+        self.message_bytes: typing.Dict[str, int] = dict()
+        self.decode_seconds: typing.Dict[str, Histogram] = dict()
+        self.relation_events: typing.Dict[str, int] = dict()
+        # seconds between the server sending the last processed message and its processing
+        self.lag_seconds = 0.0
+        self.gauges: typing.Dict[str, typing.Callable[[], float]] = dict()
+        self.next_report = time.monotonic() + report_interval
+        for sink in self.sinks:
+            sink.start(self)
+
+    def observe_message(self, message_type: str, size: int) -> None:
+        self.messages[message_type] = self.messages.get(message_type, 0) + 1
+        self.message_bytes[message_type] = self.message_bytes.get(message_type, 0) + size
+
+    def observe_decode(self, message_type: str, seconds: float) -> None:
+        histogram = self.decode_seconds.get(message_type)
+        if histogram is None:
+            histogram = self.decode_seconds[message_type] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    def observe_events(self, relation: str, count: int = 1) -> None:
+        self.relation_events[relation] = self.relation_events.get(relation, 0) + count
+
+    def set_gauge(self, name: str, function: typing.Callable[[], float]) -> None:
+        self.gauges[name] = function
+
+    def maybe_report(self, now: float) -> None:
+        """Report to the sinks when report_interval seconds passed since the last report, now is time.monotonic()"""
+        if now >= self.next_report:
+            self.next_report = now + self.report_interval
+            self.report()
+
+    def report(self) -> None:
+        for sink in self.sinks:
+            try:
+                sink.report(self)
+            except Exception as err:
+                logger.warning(f"Failed to report metrics to {sink!r}: {err}")
+
+    def snapshot(self) -> Snapshot:
+        """Copy of the metrics, histograms as their count, sum and cumulative bucket counts"""
+        snapshot: Snapshot = {
+            "messages": dict(self.messages),
+            "message_bytes": dict(self.message_bytes),
+            "decode_seconds": {
+                message_type: {"count": histogram.count, "sum": histogram.total, "buckets": histogram.cumulative()}
+                for message_type, histogram in list(self.decode_seconds.items())
+            },
+            "relation_events": dict(self.relation_events),
+            "lag_seconds": self.lag_seconds,
+        }
+        for name, function in list(self.gauges.items()):
+            snapshot[name] = function()
+        return snapshot
+
+    def exposition(self) -> str:
+        """The metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines: typing.List[str] = []
+
+        def metric(name: str, kind: str, description: str) -> None:
+            lines.append(f"# HELP pgoutput_{name} {description}")
+            lines.append(f"# TYPE pgoutput_{name} {kind}")
+
+        metric("messages_total", "counter", "Replication messages received by message type")
+        lines.extend(f'pgoutput_messages_total{{type="{t}"}} {n}' for t, n in sorted(snapshot["messages"].items()))
+        metric("message_bytes_total", "counter", "Bytes of replication messages received by message type")
+        lines.extend(
+            f'pgoutput_message_bytes_total{{type="{t}"}} {n}' for t, n in sorted(snapshot["message_bytes"].items())
+        )
+        metric("decode_seconds", "histogram", "Time to decode and transform a message by message type")
+        for message_type, histogram in sorted(snapshot["decode_seconds"].items()):
+            for bound, count in histogram["buckets"]:
+                lines.append(f'pgoutput_decode_seconds_bucket{{type="{message_type}",le="{bound}"}} {count}')
+            lines.append(f'pgoutput_decode_seconds_sum{{type="{message_type}"}} {histogram["sum"]}')
+            lines.append(f'pgoutput_decode_seconds_count{{type="{message_type}"}} {histogram["count"]}')
+        metric("relation_events_total", "counter", "Change events emitted by relation")
+        lines.extend(
+            f'pgoutput_relation_events_total{{relation="{relation}"}} {n}'
+            for relation, n in sorted(snapshot["relation_events"].items())
+        )
+        metric("replication_lag_seconds", "gauge", "Seconds from the server sending a message to its processing")
+        lines.append(f"pgoutput_replication_lag_seconds {snapshot['lag_seconds']}")
+        for name in sorted(self.gauges):
+            kind = "counter" if name.endswith("_total") else "gauge"
+            metric(name, kind, GAUGE_DESCRIPTIONS.get(name, name))
+            lines.append(f"pgoutput_{name} {snapshot[name]}")
+        return "\n".join(lines) + "\n"
+
+    def close(self) -> None:
+        """Report a last time and close the sinks"""
+        self.report()
+        for sink in self.sinks:
+            sink.close()
+
+
+GAUGE_DESCRIPTIONS = {
+    "queue_depth": "Messages of the last batch received from the extractor not yet processed",
+    "ring_used_bytes": "Bytes of the shared memory ring written by the extractor and not yet released",
+    "replication_lag_bytes": "WAL end of the last message received minus the last processed LSN",
+    "catalog_queries_total": "Queries to the catalog of the source database",
+}
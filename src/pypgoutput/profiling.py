@@ -0,0 +1,206 @@
+import cProfile
+import logging
+import os
+import struct
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+RELATION_ID_STRUCT = struct.Struct("!i")
+
+# stages of converting a change: decode is the time of process_change not spent in the other stages, i.e. decoding
+# the message and checking row filters. convert is the compiled row converters, map and validate the
+# map_tuple_to_dict and pydantic models of strict_validation, event the creation of the change event
+STAGES = ("decode", "convert", "map", "validate", "event")
+
+# methods of ChangeTransformer timed as stages
+STAGE_METHODS = {
+    "convert_tuple": "convert",
+    "convert_key_tuple": "convert",
+    "map_tuple": "map",
+    "validate_row": "validate",
+    "make_event": "event",
+}
+
+
+class RelationCost:
+    """Changes of a relation timed by the profiler, their bytes and time by stage"""
+
+    __slots__ = ("rows", "bytes", "seconds", "stages")
+
+    def __init__(self) -> None:
+        self.rows = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.stages = dict.fromkeys(STAGES, 0.0)
+
+
+class StageProfiler:
+    """
+    Times the stages of converting changes to change events in a ChangeTransformer or reader, to attribute the cost of
+    the stream to a stage and to a relation (e.g. a wide table or a large JSON column) from within the process.
+
+    install() wraps process_change and the stage methods of the transformer instance, a transformer without a profiler
+    is not affected. Every sample_every-th change is timed, the other ones are only counted. Every interval seconds the
+    breakdown by stage and the cost per row by relation are passed to output (logged by default). With
+    cprofile_interval, the process is also profiled with cProfile and a pstats file is written to cprofile_dir every
+    cprofile_interval seconds, at a much higher overhead.
+
+    With decode workers the changes of committed transactions are converted in the worker processes, only the ones
+    converted in the reader's process (streamed transactions) are profiled.
+    """
+
+    def __init__(
+        self,
+        interval: float = 60.0,
+        sample_every: int = 1,
+        output: typing.Optional[typing.Callable[[str], None]] = None,
+        cprofile_interval: typing.Optional[float] = None,
+        cprofile_dir: typing.Optional[str] = None,
+        top: int = 20,
+    ) -> None:
+        if sample_every < 1:
+            raise ValueError("sample_every must be at least 1")
+        self.interval = interval
+        self.sample_every = sample_every
+        self.output = logger.info if output is None else output
+        self.cprofile_interval = cprofile_interval
+        self.cprofile_dir = "." if cprofile_dir is None else cprofile_dir
+        # number of relations in the cost table, by time spent
+        self.top = top
+        self.changes = 0
+        self.relations: typing.Dict[int, RelationCost] = dict()
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        # while timing a change, the seconds spent in the stages of the change so far
+        self.active = False
+        self.change_stages = dict.fromkeys(STAGES, 0.0)
+        self.labels: typing.Callable[[int], str] = str
+        self.profile: typing.Optional[cProfile.Profile] = None
+        self.snapshots = 0
+        now = time.perf_counter()
+        self.next_report = now + interval
+        self.next_snapshot = now + (cprofile_interval or 0.0)
+
+    def install(self, transformer: typing.Any) -> None:
+        """Time the changes processed by transformer, a ChangeTransformer"""
+        # rows are converted either by the row converters or, with strict_validation, mapped and validated
+        unused = ("convert",) if transformer.strict_validation else ("map", "validate")
+        for name, stage in STAGE_METHODS.items():
+            if stage in unused:
+                continue
+            setattr(transformer, name, self.timed(stage, getattr(transformer, name)))
+        transformer.process_change = self.timed_change(transformer.process_change)
+
+        def label(relation_id: int) -> str:
+            table_schema = transformer.table_schemas.get(relation_id)
+            return str(relation_id) if table_schema is None else f"{table_schema.schema_name}.{table_schema.table}"
+
+        self.labels = label
+        if self.cprofile_interval is not None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def timed(self, stage: str, function: typing.Callable[..., typing.Any]) -> typing.Callable[..., typing.Any]:
+        change_stages = self.change_stages
+
+        def wrapper(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+            if not self.active:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                change_stages[stage] += time.perf_counter() - start
+
+        return wrapper
+
+    def timed_change(self, process_change: typing.Callable[..., typing.Any]) -> typing.Callable[..., typing.Any]:
+        def wrapper(message: typing.Any, transaction: typing.Any) -> typing.Any:
+            self.changes += 1
+            if self.changes % self.sample_every:
+                return process_change(message=message, transaction=transaction)
+            for stage in STAGES:
+                self.change_stages[stage] = 0.0
+            self.active = True
+            start = time.perf_counter()
+            try:
+                events = process_change(message=message, transaction=transaction)
+                # Truncates are generators, their events are created here
+                if not isinstance(events, tuple):
+                    events = tuple(events)
+            finally:
+                self.active = False
+            end = time.perf_counter()
+            self.record(message.payload, end - start)
+            self.maybe_report(end)
+            return events
+
+        return wrapper
+
+    def record(self, payload: typing.Union[bytes, memoryview], seconds: float) -> None:
+        change_stages = self.change_stages
+        change_stages["decode"] = max(seconds - sum(change_stages.values()), 0.0)
+        for stage, stage_seconds in change_stages.items():
+            self.stages[stage] += stage_seconds
+        if payload[0] == ord("T"):
+            return  # the relations of a Truncate share its cost, they are only counted by stage
+        relation_id = RELATION_ID_STRUCT.unpack_from(payload, 1)[0]
+        cost = self.relations.get(relation_id)
+        if cost is None:
+            cost = self.relations[relation_id] = RelationCost()
+        cost.rows += 1
+        cost.bytes += len(payload)
+        cost.seconds += seconds
+        for stage, stage_seconds in change_stages.items():
+            cost.stages[stage] += stage_seconds
+
+    def maybe_report(self, now: float) -> None:
+        if now >= self.next_report:
+            self.next_report = now + self.interval
+            self.output(self.report())
+        if self.profile is not None and now >= self.next_snapshot:
+            self.next_snapshot = now + typing.cast(float, self.cprofile_interval)
+            self.snapshot()
+
+    def report(self) -> str:
+        """Breakdown of the timed changes by stage and cost per row of the relations taking the most time"""
+        total = sum(self.stages.values())
+        timed = sum(cost.rows for cost in self.relations.values())
+        lines = [f"Profiled {timed} of {self.changes} changes in {total:.3f}s"]
+        lines.append(f"{'stage':>10} {'seconds':>10} {'share':>7}")
+        for stage, seconds in self.stages.items():
+            lines.append(f"{stage:>10} {seconds:>10.3f} {seconds / total if total else 0.0:>7.1%}")
+        lines.append(
+            f"{'relation':>40} {'rows':>9} {'bytes/row':>10} {'us/row':>8} "
+            + " ".join(f"{stage:>9}" for stage in STAGES)
+        )
+        costs = sorted(self.relations.items(), key=lambda item: item[1].seconds, reverse=True)
+        for relation_id, cost in costs[: self.top]:
+            lines.append(
+                f"{self.labels(relation_id):>40} {cost.rows:>9} {cost.bytes / cost.rows:>10.0f} "
+                f"{cost.seconds / cost.rows * 1e6:>8.1f} "
+                + " ".join(f"{cost.stages[stage] / cost.rows * 1e6:>9.1f}" for stage in STAGES)
+            )
+        return "\n".join(lines)
+
+    def snapshot(self) -> typing.Optional[str]:
+        """Write the cProfile statistics since the last snapshot to a pstats file, returns its path"""
+        if self.profile is None:
+            return None
+        self.profile.disable()
+        self.snapshots += 1
+        path = os.path.join(self.cprofile_dir, f"pypgoutput-{os.getpid()}-{self.snapshots}.pstats")
+        self.profile.dump_stats(path)
+        logger.info(f"Wrote cProfile snapshot {path}")
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        return path
+
+    def close(self) -> None:
+        """Output a last report and stop profiling"""
+        self.output(self.report())
+        if self.profile is not None:
+            self.snapshot()
+            self.profile.disable()
+            self.profile = None
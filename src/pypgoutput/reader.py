@@ -1,9 +1,14 @@
 import logging
 import multiprocessing
+import select
+import signal
+import struct
+import sys
 import time
 import typing
 import uuid
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime
 from multiprocessing.connection import Connection
 from multiprocessing.context import Process
@@ -14,19 +19,91 @@ import psycopg2.extras
 import pydantic
 
 import pypgoutput.decoders as decoders
-from pypgoutput.utils import SourceDBHandler
+from pypgoutput.capture import CaptureWriter
+from pypgoutput.checkpoint import CheckpointStore
+from pypgoutput.converters import (
+    DEFAULT_REGISTRY,
+    BinaryColumnParser,
+    ColumnParser,
+    ParserRegistry,
+    RowConverter,
+)
+from pypgoutput.filters import ChangeFilter, RowPredicate, compile_predicate
+from pypgoutput.metrics import ReplicationMetrics
+from pypgoutput.profiling import StageProfiler
+from pypgoutput.streaming import BufferedMessage, StreamedTransaction
+from pypgoutput.transport import (
+    RingMessage,
+    SharedMemoryRing,
+    datetime_to_micros,
+    decode_frames,
+    encode_frame,
+)
+from pypgoutput.utils import CatalogCache, CatalogColumn, SourceDBHandler
 
 logger = logging.getLogger(__name__)
 
 
 class ReplicationMessage(pydantic.BaseModel):
-    message_id: pydantic.UUID4
+    """
+    Validated view of a raw replication message, for debugging and tests. The reader receives messages as frames,
+    see from_raw to inspect one.
+    """
+
     data_start: int
     payload: bytes
     send_time: datetime
     data_size: int
     wal_end: int
 
+    @classmethod
+    def from_raw(cls, msg: RingMessage) -> "ReplicationMessage":
+        return cls(
+            data_start=msg.data_start,
+            payload=bytes(msg.payload),
+            send_time=msg.send_time,
+            data_size=msg.data_size,
+            wal_end=msg.wal_end,
+        )
+
+
+# raw messages are decoded from the frames sent through the pipe or read in place from the shared memory ring,
+# changes of streamed transactions are replayed from a buffer once they commit
+RawMessage = typing.Union[ReplicationMessage, RingMessage, BufferedMessage]
+
+# message types of streamed changes that are buffered until the transaction commits
+STREAMED_CHANGE_TYPES = ("I", "U", "D", "T")
+
+
+# relation id following the message type byte of Relation, Insert, Update and Delete messages
+RELATION_ID_STRUCT = struct.Struct("!i")
+
+
+def change_id(commit_lsn: int, ordinal: int) -> uuid.UUID:
+    """
+    Identity of a change event, the commit LSN of its transaction and its ordinal within the transaction. The same
+    change gets the same id when the stream is read again, e.g. after a restart, so consumers can deduplicate on it.
+    """
+    return uuid.UUID(int=(commit_lsn << 64) | ordinal)
+
+
+TRUNCATE_BYTE = ord("T")
+
+
+def change_count(payload: typing.Union[bytes, memoryview]) -> int:
+    """Number of ordinals taken by a change message: one, or one per relation of a Truncate"""
+    return RELATION_ID_STRUCT.unpack_from(payload, 1)[0] if payload[0] == TRUNCATE_BYTE else 1
+
+
+def transaction_end_lsn(payload: typing.Union[bytes, memoryview]) -> typing.Optional[int]:
+    """End LSN of the transaction for Commit and Stream Commit messages, None for any other message"""
+    message_type = payload[:1]
+    if message_type == b"C":
+        return decoders.Commit(payload).lsn
+    if message_type == b"c":
+        return decoders.StreamCommit(payload).lsn
+    return None
+
 
 class ColumnDefinition(pydantic.BaseModel):
     name: str
@@ -52,7 +129,7 @@ class Transaction(pydantic.BaseModel):
 
 class ChangeEvent(pydantic.BaseModel):
     op: str  # (ENUM of I, U, D, T)
-    message_id: pydantic.UUID4
+    message_id: uuid.UUID  # see change_id
     lsn: int
     transaction: Transaction  # replication/source metadata
     table_schema: TableSchema
@@ -60,7 +137,184 @@ class ChangeEvent(pydantic.BaseModel):
     after: typing.Optional[typing.Dict[str, typing.Any]]
 
 
-def map_tuple_to_dict(tuple_data: decoders.TupleData, relation: TableSchema) -> typing.OrderedDict[str, typing.Any]:
+class CompactChangeEvent:
+    """
+    Lightweight change event yielded instead of ChangeEvent with compact_events. Rather than a copy of the table schema
+    it carries the relation id and the version of the schema in the reader's SchemaRegistry, the Transaction is shared
+    by all events of a transaction and nothing is validated. The message id is only created when it is read.
+    """
+
+    __slots__ = ("op", "ordinal", "lsn", "transaction", "relation_id", "schema_version", "before", "after")
+
+    def __init__(
+        self,
+        op: str,
+        ordinal: int,
+        lsn: int,
+        transaction: Transaction,
+        relation_id: int,
+        schema_version: int,
+        before: typing.Optional[typing.Dict[str, typing.Any]],
+        after: typing.Optional[typing.Dict[str, typing.Any]],
+    ) -> None:
+        self.op = op
+        # of the change within its transaction
+        self.ordinal = ordinal
+        self.lsn = lsn
+        self.transaction = transaction
+        self.relation_id = relation_id
+        self.schema_version = schema_version
+        self.before = before
+        self.after = after
+
+    @property
+    def message_id(self) -> uuid.UUID:
+        return change_id(self.transaction.begin_lsn, self.ordinal)
+
+    def to_change_event(self, schema_registry: "SchemaRegistry") -> ChangeEvent:
+        """The equivalent ChangeEvent with the table schema attached"""
+        return ChangeEvent.construct(
+            op=self.op,
+            message_id=self.message_id,
+            lsn=self.lsn,
+            transaction=self.transaction,
+            table_schema=schema_registry.get(relation_id=self.relation_id, version=self.schema_version),
+            before=self.before,
+            after=self.after,
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"CompactChangeEvent(op={self.op!r}, lsn={self.lsn}, relation_id={self.relation_id}, "
+            f"schema_version={self.schema_version}, before={self.before!r}, after={self.after!r})"
+        )
+
+
+AnyChangeEvent = typing.Union[ChangeEvent, CompactChangeEvent]
+
+
+class SchemaRegistry:
+    """
+    Table schemas by relation id and version. A Relation message registers a new version of the schema when it
+    changed, compact events and serializers refer to a schema by (relation_id, version) instead of embedding it.
+    """
+
+    def __init__(self) -> None:
+        self.versions: typing.Dict[int, int] = dict()  # current version by relation id
+        self.schemas: typing.Dict[typing.Tuple[int, int], TableSchema] = dict()
+
+    def register(self, table_schema: TableSchema, version: typing.Optional[int] = None) -> int:
+        """Add a schema as the current one of its relation and return its version, versions are assigned unless given"""
+        relation_id = table_schema.relation_id
+        current = self.versions.get(relation_id)
+        if version is None:
+            # Relation messages are sent again e.g. after a relcache invalidation, keep the version if nothing changed
+            if current is not None and self.schemas[(relation_id, current)] == table_schema:
+                return current
+            version = 1 if current is None else current + 1
+        self.schemas[(relation_id, version)] = table_schema
+        self.versions[relation_id] = version
+        return version
+
+    def version(self, relation_id: int) -> int:
+        return self.versions[relation_id]
+
+    def get(self, relation_id: int, version: typing.Optional[int] = None) -> TableSchema:
+        """Schema of a relation at a version, the current one by default"""
+        if version is None:
+            version = self.versions[relation_id]
+        return self.schemas[(relation_id, version)]
+
+
+class TransactionBatch:
+    """
+    Change events of one or more consecutive committed transactions, yielded by
+    LogicalReplicationReader.iter_transactions. begin_lsn is the one of the first transaction, commit_lsn, end_lsn and
+    commit_ts the ones of the last. Once the batch is written, end_lsn is the position to checkpoint.
+    """
+
+    __slots__ = ("xids", "begin_lsn", "commit_lsn", "end_lsn", "commit_ts", "events")
+
+    def __init__(
+        self,
+        xid: int,
+        begin_lsn: int,
+        commit_lsn: int,
+        end_lsn: int,
+        commit_ts: datetime,
+        events: typing.Optional[typing.List[AnyChangeEvent]] = None,
+    ) -> None:
+        self.xids = [xid]
+        self.begin_lsn = begin_lsn
+        self.commit_lsn = commit_lsn
+        self.end_lsn = end_lsn
+        self.commit_ts = commit_ts
+        self.events: typing.List[AnyChangeEvent] = [] if events is None else events
+
+    @property
+    def xid(self) -> int:
+        """xid of the last transaction"""
+        return self.xids[-1]
+
+    def merge(self, other: "TransactionBatch") -> None:
+        """Append the transactions of a batch committed after this one"""
+        self.xids.extend(other.xids)
+        self.commit_lsn = other.commit_lsn
+        self.end_lsn = other.end_lsn
+        self.commit_ts = other.commit_ts
+        self.events.extend(other.events)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __repr__(self) -> str:
+        return (
+            f"TransactionBatch(xids={self.xids}, begin_lsn={self.begin_lsn}, commit_lsn={self.commit_lsn}, "
+            f"end_lsn={self.end_lsn}, events={len(self.events)})"
+        )
+
+
+# what the transformation generators yield: change events, the (empty) batch of a transaction after its last event
+# and None when the stream is idle
+TransformedItem = typing.Union[ChangeEvent, CompactChangeEvent, TransactionBatch, None]
+
+
+def replication_options(publication_name: str, binary: bool = False, streaming: bool = False) -> typing.Dict[str, str]:
+    """pgoutput options, binary and streaming require PostgreSQL 14 or later"""
+    options = {"publication_names": publication_name, "proto_version": "1"}
+    if binary:
+        options["binary"] = "true"
+    if streaming:
+        options["proto_version"] = "2"
+        options["streaming"] = "on"
+    return options
+
+
+def check_server_version(conn: psycopg2.extensions.connection, binary: bool = False, streaming: bool = False) -> None:
+    if (binary or streaming) and conn.server_version < 140000:
+        conn.close()
+        raise ValueError(
+            f"binary and streaming modes require PostgreSQL 14 or later, server version is {conn.server_version}"
+        )
+
+
+def start_replication(
+    cur: psycopg2.extras.ReplicationCursor, slot_name: str, options: typing.Dict[str, str], start_lsn: int = 0
+) -> None:
+    """
+    Start replication from the slot, creating it first if it does not exist. The server streams from start_lsn or the
+    confirmed position of the slot, whichever is later (0 starts from the confirmed position).
+    """
+    try:
+        cur.start_replication(slot_name=slot_name, decode=False, options=options, start_lsn=start_lsn)
+    except psycopg2.ProgrammingError:
+        cur.create_replication_slot(slot_name, output_plugin="pgoutput")
+        cur.start_replication(slot_name=slot_name, decode=False, options=options, start_lsn=start_lsn)
+
+
+def map_tuple_to_dict(
+    tuple_data: typing.Union[decoders.TupleData, decoders.LazyTupleData], relation: TableSchema
+) -> typing.OrderedDict[str, typing.Any]:
     """Convert tuple data to an OrderedDict with keys from relation mapped in order to tuple data"""
     output: typing.OrderedDict[str, typing.Any] = OrderedDict()
     for idx, col in enumerate(tuple_data.column_data):
@@ -98,7 +352,311 @@ def convert_pg_type_to_py_type(pg_type_name: str) -> type:
         return str
 
 
-class LogicalReplicationReader:
+class ChangeTransformer:
+    """
+    Converts Insert, Update, Delete and Truncate messages to change events using the schemas of the relations seen so
+    far. Used by the reader and by the workers of the decode pool, which receive the schemas from the reader.
+    """
+
+    def __init__(
+        self,
+        strict_validation: bool = False,
+        parser_registry: typing.Optional[ParserRegistry] = None,
+        compact_events: bool = False,
+        change_filter: typing.Optional[ChangeFilter] = None,
+    ) -> None:
+        # validate rows with dynamically created pydantic models instead of the compiled row converters
+        self.strict_validation = strict_validation
+        self.parser_registry = DEFAULT_REGISTRY if parser_registry is None else parser_registry
+        # create CompactChangeEvents referring to the schema registry instead of ChangeEvents
+        self.compact_events = compact_events
+        # tables, columns and operations to emit change events for
+        self.change_filter = change_filter
+        if self.strict_validation and self.change_filter is not None and self.change_filter.columns:
+            raise ValueError("strict_validation validates whole rows, it cannot be used with column projections")
+
+        # transform data containers
+        self.table_schemas: typing.Dict[int, TableSchema] = dict()  # map relid to table schema
+        self.schema_registry = SchemaRegistry()  # every version of the table schemas
+        # schemas with all the columns of the relations, table_schemas only has the projected columns
+        self.source_schemas: typing.Dict[int, TableSchema] = dict()
+        # the source schema of every version in the schema registry, to convert changes streamed before a schema change
+        self.source_schema_versions: typing.Dict[typing.Tuple[int, int], TableSchema] = dict()
+        # relations filtered out, their changes are skipped before decoding the tuple data
+        self.skipped_relations: typing.Set[int] = set()
+        # relations with projected columns, their tuples are decoded lazily so other columns are never materialized
+        self.projected_relations: typing.Set[int] = set()
+        # for relations with row filters, the predicate rows must match to be converted to change events
+        self.row_predicates: typing.Dict[int, RowPredicate] = dict()
+
+        # ordinal within the transaction of the next change and of the change being processed, reset by the reader at
+        # the start of a transaction, see change_id
+        self.ordinal = 0
+        self.change_ordinal = 0
+
+        # for each relation store the converter of before/after tuples to typed values
+        self.row_converters: typing.Dict[int, RowConverter] = dict()
+
+        # in strict mode, for each relation store pydantic model applied to be before/after tuple
+        # key only is the schema for before messages that only contain the PK column changes
+        self.key_only_table_models: typing.Dict[int, typing.Type[TableSchema]] = dict()
+        self.table_models: typing.Dict[int, typing.Type[pydantic.BaseModel]] = dict()
+
+    def set_table_schema(self, table_schema: TableSchema, version: typing.Optional[int] = None) -> None:
+        """Set the schema of a relation with all its columns, the change filter is applied here"""
+        relation_id = table_schema.relation_id
+        source_schema = table_schema
+        positions: typing.Optional[typing.List[int]] = None
+        if self.change_filter is not None:
+            if not self.change_filter.accepts_table(schema_name=table_schema.schema_name, table=table_schema.table):
+                self.skip_relation(relation_id)
+                return
+            self.skipped_relations.discard(relation_id)
+            names = self.change_filter.columns_for(schema_name=table_schema.schema_name, table=table_schema.table)
+            if names is not None:
+                columns = source_schema.column_definitions
+                positions = [idx for idx, column in enumerate(columns) if column.name in names]
+                table_schema = source_schema.copy(update={"column_definitions": [columns[idx] for idx in positions]})
+            conditions = self.change_filter.conditions_for(
+                schema_name=table_schema.schema_name, table=table_schema.table
+            )
+            if conditions is None:
+                self.row_predicates.pop(relation_id, None)
+            else:
+                self.row_predicates[relation_id] = compile_predicate(
+                    conditions=conditions, columns=source_schema.column_definitions, registry=self.parser_registry
+                )
+        version = self.schema_registry.register(table_schema=table_schema, version=version)
+        self.source_schema_versions[(relation_id, version)] = source_schema
+        if self.strict_validation:
+            self.create_table_models(relation_id=relation_id, column_definitions=table_schema.column_definitions)
+        else:
+            # converters index the tuple data, which has all the columns
+            self.row_converters[relation_id] = RowConverter(
+                columns=source_schema.column_definitions, registry=self.parser_registry, positions=positions
+            )
+        if positions is None:
+            self.projected_relations.discard(relation_id)
+        else:
+            self.projected_relations.add(relation_id)
+        self.source_schemas[relation_id] = source_schema
+        self.table_schemas[relation_id] = table_schema
+
+    def use_schema_version(self, relation_id: int, version: int) -> None:
+        """Make version the current schema of a relation, e.g. to convert changes buffered before a Relation message"""
+        if self.schema_registry.versions.get(relation_id) != version:
+            self.set_table_schema(self.source_schema_versions[(relation_id, version)], version=version)
+
+    def skip_relation(self, relation_id: int) -> None:
+        self.skipped_relations.add(relation_id)
+        self.projected_relations.discard(relation_id)
+        self.row_predicates.pop(relation_id, None)
+        self.source_schemas.pop(relation_id, None)
+        self.table_schemas.pop(relation_id, None)
+        self.row_converters.pop(relation_id, None)
+
+    def is_filtered(self, payload: typing.Union[bytes, memoryview], relation_offset: int = 1) -> bool:
+        """Whether the change filter drops a change, read from its message type and relation id only"""
+        if self.change_filter is None:
+            return False
+        op = chr(payload[0])
+        if not self.change_filter.accepts_op(op):
+            return True
+        # the relations of a Truncate are filtered one by one
+        return op != "T" and RELATION_ID_STRUCT.unpack_from(payload, relation_offset)[0] in self.skipped_relations
+
+    def lazy_tuples(self, payload: typing.Union[bytes, memoryview]) -> bool:
+        if not self.projected_relations and not self.row_predicates:
+            return False
+        relation_id = RELATION_ID_STRUCT.unpack_from(payload, 1)[0]
+        return relation_id in self.projected_relations or relation_id in self.row_predicates
+
+    def create_table_models(self, relation_id: int, column_definitions: typing.List[ColumnDefinition]) -> None:
+        # in pydantic Ellipsis (...) indicates a field is required
+        # this should be the type below but it doesn't work as the kwargs for create_model with mppy
+        # schema_mapping_args: typing.Dict[str, typing.Tuple[type, typing.Optional[EllipsisType]]] = {
+        schema_mapping_args: typing.Dict[str, typing.Any] = {
+            c.name: (convert_pg_type_to_py_type(c.type_name), None if c.optional else ...) for c in column_definitions
+        }
+        self.table_models[relation_id] = pydantic.create_model(
+            f"DynamicSchemaModel_{relation_id}", **schema_mapping_args
+        )
+
+        # key only schema definition
+        # this is for REPLICA IDENTITY DEFAULT setting where only the old PK values are replicated for Update and Deletes
+        # https://www.postgresql.org/docs/12/sql-altertable.html#SQL-CREATETABLE-REPLICA-IDENTITY
+        key_only_schema_mapping_args: typing.Dict[str, typing.Any] = {
+            c.name: (convert_pg_type_to_py_type(c.type_name), None if c.optional else ...)
+            for c in column_definitions
+            if c.part_of_pkey is True
+        }
+        self.key_only_table_models[relation_id] = pydantic.create_model(
+            f"KeyDynamicSchemaModel_{relation_id}", **key_only_schema_mapping_args
+        )
+
+    def convert_tuple(
+        self, relation_id: int, tuple_data: typing.Union[decoders.TupleData, decoders.LazyTupleData]
+    ) -> typing.Dict[str, typing.Any]:
+        if self.strict_validation:
+            return self.validate_row(self.table_models[relation_id], self.map_tuple(relation_id, tuple_data))
+        return self.row_converters[relation_id].convert(tuple_data)
+
+    def convert_key_tuple(
+        self, relation_id: int, tuple_data: typing.Union[decoders.TupleData, decoders.LazyTupleData]
+    ) -> typing.Dict[str, typing.Any]:
+        if self.strict_validation:
+            return self.validate_row(self.key_only_table_models[relation_id], self.map_tuple(relation_id, tuple_data))
+        return self.row_converters[relation_id].convert_key(tuple_data)
+
+    def map_tuple(
+        self, relation_id: int, tuple_data: typing.Union[decoders.TupleData, decoders.LazyTupleData]
+    ) -> typing.Dict[str, typing.Any]:
+        return map_tuple_to_dict(tuple_data=tuple_data, relation=self.table_schemas[relation_id])
+
+    @staticmethod
+    def validate_row(
+        model: typing.Type[pydantic.BaseModel], raw: typing.Dict[str, typing.Any]
+    ) -> typing.Dict[str, typing.Any]:
+        return dict(model(**raw))
+
+    def make_event(
+        self,
+        op: str,
+        message: RawMessage,
+        transaction: Transaction,
+        relation_id: int,
+        before: typing.Optional[typing.Dict[str, typing.Any]],
+        after: typing.Optional[typing.Dict[str, typing.Any]],
+        index: int = 0,
+    ) -> AnyChangeEvent:
+        """
+        Change event of the change being processed, index is the position of the relation in a Truncate. The fields
+        come from the decoded message and the Transaction is shared by all events of the transaction, the event is
+        constructed without validating them again.
+        """
+        if self.compact_events:
+            return CompactChangeEvent(
+                op=op,
+                ordinal=self.change_ordinal + index,
+                lsn=message.data_start,
+                transaction=transaction,
+                relation_id=relation_id,
+                schema_version=self.schema_registry.version(relation_id),
+                before=before,
+                after=after,
+            )
+        return ChangeEvent.construct(
+            op=op,
+            message_id=change_id(transaction.begin_lsn, self.change_ordinal + index),
+            lsn=message.data_start,
+            transaction=transaction,
+            table_schema=self.table_schemas[relation_id],
+            before=before,
+            after=after,
+        )
+
+    def process_insert(self, message: RawMessage, transaction: Transaction) -> typing.Optional[AnyChangeEvent]:
+        """Change event of an Insert, None when the row filter of the relation drops the row"""
+        decoded_msg: decoders.Insert = decoders.Insert(message.payload, lazy_tuples=self.lazy_tuples(message.payload))
+        relation_id: int = decoded_msg.relation_id
+        predicate = self.row_predicates.get(relation_id)
+        if predicate is not None and not predicate(decoded_msg.new_tuple):
+            return None
+        return self.make_event(
+            op=decoded_msg.byte1,
+            message=message,
+            transaction=transaction,
+            relation_id=relation_id,
+            before=None,
+            after=self.convert_tuple(relation_id=relation_id, tuple_data=decoded_msg.new_tuple),
+        )
+
+    def process_update(self, message: RawMessage, transaction: Transaction) -> typing.Optional[AnyChangeEvent]:
+        """Change event of an Update, None when the row filter of the relation drops the new row"""
+        decoded_msg: decoders.Update = decoders.Update(message.payload, lazy_tuples=self.lazy_tuples(message.payload))
+        relation_id: int = decoded_msg.relation_id
+        predicate = self.row_predicates.get(relation_id)
+        if predicate is not None and not predicate(decoded_msg.new_tuple):
+            return None
+        before_typed: typing.Optional[typing.Dict[str, typing.Any]] = None
+        if decoded_msg.old_tuple:
+            if decoded_msg.optional_tuple_identifier == "O":
+                before_typed = self.convert_tuple(relation_id=relation_id, tuple_data=decoded_msg.old_tuple)
+            # if there is old tuple and not O then key only schema needed
+            else:
+                before_typed = self.convert_key_tuple(relation_id=relation_id, tuple_data=decoded_msg.old_tuple)
+        return self.make_event(
+            op=decoded_msg.byte1,
+            message=message,
+            transaction=transaction,
+            relation_id=relation_id,
+            before=before_typed,
+            after=self.convert_tuple(relation_id=relation_id, tuple_data=decoded_msg.new_tuple),
+        )
+
+    def process_delete(self, message: RawMessage, transaction: Transaction) -> typing.Optional[AnyChangeEvent]:
+        """
+        Change event of a Delete, None when the row filter of the relation drops the old row. Unless the table has
+        REPLICA IDENTITY FULL the old row only has the key columns, conditions on the other columns don't drop it.
+        """
+        decoded_msg: decoders.Delete = decoders.Delete(message.payload, lazy_tuples=self.lazy_tuples(message.payload))
+        relation_id: int = decoded_msg.relation_id
+        predicate = self.row_predicates.get(relation_id)
+        if predicate is not None and not predicate(decoded_msg.old_tuple, key_only=decoded_msg.message_type == "K"):
+            return None
+        if decoded_msg.message_type == "O":
+            # O is from REPLICA IDENTITY FULL and therefore has all columns in before message
+            before_typed = self.convert_tuple(relation_id=relation_id, tuple_data=decoded_msg.old_tuple)
+        else:
+            # message type is K and means only replica identity index is present in before tuple
+            # only DEFAULT is implemented so the index can only be the primary key
+            before_typed = self.convert_key_tuple(relation_id=relation_id, tuple_data=decoded_msg.old_tuple)
+        return self.make_event(
+            op=decoded_msg.byte1,
+            message=message,
+            transaction=transaction,
+            relation_id=relation_id,
+            before=before_typed,
+            after=None,
+        )
+
+    def process_truncate(self, message: RawMessage, transaction: Transaction) -> typing.List[AnyChangeEvent]:
+        decoded_msg: decoders.Truncate = decoders.Truncate(message.payload)
+        return [
+            self.make_event(
+                op=decoded_msg.byte1,
+                message=message,
+                transaction=transaction,
+                relation_id=relation_id,
+                before=None,
+                after=None,
+                index=index,
+            )
+            for index, relation_id in enumerate(decoded_msg.relation_ids)
+            # relations of a filtered out table are skipped
+            if self.change_filter is None or relation_id in self.table_schemas
+        ]
+
+    def process_change(self, message: RawMessage, transaction: Transaction) -> typing.Iterable[AnyChangeEvent]:
+        # filtered changes take their ordinals too, ids do not depend on the change filter
+        self.change_ordinal = self.ordinal
+        self.ordinal += change_count(message.payload)
+        if self.is_filtered(message.payload):
+            return ()
+        message_type = chr(message.payload[0])
+        event: typing.Optional[AnyChangeEvent] = None
+        if message_type == "I":
+            event = self.process_insert(message=message, transaction=transaction)
+        elif message_type == "U":
+            event = self.process_update(message=message, transaction=transaction)
+        elif message_type == "D":
+            event = self.process_delete(message=message, transaction=transaction)
+        elif message_type == "T":
+            return self.process_truncate(message=message, transaction=transaction)
+        return () if event is None else (event,)
+
+
+class LogicalReplicationReader(ChangeTransformer):
     """
     1. One process continuously extracts (ExtractRaw) raw messages
         a. Uses pyscopg2's LogicalReplicationConnection and replication expert
@@ -109,41 +667,203 @@ class LogicalReplicationReader:
            from previous messages and by looking up values in the source DBs catalog
     """
 
+    # number of messages read from the shared memory ring after which processed LSNs are acknowledged
+    ring_ack_interval: int = 1000
+    # seconds the raw readers wait for new messages before reporting that the stream is idle
+    idle_timeout: float = 0.5
+
     def __init__(
         self,
         publication_name: str,
         slot_name: str,
         dsn: typing.Optional[str] = None,
+        batch_size: int = 1,
+        batch_max_latency: float = 0.1,
+        feedback_interval: float = 1.0,
+        feedback_bytes: int = 16 * 1024 * 1024,
+        shared_memory_size: typing.Optional[int] = None,
+        prefetch_catalog: bool = False,
+        strict_validation: bool = False,
+        type_parsers: typing.Optional[typing.Mapping[int, ColumnParser]] = None,
+        binary: bool = False,
+        binary_type_parsers: typing.Optional[typing.Mapping[int, BinaryColumnParser]] = None,
+        streaming: bool = False,
+        stream_spill_threshold: typing.Optional[int] = None,
+        stream_spill_dir: typing.Optional[str] = None,
+        decode_workers: int = 0,
+        compact_events: bool = False,
+        include_tables: typing.Optional[typing.Iterable[str]] = None,
+        exclude_tables: typing.Optional[typing.Iterable[str]] = None,
+        table_columns: typing.Optional[typing.Mapping[str, typing.Iterable[str]]] = None,
+        ops: typing.Optional[typing.Iterable[str]] = None,
+        row_filters: typing.Optional[typing.Mapping[str, typing.Mapping[str, typing.Any]]] = None,
+        checkpoint_path: typing.Optional[str] = None,
+        checkpoint_interval: float = 0.1,
+        capture_path: typing.Optional[str] = None,
+        capture_compress: bool = False,
+        metrics: typing.Optional[ReplicationMetrics] = None,
+        profiler: typing.Optional[StageProfiler] = None,
         **kwargs: typing.Optional[str],
     ) -> None:
         self.dsn = psycopg2.extensions.make_dsn(dsn=dsn, **kwargs)
         self.publication_name = publication_name
         self.slot_name = slot_name
-
-        # transform data containers
-        self.table_schemas: typing.Dict[int, TableSchema] = dict()  # map relid to table schema
-
-        # for each relation store pydantic model applied to be before/after tuple
-        # key only is the schema for before messages that only contain the PK column changes
-        self.key_only_table_models: typing.Dict[int, typing.Type[TableSchema]] = dict()
-        self.table_models: typing.Dict[int, typing.Type[pydantic.BaseModel]] = dict()
+        # batch_size > 1 switches the pipe to batched transport, see ExtractRaw
+        self.batch_size = batch_size
+        self.batch_max_latency = batch_max_latency
+        self.feedback_interval = feedback_interval
+        self.feedback_bytes = feedback_bytes
+        # size in bytes of the shared memory ring buffer, setting it switches to the ring transport
+        self.shared_memory_size = shared_memory_size
+        # load catalog metadata of all tables in the publication at startup instead of per Relation message
+        self.prefetch_catalog = prefetch_catalog
+        # request column values in the binary send format of their types (PG14+)
+        self.binary = binary
+        if self.binary and strict_validation:
+            raise ValueError(
+                "strict_validation only supports text formatted column values, it cannot be used with binary"
+            )
+        # receive large in-progress transactions in chunks (protocol version 2, PG14+), buffered until they commit
+        # a streamed transaction is spilled to a temporary file in stream_spill_dir after stream_spill_threshold bytes
+        self.streaming = streaming
+        self.stream_spill_threshold = stream_spill_threshold
+        self.stream_spill_dir = stream_spill_dir
+        self.streamed_transactions: typing.Dict[int, StreamedTransaction] = dict()
+        # xid of the transaction between Stream Start and Stream Stop
+        self.stream_xid: typing.Optional[int] = None
+        # batch of the transaction committed by the last message, yielded after its events
+        self.committed: typing.Optional[TransactionBatch] = None
+        # parsers by type OID, type_parsers and binary_type_parsers override or extend the defaults
+        self.type_parsers = type_parsers
+        self.binary_type_parsers = binary_type_parsers
+        # only emit changes of the tables matching the "schema.table" glob patterns, of the columns listed for them and
+        # of the operations in ops, filtered changes are skipped without decoding their tuple data
+        # row_filters map table patterns to conditions by column name, e.g. {"public.*": {"tenant_id": 42}}, checked
+        # on the raw values before rows are converted
+        change_filter: typing.Optional[ChangeFilter] = None
+        if any(arg is not None for arg in (include_tables, exclude_tables, table_columns, ops, row_filters)):
+            change_filter = ChangeFilter(
+                include_tables=include_tables,
+                exclude_tables=exclude_tables,
+                columns=table_columns,
+                ops=ops,
+                rows=row_filters,
+            )
+        ChangeTransformer.__init__(
+            self,
+            strict_validation=strict_validation,
+            parser_registry=ParserRegistry(overrides=type_parsers, binary_overrides=binary_type_parsers),
+            compact_events=compact_events,
+            change_filter=change_filter,
+        )
+        # file recording the last transaction whose change events were all consumed, fsynced at most every
+        # checkpoint_interval seconds. On restart replication resumes from it and delivered transactions are skipped
+        self.checkpoint: typing.Optional[CheckpointStore] = None
+        if checkpoint_path is not None:
+            self.checkpoint = CheckpointStore(path=checkpoint_path, flush_interval=checkpoint_interval)
+        # whether the changes of the current transaction were delivered before the last restart
+        self.transaction_delivered = False
+        # end LSN of the last transaction whose change events were all consumed, acknowledged to the extractor
+        self.processed_lsn = 0 if self.checkpoint is None else self.checkpoint.end_lsn
+        # number of worker processes decoding whole transactions in parallel, 0 decodes in this process
+        self.decode_workers = decode_workers
+        # the extractor also writes the raw messages to a capture file, to be replayed with ReplayReader
+        self.capture_path = capture_path
+        self.capture_compress = capture_compress
+        # instrument the pipeline and report to the sinks of metrics, nothing is measured without it
+        self.metrics = metrics
+        # time the stages of converting changes by relation, see StageProfiler
+        self.profiler = profiler
+        if self.profiler is not None:
+            self.profiler.install(self)
 
         # save map of type oid to readable name
         self.pg_types: typing.Dict[int, str] = dict()
         self.setup()
 
     def setup(self) -> None:
+        if self.decode_workers and self.batch_size == 1 and self.shared_memory_size is None:
+            raise ValueError("decode_workers requires the batched (batch_size > 1) or shared memory transport")
         self.pipe_out_conn, self.pipe_in_conn = multiprocessing.Pipe(duplex=True)
+        self.ring: typing.Optional[SharedMemoryRing] = None
+        if self.shared_memory_size is not None:
+            self.ring = SharedMemoryRing(size=self.shared_memory_size)
         self.extractor = ExtractRaw(
-            pipe_conn=self.pipe_in_conn, dsn=self.dsn, publication_name=self.publication_name, slot_name=self.slot_name
+            pipe_conn=self.pipe_in_conn,
+            dsn=self.dsn,
+            publication_name=self.publication_name,
+            slot_name=self.slot_name,
+            batch_size=self.batch_size,
+            batch_max_latency=self.batch_max_latency,
+            feedback_interval=self.feedback_interval,
+            feedback_bytes=self.feedback_bytes,
+            ring=self.ring,
+            binary=self.binary,
+            streaming=self.streaming,
+            start_lsn=self.processed_lsn,
+            capture_path=self.capture_path,
+            capture_compress=self.capture_compress,
         )
         self.extractor.connect()
         self.extractor.start()
+        self.setup_catalog()
+        # TODO: make some aspect of this output configurable, raw msg return
+        self.raw_msgs: typing.Generator[typing.Optional[RawMessage], None, None]
+        self.transformed_msgs: typing.Generator[TransformedItem, None, None]
+        if self.ring is not None:
+            self.raw_msgs = self.read_raw_ring(ring=self.ring)
+        elif self.batch_size > 1:
+            self.raw_msgs = self.read_raw_batches()
+        else:
+            self.raw_msgs = self.read_raw_extracted()
+        self.setup_transform()
+
+    def setup_transform(self) -> None:
+        """Transform the raw messages, in this process or in the decode pool"""
+        self.setup_metrics()
+        if self.metrics is not None:
+            self.raw_msgs = self.measure_raw(message_stream=self.raw_msgs)
+        self.decode_pool: typing.Optional[DecodePool] = None
+        if self.decode_workers:
+            self.decode_pool = DecodePool(
+                workers=self.decode_workers,
+                strict_validation=self.strict_validation,
+                type_parsers=self.type_parsers,
+                binary_type_parsers=self.binary_type_parsers,
+                compact_events=self.compact_events,
+                change_filter=self.change_filter,
+            )
+            self.transformed_msgs = self.transform_parallel(message_stream=self.raw_msgs, decode_pool=self.decode_pool)
+        else:
+            self.transformed_msgs = self.transform_raw(message_stream=self.raw_msgs)
+
+    def setup_metrics(self) -> None:
+        """Register the gauges measured from the state of the reader"""
+        # messages received from the extractor in batches, WAL end of the last message received
+        self.received_messages = 0
+        self.received_wal_end = self.processed_lsn
+        # "schema.table" labels of the relations by relation id, reset by Relation messages
+        self.relation_labels: typing.Dict[int, str] = dict()
+        metrics = self.metrics
+        if metrics is None:
+            return
+        metrics.set_gauge("replication_lag_bytes", lambda: max(self.received_wal_end - self.processed_lsn, 0))
+        # replays have no source database nor transport
+        handler = getattr(self, "source_db_handler", None)
+        if handler is not None:
+            metrics.set_gauge("catalog_queries_total", lambda: handler.query_count)
+        ring = getattr(self, "ring", None)
+        if ring is not None:
+            metrics.set_gauge("ring_used_bytes", lambda: ring.head() - ring.tail())
+        elif self.batch_size > 1:
+            metrics.set_gauge("queue_depth", lambda: self.received_messages - sum(metrics.messages.values()))
+
+    def setup_catalog(self) -> None:
         self.source_db_handler = SourceDBHandler(dsn=self.dsn)
         self.database = self.source_db_handler.conn.get_dsn_parameters()["dbname"]
-        # TODO: make some aspect of this output configurable, raw msg return
-        self.raw_msgs = self.read_raw_extracted()
-        self.transformed_msgs = self.transform_raw(message_stream=self.raw_msgs)
+        self.catalog = CatalogCache(handler=self.source_db_handler)
+        if self.prefetch_catalog:
+            self.catalog.prefetch(publication_name=self.publication_name)
 
     def stop(self) -> None:
         """Stop reader process and close the pipe"""
@@ -153,238 +873,919 @@ class LogicalReplicationReader:
         self.pipe_out_conn.close()
         self.pipe_in_conn.close()
         self.extractor.close()
+        if self.decode_pool is not None:
+            self.decode_pool.shutdown()
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+        if self.metrics is not None:
+            self.metrics.close()
+        if self.profiler is not None:
+            self.profiler.close()
+        if self.ring is not None:
+            try:
+                self.ring.close()
+            except BufferError as err:
+                logger.warning(f"Shared memory ring is still in use while closing: {err}")
+            self.ring.unlink()
 
-    def read_raw_extracted(self) -> typing.Generator[ReplicationMessage, None, None]:
-        """yields ReplicationMessages from the pipe as written by extractor process"""
+    def read_raw_extracted(self) -> typing.Generator[typing.Optional[RingMessage], None, None]:
+        """yields RingMessages decoded from the frames sent through the pipe by the extractor process, None when
+        idle"""
         empty_count = 0
         iter_count = 0
         msg_count = 0
         while True:
-            if not self.pipe_out_conn.poll(timeout=0.5):
+            if not self.pipe_out_conn.poll(timeout=self.idle_timeout):
                 empty_count += 1
+                yield None
             else:
-                item = self.pipe_out_conn.recv()
+                (item,) = decode_frames(self.pipe_out_conn.recv_bytes())
                 msg_count += 1
                 yield item
-                self.pipe_out_conn.send({"id": item.message_id})
+                self.pipe_out_conn.send({"data_start": item.data_start})
+            if iter_count % 50 == 0:
+                logger.debug(f"pipe poll count: {iter_count}, messages processed: {msg_count}")
+            iter_count += 1
+
+    def read_raw_batches(self) -> typing.Generator[typing.Optional[RingMessage], None, None]:
+        """yields RingMessages from the batches of frames sent by the extractor process in batched mode, None when
+        idle
+
+        Once every message of a batch has been processed, the end LSN of the last fully processed transaction
+        (processed_lsn) is sent back as a high watermark. The extractor does not wait for it, it confirms the LSN
+        whenever the ack arrives.
+        """
+        iter_count = 0
+        msg_count = 0
+        acked_lsn = 0
+        while True:
+            if self.pipe_out_conn.poll(timeout=self.idle_timeout):
+                batch = decode_frames(self.pipe_out_conn.recv_bytes())
+                self.received_messages += len(batch)
+                for item in batch:
+                    msg_count += 1
+                    yield item
+            else:
+                yield None
+            if self.processed_lsn > acked_lsn:
+                acked_lsn = self.processed_lsn
+                self.pipe_out_conn.send({"lsn": acked_lsn})
             if iter_count % 50 == 0:
                 logger.debug(f"pipe poll count: {iter_count}, messages processed: {msg_count}")
             iter_count += 1
 
+    def read_raw_ring(self, ring: SharedMemoryRing) -> typing.Generator[typing.Optional[RingMessage], None, None]:
+        """yields RingMessages read in place from the shared memory ring written by the extractor process, None when
+        idle
+
+        The space of a message is released when the next one is requested, i.e. after it was processed. When the ring
+        is empty the consumer announces it is waiting and sleeps on the pipe until the extractor writes again. The end
+        LSN of the last fully processed transaction (processed_lsn) is acknowledged when the ring is drained or every
+        `ring_ack_interval` messages.
+        """
+        msg_count = 0
+        acked_lsn = 0
+        while True:
+            item = ring.read()
+            if item is None:
+                if self.processed_lsn > acked_lsn:
+                    acked_lsn = self.processed_lsn
+                    self.pipe_out_conn.send({"lsn": acked_lsn})
+                ring.set_waiting(True)
+                # check again after announcing, the extractor may have written in between
+                item = ring.read()
+                if item is None:
+                    # the timeout bounds latency should a wakeup be missed
+                    if self.pipe_out_conn.poll(timeout=min(0.05, self.idle_timeout)):
+                        while self.pipe_out_conn.poll():
+                            self.pipe_out_conn.recv_bytes()
+                    ring.set_waiting(False)
+                    yield None
+                    continue
+                ring.set_waiting(False)
+            msg_count += 1
+            yield item
+            if msg_count % self.ring_ack_interval == 0 and self.processed_lsn > acked_lsn:
+                acked_lsn = self.processed_lsn
+                self.pipe_out_conn.send({"lsn": acked_lsn})
+
+    def measure_raw(
+        self, message_stream: typing.Iterable[typing.Optional[RawMessage]]
+    ) -> typing.Generator[typing.Optional[RawMessage], None, None]:
+        metrics = typing.cast(ReplicationMetrics, self.metrics)
+        for msg in message_stream:
+            if msg is None:
+                metrics.maybe_report(time.monotonic())
+            else:
+                self.observe_received(msg)
+            yield msg
+
+    def observe_received(self, msg: RawMessage) -> None:
+        """Counts the message by type and measures the lag of the stream"""
+        metrics = typing.cast(ReplicationMetrics, self.metrics)
+        payload = msg.payload
+        metrics.observe_message(chr(payload[0]), len(payload))
+        if isinstance(msg, RingMessage):
+            self.received_wal_end = msg.wal_end
+            metrics.lag_seconds = time.time() - msg.send_time_micros / 1_000_000
+        elif isinstance(msg, ReplicationMessage):
+            self.received_wal_end = msg.wal_end
+            metrics.lag_seconds = time.time() - msg.send_time.timestamp()
+        metrics.maybe_report(time.monotonic())
+
+    def measure_transform(self, msg: RawMessage) -> typing.Iterable[AnyChangeEvent]:
+        """transform_message, timing the message by type and counting its change events by relation"""
+        metrics = typing.cast(ReplicationMetrics, self.metrics)
+        message_type = chr(msg.payload[0])
+        start = time.perf_counter()
+        events = self.transform_message(msg=msg)
+        metrics.observe_decode(message_type, time.perf_counter() - start)
+        if message_type == "R":
+            self.relation_labels.clear()
+        if isinstance(events, (tuple, list)):
+            for event in events:
+                metrics.observe_events(self.relation_label(event))
+            return events
+        # replayed streamed transactions are generators, counted as they are consumed
+        return self.count_events(events)
+
+    def count_events(self, events: typing.Iterable[AnyChangeEvent]) -> typing.Generator[AnyChangeEvent, None, None]:
+        metrics = typing.cast(ReplicationMetrics, self.metrics)
+        for event in events:
+            metrics.observe_events(self.relation_label(event))
+            yield event
+
+    def relation_label(self, event: AnyChangeEvent) -> str:
+        relation_id = event.relation_id if isinstance(event, CompactChangeEvent) else event.table_schema.relation_id
+        label = self.relation_labels.get(relation_id)
+        if label is None:
+            table_schema = self.table_schemas.get(relation_id)
+            label = str(relation_id) if table_schema is None else f"{table_schema.schema_name}.{table_schema.table}"
+            self.relation_labels[relation_id] = label
+        return label
+
     def transform_raw(
-        self, message_stream: typing.Generator[ReplicationMessage, None, None]
-    ) -> typing.Generator[ChangeEvent, None, None]:
+        self, message_stream: typing.Iterable[typing.Optional[RawMessage]]
+    ) -> typing.Generator[TransformedItem, None, None]:
+        transform = self.transform_message if self.metrics is None else self.measure_transform
+        for msg in message_stream:
+            if msg is None:
+                yield None
+                continue
+            yield from transform(msg=msg)
+            if self.committed is not None:
+                yield self.committed
+                self.committed = None
+
+    def transform_parallel(
+        self, message_stream: typing.Iterable[typing.Optional[RawMessage]], decode_pool: "DecodePool"
+    ) -> typing.Generator[TransformedItem, None, None]:
+        """
+        Fans the changes of whole transactions out to the decode pool and yields the change events in commit order.
+
+        Relation and stream messages are processed here, as they need the catalog and the order of the stream. The
+        changes of a transaction are sent to a worker on Commit, with the schemas of the relations they reference.
+        A Relation message for a relation already referenced in the transaction splits it into segments, so earlier
+        changes are decoded with the earlier schema. A transaction counts as processed once its events are consumed.
+        """
+        job: typing.Optional[DecodeJob] = None
+        transform = self.transform_message if self.metrics is None else self.measure_transform
         for msg in message_stream:
-            message_type = (msg.payload[:1]).decode("utf-8")
-            if message_type == "R":
-                self.process_relation(message=msg)
-            elif message_type == "B":
-                transaction_metadata = self.process_begin(message=msg)
-            # message processors below will throw an error if transaction_metadata doesn't exist
-            elif message_type == "I":
-                yield self.process_insert(message=msg, transaction=transaction_metadata)
-            elif message_type == "U":
-                yield self.process_update(message=msg, transaction=transaction_metadata)
-            elif message_type == "D":
-                yield self.process_delete(message=msg, transaction=transaction_metadata)
-            elif message_type == "T":
-                yield from self.process_truncate(message=msg, transaction=transaction_metadata)
-            elif message_type == "C":
-                del transaction_metadata  # null out this value after commit
-
-    def process_relation(self, message: ReplicationMessage) -> None:
-        relation_msg: decoders.Relation = decoders.Relation(message.payload)
+            if msg is None:
+                # the stream is idle, wait for the transactions in flight
+                yield from self.yield_decoded(decode_pool=decode_pool, block=True)
+                yield None
+                continue
+            message_type = chr(msg.payload[0])
+            if self.stream_xid is None:
+                if message_type in STREAMED_CHANGE_TYPES and job is not None:
+                    ordinal = self.ordinal
+                    self.ordinal += change_count(msg.payload)
+                    if not self.transaction_delivered and not self.is_filtered(msg.payload):
+                        job.add(
+                            message=msg,
+                            schema_registry=self.schema_registry,
+                            source_schemas=self.source_schemas,
+                            ordinal=ordinal,
+                        )
+                    continue
+                elif message_type == "B":
+                    job = DecodeJob(transaction=self.process_begin(message=msg))
+                    self.ordinal = 0
+                    self.transaction_delivered = self.is_delivered(job.transaction)
+                    continue
+                elif message_type == "C" and job is not None:
+                    job.commit = self.process_commit(message=msg, transaction=job.transaction)
+                    decode_pool.submit(job=job)
+                    job = None
+                    yield from self.yield_decoded(decode_pool=decode_pool, block=False)
+                    continue
+                elif message_type == "R" and job is not None:
+                    if RELATION_ID_STRUCT.unpack_from(msg.payload, 1)[0] in job.schemas:
+                        decode_pool.submit(job=job)
+                        job = DecodeJob(transaction=job.transaction)
+                elif message_type == "c":
+                    # streamed transactions are replayed here, after the transactions committed before them
+                    yield from self.yield_decoded(decode_pool=decode_pool, block=True)
+            yield from transform(msg=msg)
+            if self.committed is not None:
+                yield self.committed
+                self.committed = None
+
+    def yield_decoded(self, decode_pool: "DecodePool", block: bool) -> typing.Generator[TransformedItem, None, None]:
+        for commit, events in decode_pool.completed(block=block):
+            if self.metrics is not None:
+                for event in events:
+                    self.metrics.observe_events(self.relation_label(event))
+            yield from events
+            if commit is not None:
+                yield commit
+
+    def transform_message(self, msg: RawMessage) -> typing.Iterable[AnyChangeEvent]:
+        """Process one raw message, returns the change events it produced (if any)"""
+        message_type = chr(msg.payload[0])
+        if self.stream_xid is not None:
+            if message_type == "E":
+                self.stream_xid = None
+            elif message_type == "R":
+                self.process_relation(message=msg, streamed=True)
+            elif message_type in STREAMED_CHANGE_TYPES:
+                # filtered changes are buffered without their data, they only take their ordinals on replay
+                filtered = self.is_filtered(msg.payload, relation_offset=5)
+                # changes are converted with the schema of their relation when they were streamed
+                schema_version = None
+                if message_type != "T" and not filtered:
+                    relation_id = RELATION_ID_STRUCT.unpack_from(msg.payload, 5)[0]
+                    schema_version = self.schema_registry.versions.get(relation_id)
+                self.streamed_transactions[self.stream_xid].append(
+                    msg.data_start, msg.payload, schema_version, filtered
+                )
+            return ()
+        if message_type == "R":
+            self.process_relation(message=msg)
+        elif message_type == "B":
+            self.transaction = self.process_begin(message=msg)
+            self.ordinal = 0
+            self.transaction_delivered = self.is_delivered(self.transaction)
+        # message processors below will throw an error if the transaction doesn't exist
+        elif message_type in STREAMED_CHANGE_TYPES:
+            if self.transaction_delivered:
+                return ()
+            return self.process_change(message=msg, transaction=self.transaction)
+        elif message_type == "C":
+            self.committed = self.process_commit(message=msg, transaction=self.transaction)
+            del self.transaction  # null out this value after commit
+        elif message_type == "S":
+            self.stream_xid = self.process_stream_start(message=msg)
+        elif message_type == "c":
+            return self.process_stream_commit(message=msg)
+        elif message_type == "A":
+            self.process_stream_abort(message=msg)
+        return ()
+
+    def process_relation(self, message: RawMessage, streamed: bool = False) -> None:
+        relation_msg: decoders.Relation = decoders.Relation(message.payload, streamed=streamed)
         relation_id = relation_msg.relation_id
+        if self.change_filter is not None and not self.change_filter.accepts_table(
+            schema_name=relation_msg.namespace, table=relation_msg.relation_name
+        ):
+            # the columns of filtered tables are not looked up in the catalog
+            self.skip_relation(relation_id)
+            return
+        # type names and nullability of all columns come from the catalog cache, at most one query per relation
+        catalog_columns = self.catalog.get_columns(
+            relation_id=relation_id,
+            table_schema=relation_msg.namespace,
+            table_name=relation_msg.relation_name,
+            columns=[(c.name, c.type_id, c.atttypmod) for c in relation_msg.columns],
+        )
         column_definitions: typing.List[ColumnDefinition] = []
-        for column in relation_msg.columns:
-            self.pg_types[column.type_id] = self.source_db_handler.fetch_column_type(
-                type_id=column.type_id, atttypmod=column.atttypmod
-            )
+        for column, catalog_column in zip(relation_msg.columns, catalog_columns):
+            self.pg_types[column.type_id] = catalog_column.type_name
             # pre-compute schema of the table for attaching to messages
-            is_optional = self.source_db_handler.fetch_if_column_is_optional(
-                table_schema=relation_msg.namespace, table_name=relation_msg.relation_name, column_name=column.name
-            )
             column_definitions.append(
                 ColumnDefinition(
                     name=column.name,
                     part_of_pkey=column.part_of_pkey,
                     type_id=column.type_id,
-                    type_name=self.pg_types[column.type_id],
-                    optional=is_optional,
+                    type_name=catalog_column.type_name,
+                    optional=catalog_column.optional,
                 )
             )
-        # in pydantic Ellipsis (...) indicates a field is required
-        # this should be the type below but it doesn't work as the kwargs for create_model with mppy
-        # schema_mapping_args: typing.Dict[str, typing.Tuple[type, typing.Optional[EllipsisType]]] = {
-        schema_mapping_args: typing.Dict[str, typing.Any] = {
-            c.name: (convert_pg_type_to_py_type(c.type_name), None if c.optional else ...) for c in column_definitions
-        }
-        self.table_models[relation_id] = pydantic.create_model(
-            f"DynamicSchemaModel_{relation_id}", **schema_mapping_args
-        )
-
-        # key only schema definition
-        # this is for REPLICA IDENTITY DEFAULT setting where only the old PK values are replicated for Update and Deletes
-        # https://www.postgresql.org/docs/12/sql-altertable.html#SQL-CREATETABLE-REPLICA-IDENTITY
-        key_only_schema_mapping_args: typing.Dict[str, typing.Any] = {
-            c.name: (convert_pg_type_to_py_type(c.type_name), None if c.optional else ...)
-            for c in column_definitions
-            if c.part_of_pkey is True
-        }
-        self.key_only_table_models[relation_id] = pydantic.create_model(
-            f"KeyDynamicSchemaModel_{relation_id}", **key_only_schema_mapping_args
-        )
-        self.table_schemas[relation_id] = TableSchema(
-            db=self.database,
-            schema_name=relation_msg.namespace,
-            table=relation_msg.relation_name,
-            column_definitions=column_definitions,
-            relation_id=relation_id,
+        self.set_table_schema(
+            TableSchema(
+                db=self.database,
+                schema_name=relation_msg.namespace,
+                table=relation_msg.relation_name,
+                column_definitions=column_definitions,
+                relation_id=relation_id,
+            )
         )
 
-    def process_begin(self, message: ReplicationMessage) -> Transaction:
+    def process_begin(self, message: RawMessage) -> Transaction:
+        """Transaction shared by the events of the transaction, its fields come from the decoder"""
         begin_msg: decoders.Begin = decoders.Begin(message.payload)
-        return Transaction(tx_id=begin_msg.tx_xid, begin_lsn=begin_msg.lsn, commit_ts=begin_msg.commit_ts)
+        return Transaction.construct(tx_id=begin_msg.tx_xid, begin_lsn=begin_msg.lsn, commit_ts=begin_msg.commit_ts)
 
-    def process_insert(self, message: ReplicationMessage, transaction: Transaction) -> ChangeEvent:
-        decoded_msg: decoders.Insert = decoders.Insert(message.payload)
-        relation_id: int = decoded_msg.relation_id
-        after = map_tuple_to_dict(tuple_data=decoded_msg.new_tuple, relation=self.table_schemas[relation_id])
-        return ChangeEvent(
-            op=decoded_msg.byte1,
-            message_id=message.message_id,
-            lsn=message.data_start,
-            transaction=transaction,
-            table_schema=self.table_schemas[relation_id],
-            before=None,
-            after=self.table_models[relation_id](**after),
+    def process_commit(self, message: RawMessage, transaction: Transaction) -> TransactionBatch:
+        commit_msg: decoders.Commit = decoders.Commit(message.payload)
+        return TransactionBatch(
+            xid=transaction.tx_id,
+            begin_lsn=transaction.begin_lsn,
+            commit_lsn=commit_msg.lsn_commit,
+            end_lsn=commit_msg.lsn,
+            commit_ts=commit_msg.commit_ts,
         )
 
-    def process_update(self, message: ReplicationMessage, transaction: Transaction) -> ChangeEvent:
-        decoded_msg: decoders.Update = decoders.Update(message.payload)
-        relation_id: int = decoded_msg.relation_id
-        if decoded_msg.old_tuple:
-            before_raw = map_tuple_to_dict(tuple_data=decoded_msg.old_tuple, relation=self.table_schemas[relation_id])
-            if decoded_msg.optional_tuple_identifier == "O":
-                before_typed = self.table_models[relation_id](**before_raw)
-            # if there is old tuple and not O then key only schema needed
-            else:
-                before_typed = self.key_only_table_models[relation_id](**before_raw)
-        else:
-            before_typed = None
-        after = map_tuple_to_dict(tuple_data=decoded_msg.new_tuple, relation=self.table_schemas[relation_id])
-        return ChangeEvent(
-            op=decoded_msg.byte1,
-            message_id=message.message_id,
-            lsn=message.data_start,
-            transaction=transaction,
-            table_schema=self.table_schemas[relation_id],
-            before=before_typed,
-            after=self.table_models[relation_id](**after),
-        )
+    def is_delivered(self, transaction: Transaction) -> bool:
+        """Whether the checkpoint recorded the transaction as delivered, begin_lsn is the LSN of its commit"""
+        if self.checkpoint is None or not self.checkpoint.is_delivered(transaction.begin_lsn):
+            return False
+        logger.debug(f"Skipping transaction {transaction.tx_id} delivered before the checkpoint")
+        return True
 
-    def process_delete(self, message: ReplicationMessage, transaction: Transaction) -> ChangeEvent:
-        decoded_msg: decoders.Delete = decoders.Delete(message.payload)
-        relation_id: int = decoded_msg.relation_id
-        before_raw = map_tuple_to_dict(tuple_data=decoded_msg.old_tuple, relation=self.table_schemas[relation_id])
-        if decoded_msg.message_type == "O":
-            # O is from REPLICA IDENTITY FULL and therefore has all columns in before message
-            before_typed = self.table_models[relation_id](**before_raw)
-        else:
-            # message type is K and means only replica identity index is present in before tuple
-            # only DEFAULT is implemented so the index can only be the primary key
-            before_typed = self.key_only_table_models[relation_id](**before_raw)
-        return ChangeEvent(
-            op=decoded_msg.byte1,
-            message_id=message.message_id,
-            lsn=message.data_start,
-            transaction=transaction,
-            table_schema=self.table_schemas[relation_id],
-            before=before_typed,
-            after=None,
-        )
+    def mark_processed(self, batch: TransactionBatch) -> None:
+        """The change events of batch were consumed, acknowledge it to the extractor and record it in the checkpoint"""
+        self.processed_lsn = batch.end_lsn
+        if self.checkpoint is not None:
+            self.checkpoint.record(commit_lsn=batch.commit_lsn, end_lsn=batch.end_lsn)
 
-    def process_truncate(
-        self, message: ReplicationMessage, transaction: Transaction
-    ) -> typing.Generator[ChangeEvent, None, None]:
-        decoded_msg: decoders.Truncate = decoders.Truncate(message.payload)
-        for relation_id in decoded_msg.relation_ids:
-            yield ChangeEvent(
-                op=decoded_msg.byte1,
-                message_id=message.message_id,
-                lsn=message.data_start,
-                transaction=transaction,
-                table_schema=self.table_schemas[relation_id],
-                before=None,
-                after=None,
+    def flush_checkpoint(self) -> None:
+        """
+        The stream is idle, flush the transactions recorded since the last flush instead of waiting for the next
+        transaction, the processed LSN confirmed to the server would otherwise be ahead of the checkpoint file
+        """
+        checkpoint = self.checkpoint
+        if checkpoint is not None and checkpoint.end_lsn != checkpoint.flushed_end_lsn:
+            checkpoint.flush()
+
+    def process_stream_start(self, message: RawMessage) -> int:
+        decoded_msg: decoders.StreamStart = decoders.StreamStart(message.payload)
+        xid = decoded_msg.xid
+        if decoded_msg.first_segment or xid not in self.streamed_transactions:
+            self.streamed_transactions[xid] = StreamedTransaction(
+                xid=xid, spill_threshold=self.stream_spill_threshold, spill_dir=self.stream_spill_dir
             )
+        return xid
+
+    def process_stream_commit(self, message: RawMessage) -> typing.Generator[AnyChangeEvent, None, None]:
+        """Replay the buffered changes of a streamed transaction"""
+        decoded_msg: decoders.StreamCommit = decoders.StreamCommit(message.payload)
+        streamed_transaction = self.streamed_transactions.pop(decoded_msg.xid, None)
+        transaction = Transaction.construct(
+            tx_id=decoded_msg.xid, begin_lsn=decoded_msg.lsn_commit, commit_ts=decoded_msg.commit_ts
+        )
+        if streamed_transaction is not None:
+            self.ordinal = 0
+            # current schema versions of the relations replayed with the version of a change streamed before a
+            # Relation message, restored after the replay
+            current_versions: typing.Dict[int, int] = dict()
+            try:
+                if not self.is_delivered(transaction):
+                    for buffered_msg in streamed_transaction:
+                        if buffered_msg.filtered:
+                            self.ordinal += change_count(buffered_msg.payload)
+                            continue
+                        if buffered_msg.schema_version is not None:
+                            relation_id = RELATION_ID_STRUCT.unpack_from(buffered_msg.payload, 1)[0]
+                            current_version = self.schema_registry.versions.get(relation_id)
+                            if current_version is not None and current_version != buffered_msg.schema_version:
+                                current_versions.setdefault(relation_id, current_version)
+                                self.use_schema_version(relation_id, buffered_msg.schema_version)
+                        yield from self.process_change(message=buffered_msg, transaction=transaction)
+            finally:
+                streamed_transaction.close()
+                for relation_id, version in current_versions.items():
+                    self.use_schema_version(relation_id, version)
+        self.committed = TransactionBatch(
+            xid=decoded_msg.xid,
+            begin_lsn=decoded_msg.lsn_commit,
+            commit_lsn=decoded_msg.lsn_commit,
+            end_lsn=decoded_msg.lsn,
+            commit_ts=decoded_msg.commit_ts,
+        )
+
+    def process_stream_abort(self, message: RawMessage) -> None:
+        """Discard the changes of an aborted streamed transaction, or of one of its subtransactions"""
+        decoded_msg: decoders.StreamAbort = decoders.StreamAbort(message.payload)
+        if decoded_msg.xid == decoded_msg.subxid:
+            streamed_transaction = self.streamed_transactions.pop(decoded_msg.xid, None)
+            if streamed_transaction is not None:
+                streamed_transaction.close()
+        elif decoded_msg.xid in self.streamed_transactions:
+            self.streamed_transactions[decoded_msg.xid].abort_subtransaction(decoded_msg.subxid)
 
     # how to put a better type hint?
     def __iter__(self) -> typing.Any:
         return self
 
-    def __next__(self) -> ChangeEvent:
+    def __next__(self) -> AnyChangeEvent:
         try:
-            return next(self.transformed_msgs)
+            item = next(self.transformed_msgs)
+            while item is None or isinstance(item, TransactionBatch):
+                # the consumer asked for the event after the last one of a transaction, so it was processed
+                if item is None:
+                    self.flush_checkpoint()
+                else:
+                    self.mark_processed(item)
+                item = next(self.transformed_msgs)
+            return item
         except Exception as err:
             self.stop()
             raise StopIteration from err
 
+    def iter_transactions(
+        self,
+        max_transactions: int = 1,
+        max_events: typing.Optional[int] = None,
+        max_latency: typing.Optional[float] = None,
+    ) -> typing.Generator[TransactionBatch, None, None]:
+        """
+        Yields whole committed transactions as TransactionBatches instead of single change events. Consecutive
+        transactions are coalesced into one batch until it holds max_transactions transactions or max_events events,
+        the first transaction waited max_latency seconds or the stream goes idle. A transaction is never split, a batch
+        counts as processed when the next one is requested. Do not mix with iterating over the reader itself.
+
+        The reader is stopped when processing the stream fails and the error is raised.
+        """
+        batch: typing.Optional[TransactionBatch] = None
+        batch_started = 0.0
+        events: typing.List[AnyChangeEvent] = []
+        try:
+            for item in self.transformed_msgs:
+                if isinstance(item, TransactionBatch):
+                    item.events = events
+                    events = []
+                    if batch is None:
+                        batch = item
+                        batch_started = time.monotonic()
+                    else:
+                        batch.merge(item)
+                elif item is not None:
+                    events.append(item)
+                    continue
+                else:
+                    self.flush_checkpoint()
+                if batch is None:
+                    continue
+                if (
+                    item is None
+                    or len(batch.xids) >= max_transactions
+                    or (max_events is not None and len(batch.events) >= max_events)
+                    or (max_latency is not None and time.monotonic() - batch_started >= max_latency)
+                ):
+                    yield batch
+                    self.mark_processed(batch)
+                    batch = None
+        except Exception:
+            self.stop()
+            raise
+
+
+class DecodeJob:
+    """
+    Changes of a transaction, or of a segment of it, decoded by a worker of the decode pool. Carries the schemas of
+    the relations the changes reference with their version, commit is set for the last segment of a transaction.
+    With source_schemas the schemas with all the columns are sent, the workers apply the change filter themselves.
+    """
+
+    __slots__ = ("transaction", "messages", "ordinals", "schemas", "commit")
+
+    def __init__(self, transaction: Transaction) -> None:
+        self.transaction = transaction
+        self.messages: typing.List[BufferedMessage] = []
+        # ordinal of each change within the transaction, filtered changes are not sent
+        self.ordinals: typing.List[int] = []
+        self.schemas: typing.Dict[int, typing.Tuple[int, TableSchema]] = dict()
+        self.commit: typing.Optional[TransactionBatch] = None
+
+    def add(
+        self,
+        message: RawMessage,
+        schema_registry: SchemaRegistry,
+        source_schemas: typing.Optional[typing.Mapping[int, TableSchema]] = None,
+        ordinal: typing.Optional[int] = None,
+    ) -> None:
+        payload = message.payload
+        if ordinal is None:
+            ordinal = self.ordinals[-1] + change_count(self.messages[-1].payload) if self.messages else 0
+        self.messages.append(BufferedMessage(data_start=message.data_start, payload=bytes(payload)))
+        self.ordinals.append(ordinal)
+        if payload[:1] == b"T":
+            relation_ids = decoders.Truncate(payload).relation_ids
+        else:
+            relation_ids = [RELATION_ID_STRUCT.unpack_from(payload, 1)[0]]
+        for relation_id in relation_ids:
+            if relation_id in self.schemas:
+                continue
+            if source_schemas is None:
+                version = schema_registry.version(relation_id)
+                self.schemas[relation_id] = (version, schema_registry.get(relation_id=relation_id, version=version))
+            elif relation_id in source_schemas:  # truncated relations can be filtered out
+                self.schemas[relation_id] = (schema_registry.version(relation_id), source_schemas[relation_id])
+
+
+class DecodeWorker(ChangeTransformer):
+    """Decodes jobs in a worker process, keeps the schemas received with earlier jobs"""
+
+    def __init__(
+        self,
+        strict_validation: bool = False,
+        type_parsers: typing.Optional[typing.Mapping[int, ColumnParser]] = None,
+        binary_type_parsers: typing.Optional[typing.Mapping[int, BinaryColumnParser]] = None,
+        compact_events: bool = False,
+        change_filter: typing.Optional[ChangeFilter] = None,
+    ) -> None:
+        ChangeTransformer.__init__(
+            self,
+            strict_validation=strict_validation,
+            parser_registry=ParserRegistry(overrides=type_parsers, binary_overrides=binary_type_parsers),
+            compact_events=compact_events,
+            change_filter=change_filter,
+        )
+
+    def decode(self, job: DecodeJob) -> typing.List[AnyChangeEvent]:
+        for relation_id, (version, table_schema) in job.schemas.items():
+            # a change of unprojected columns keeps the version, but moves the projected columns in the tuples
+            if self.schema_registry.versions.get(relation_id) != version or (
+                self.change_filter is not None and self.source_schemas.get(relation_id) != table_schema
+            ):
+                self.set_table_schema(table_schema, version=version)
+        events: typing.List[AnyChangeEvent] = []
+        for message, ordinal in zip(job.messages, job.ordinals):
+            self.ordinal = ordinal
+            events.extend(self.process_change(message=message, transaction=job.transaction))
+        return events
+
+
+# decode worker of the current pool worker process, created by the pool initializer
+decode_worker: typing.Optional[DecodeWorker] = None
+
+
+def init_decode_worker(
+    strict_validation: bool,
+    type_parsers: typing.Optional[typing.Mapping[int, ColumnParser]],
+    binary_type_parsers: typing.Optional[typing.Mapping[int, BinaryColumnParser]],
+    compact_events: bool,
+    change_filter: typing.Optional[ChangeFilter],
+) -> None:
+    global decode_worker
+    decode_worker = DecodeWorker(
+        strict_validation=strict_validation,
+        type_parsers=type_parsers,
+        binary_type_parsers=binary_type_parsers,
+        compact_events=compact_events,
+        change_filter=change_filter,
+    )
+
+
+def decode_job(job: DecodeJob) -> typing.List[AnyChangeEvent]:
+    if decode_worker is None:
+        raise RuntimeError("decode worker is not initialized")
+    return decode_worker.decode(job)
+
+
+class DecodePool:
+    """
+    Pool of worker processes decoding transactions in parallel. Results are returned in the order the jobs were
+    submitted, which is commit order, regardless of which worker finishes first. Type parsers are sent to the workers
+    and must be picklable, e.g. module level functions.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        strict_validation: bool = False,
+        type_parsers: typing.Optional[typing.Mapping[int, ColumnParser]] = None,
+        binary_type_parsers: typing.Optional[typing.Mapping[int, BinaryColumnParser]] = None,
+        compact_events: bool = False,
+        change_filter: typing.Optional[ChangeFilter] = None,
+        max_pending: typing.Optional[int] = None,
+    ) -> None:
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_decode_worker,
+            initargs=(strict_validation, type_parsers, binary_type_parsers, compact_events, change_filter),
+        )
+        # jobs in flight before the reader waits for the oldest one
+        self.max_pending = 2 * workers if max_pending is None else max_pending
+        self.pending: typing.Deque[
+            typing.Tuple[typing.Optional[TransactionBatch], "Future[typing.List[AnyChangeEvent]]"]
+        ] = deque()
+
+    def submit(self, job: DecodeJob) -> None:
+        self.pending.append((job.commit, self.executor.submit(decode_job, job)))
+
+    def completed(
+        self, block: bool = False
+    ) -> typing.Generator[typing.Tuple[typing.Optional[TransactionBatch], typing.List[AnyChangeEvent]], None, None]:
+        """
+        Results of finished jobs in submission order as (commit, events), stops at the first job still running. With
+        block, or while more than max_pending jobs are in flight, waits for running jobs instead.
+        """
+        pending = self.pending
+        while pending and (block or len(pending) > self.max_pending or pending[0][1].done()):
+            commit, future = pending.popleft()
+            yield commit, future.result()
+
+    def shutdown(self) -> None:
+        """Cancel the jobs not started yet and wait for the workers to exit"""
+        for _, future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=True)
+
+
+class FeedbackScheduler:
+    """
+    Decides when to confirm the flushed LSN to the server, decoupled from the message loop.
+
+    The extractor registers the end LSN of every commit it passes on (sent_commit) and the reader reports the end LSN
+    of the transactions it fully processed (processed). Only the highest LSN for which every earlier transaction was
+    processed as well is confirmed, so the slot never moves past an unprocessed transaction. A status update is sent
+    once `interval` seconds passed since the last one or `max_bytes` of WAL were confirmed in the meantime.
+    """
+
+    def __init__(self, interval: float = 1.0, max_bytes: int = 16 * 1024 * 1024) -> None:
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.pending_commits: typing.Deque[int] = deque()
+        self.confirmed_lsn = 0
+        self.sent_lsn = 0
+        self.last_sent = time.monotonic()
+
+    def sent_commit(self, lsn: int) -> None:
+        self.pending_commits.append(lsn)
+
+    def processed(self, lsn: int) -> None:
+        pending_commits = self.pending_commits
+        while pending_commits and pending_commits[0] <= lsn:
+            self.confirmed_lsn = pending_commits.popleft()
+
+    def is_due(self, now: float) -> bool:
+        if self.confirmed_lsn <= self.sent_lsn:
+            return False
+        return now - self.last_sent >= self.interval or self.confirmed_lsn - self.sent_lsn >= self.max_bytes
+
+    def seconds_until_due(self, now: float) -> typing.Optional[float]:
+        """None if there is nothing new to confirm"""
+        if self.confirmed_lsn <= self.sent_lsn:
+            return None
+        return max(0.0, self.interval - (now - self.last_sent))
+
+    def maybe_send(self, cursor: psycopg2.extras.ReplicationCursor, now: typing.Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        if not self.is_due(now):
+            return False
+        cursor.send_feedback(flush_lsn=self.confirmed_lsn, force=True)
+        self.sent_lsn = self.confirmed_lsn
+        self.last_sent = now
+        logger.debug(f"Flushed up to LSN: {self.sent_lsn}")
+        return True
+
 
 class ExtractRaw(Process):
     """
     Consume logical replication messages using psycopg2's LogicalReplicationConnection. Run as a separate process
-    due to using consume_stream's endless loop. Consume msg sends data into a pipe for another process to extract
+    due to the endless replication loop. Consume msg sends data into a pipe for another process to extract, waiting
+    for the reader to process every message.
+
+    With a shared memory ring, messages are read without blocking and written into the ring as raw frames, the pipe
+    only carries wakeups for a waiting reader and acks. When the ring is full the extractor waits for the reader while
+    still handling acks and keepalives.
+
+    Messages are sent through the pipe as frames, a fixed header of data_start, wal_end, send time and length followed
+    by the raw payload, see encode_frame. With batch_size > 1 messages are read without blocking and sent in batches
+    of concatenated frames, a batch is sent once it holds batch_size messages or its first message is older than
+    batch_max_latency seconds. The reader acknowledges asynchronously with the end LSN of the last transaction it
+    fully processed.
+
+    In all modes LSNs are confirmed to the server by a FeedbackScheduler, every feedback_interval seconds or
+    feedback_bytes of WAL, and only up to the end of the last transaction the reader fully processed.
 
     Docs:
     https://www.psycopg.org/docs/extras.html#replication-support-objects
-    https://www.psycopg.org/docs/extras.html#psycopg2.extras.ReplicationCursor.consume_stream
+    https://www.psycopg.org/docs/extras.html#psycopg2.extras.ReplicationCursor.read_message
     """
 
-    def __init__(self, dsn: str, publication_name: str, slot_name: str, pipe_conn: Connection) -> None:
+    # seconds without server messages after which a keepalive status update is sent
+    keepalive_interval: float = 10.0
+
+    def __init__(
+        self,
+        dsn: str,
+        publication_name: str,
+        slot_name: str,
+        pipe_conn: Connection,
+        batch_size: int = 1,
+        batch_max_latency: float = 0.1,
+        feedback_interval: float = 1.0,
+        feedback_bytes: int = 16 * 1024 * 1024,
+        ring: typing.Optional[SharedMemoryRing] = None,
+        binary: bool = False,
+        streaming: bool = False,
+        start_lsn: int = 0,
+        capture_path: typing.Optional[str] = None,
+        capture_compress: bool = False,
+    ) -> None:
         Process.__init__(self)
         self.dsn = dsn
         self.publication_name = publication_name
         self.slot_name = slot_name
         self.pipe_conn = pipe_conn
+        self.batch_size = batch_size
+        self.batch_max_latency = batch_max_latency
+        self.feedback = FeedbackScheduler(interval=feedback_interval, max_bytes=feedback_bytes)
+        self.ring = ring
+        self.binary = binary
+        self.streaming = streaming
+        # resume from the end of the last transaction checkpointed by the reader
+        self.start_lsn = start_lsn
+        # write every message to a capture file as well, with catalog records for its relations
+        self.capture_path = capture_path
+        self.capture_compress = capture_compress
+        self.capture_writer: typing.Optional[CaptureWriter] = None
+        # connection the catalog records of the capture are read with, open while capturing
+        self.capture_db_handler: typing.Optional[SourceDBHandler] = None
 
     def connect(self) -> None:
         self.conn = psycopg2.extras.LogicalReplicationConnection(self.dsn)
         self.cur = psycopg2.extras.ReplicationCursor(self.conn)
+        check_server_version(conn=self.conn, binary=self.binary, streaming=self.streaming)
 
     def close(self) -> None:
         self.cur.close()
         self.conn.close()
 
     def run(self) -> None:
-        replication_options = {"publication_names": self.publication_name, "proto_version": "1"}
-        try:
-            self.cur.start_replication(slot_name=self.slot_name, decode=False, options=replication_options)
-        except psycopg2.ProgrammingError:
-            self.cur.create_replication_slot(self.slot_name, output_plugin="pgoutput")
-            self.cur.start_replication(slot_name=self.slot_name, decode=False, options=replication_options)
+        options = replication_options(
+            publication_name=self.publication_name, binary=self.binary, streaming=self.streaming
+        )
+        start_replication(cur=self.cur, slot_name=self.slot_name, options=options, start_lsn=self.start_lsn)
+        if self.capture_path is not None:
+            self.start_capture(capture_path=self.capture_path)
+            # the reader stops the extractor with SIGTERM, exit through finally so the capture file is complete
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
         try:
             logger.info(f"Starting replication from slot: '{self.slot_name}'")
-            self.cur.consume_stream(self.msg_consumer)
+            if self.ring is not None:
+                self.consume_ring(ring=self.ring)
+            elif self.batch_size > 1:
+                self.consume_batches()
+            else:
+                self.consume_messages()
         except Exception as err:
             logger.error(f"Error consuming stream from slot: '{self.slot_name}'. {err}")
             self.cur.close()
             self.conn.close()
+        finally:
+            self.close_capture()
+
+    def start_capture(self, capture_path: str) -> None:
+        self.capture_writer = CaptureWriter(path=capture_path, compress=self.capture_compress)
+        try:
+            self.capture_db_handler = SourceDBHandler(dsn=self.dsn)
+            self.capture_writer.write_metadata(
+                database=self.capture_db_handler.conn.get_dsn_parameters()["dbname"],
+                publication_name=self.publication_name,
+                slot_name=self.slot_name,
+                binary=self.binary,
+                streaming=self.streaming,
+            )
+            self.capture_catalog = CatalogCache(handler=self.capture_db_handler)
+            self.capture_catalog.prefetch(publication_name=self.publication_name)
+        except Exception:
+            self.close_capture()
+            raise
+        # catalog columns last written for each relation
+        self.captured_columns: typing.Dict[int, typing.List[CatalogColumn]] = dict()
+        self.capture_in_stream = False
+
+    def close_capture(self) -> None:
+        """Close the capture file and the connection its catalog records are read with, once they are all written"""
+        try:
+            if self.capture_writer is not None:
+                self.capture_writer.close()
+                self.capture_writer = None
+        finally:
+            if self.capture_db_handler is not None:
+                self.capture_db_handler.conn.close()
+                self.capture_db_handler = None
+
+    def capture(self, msg: psycopg2.extras.ReplicationMessage) -> None:
+        """Write a message to the capture file, preceded by a catalog record for new or changed relations"""
+        if self.capture_writer is None:
+            return
+        payload = msg.payload
+        message_type = payload[:1]
+        if message_type == b"R":
+            relation_msg = decoders.Relation(payload, streamed=self.capture_in_stream)
+            columns = self.capture_catalog.get_columns(
+                relation_id=relation_msg.relation_id,
+                table_schema=relation_msg.namespace,
+                table_name=relation_msg.relation_name,
+                columns=[(c.name, c.type_id, c.atttypmod) for c in relation_msg.columns],
+            )
+            if self.captured_columns.get(relation_msg.relation_id) != columns:
+                self.capture_writer.write_catalog(relation_id=relation_msg.relation_id, columns=columns)
+                self.captured_columns[relation_msg.relation_id] = columns
+        elif message_type == b"S":
+            self.capture_in_stream = True
+        elif message_type == b"E":
+            self.capture_in_stream = False
+        self.capture_writer.write_message(msg.data_start, msg.wal_end, datetime_to_micros(msg.send_time), payload)
+
+    @staticmethod
+    def encode_message(msg: psycopg2.extras.ReplicationMessage) -> bytes:
+        return encode_frame(msg.data_start, msg.wal_end, datetime_to_micros(msg.send_time), msg.payload)
+
+    def consume_batches(self) -> None:
+        """Non-blocking replication loop that sends batches of frames and handles acks as they arrive"""
+        batch: typing.List[bytes] = []
+        batch_started = 0.0
+        while True:
+            msg = self.cur.read_message()
+            if msg is not None:
+                self.capture(msg)
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.append(self.encode_message(msg))
+                end_lsn = transaction_end_lsn(msg.payload)
+                if end_lsn is not None:
+                    self.feedback.sent_commit(end_lsn)
+            if batch and (len(batch) >= self.batch_size or time.monotonic() - batch_started >= self.batch_max_latency):
+                self.pipe_conn.send_bytes(b"".join(batch))
+                batch = []
+            self.receive_acks()
+            self.feedback.maybe_send(self.cur)
+            if msg is None:
+                if batch:
+                    self.wait_for_data(timeout=max(0.0, self.batch_max_latency - (time.monotonic() - batch_started)))
+                else:
+                    self.wait_for_data()
+
+    def consume_messages(self) -> None:
+        """Replication loop passing one message at a time to msg_consumer, confirms processed LSNs when idle as well"""
+        while True:
+            msg = self.cur.read_message()
+            if msg is not None:
+                self.msg_consumer(msg)
+            else:
+                self.feedback.maybe_send(self.cur)
+                self.wait_for_data()
+
+    def consume_ring(self, ring: SharedMemoryRing) -> None:
+        """Non-blocking replication loop that writes messages into the shared memory ring"""
+        while True:
+            msg = self.cur.read_message()
+            if msg is not None:
+                self.capture(msg)
+                end_lsn = transaction_end_lsn(msg.payload)
+                if end_lsn is not None:
+                    self.feedback.sent_commit(end_lsn)
+                send_time = datetime_to_micros(msg.send_time)
+                while not ring.try_write(msg.data_start, msg.wal_end, send_time, msg.payload):
+                    # backpressure: the ring is full, wait for the reader to release space
+                    self.receive_acks()
+                    self.feedback.maybe_send(self.cur)
+                    self.cur.send_feedback()  # only sent by psycopg2 when the status interval passed
+                    time.sleep(0.001)
+                if ring.consumer_waiting():
+                    self.pipe_conn.send_bytes(b"")
+            self.receive_acks()
+            self.feedback.maybe_send(self.cur)
+            if msg is None:
+                self.wait_for_data()
+
+    def wait_for_data(self, timeout: typing.Optional[float] = None) -> None:
+        """Wait for replication messages or acks, sends a keepalive when nothing happened for keepalive_interval"""
+        if self.capture_writer is not None:
+            self.capture_writer.flush()
+        keepalive = timeout is None
+        timeout = self.keepalive_interval if timeout is None else timeout
+        feedback_due = self.feedback.seconds_until_due(time.monotonic())
+        if feedback_due is not None:
+            keepalive = False
+            timeout = min(timeout, feedback_due)
+        ready, _, _ = select.select([self.conn.fileno(), self.pipe_conn.fileno()], [], [], timeout)
+        if not ready and keepalive:
+            self.cur.send_feedback()  # no messages and no acks for a while, keep the connection alive
+
+    def receive_acks(self) -> None:
+        """Pass LSNs acknowledged by the reader on to the feedback scheduler without waiting for acks"""
+        while self.pipe_conn.poll():
+            self.feedback.processed(self.pipe_conn.recv()["lsn"])
 
     def msg_consumer(self, msg: psycopg2.extras.ReplicationMessage) -> None:
-        message_id = uuid.uuid4()
-        message = ReplicationMessage(
-            message_id=message_id,
-            data_start=msg.data_start,
-            payload=msg.payload,
-            send_time=msg.send_time,
-            data_size=msg.data_size,
-            wal_end=msg.wal_end,
-        )
-        self.pipe_conn.send(message)
+        self.capture(msg)
+        commit_lsn = transaction_end_lsn(msg.payload)
+        if commit_lsn is not None:
+            self.feedback.sent_commit(commit_lsn)
+        self.pipe_conn.send_bytes(self.encode_message(msg))
         result = self.pipe_conn.recv()  # how would this wait until processing is done?
-        if result["id"] == message_id:
-            msg.cursor.send_feedback(flush_lsn=msg.data_start)
-            logger.debug(f"Flushed message: '{str(message_id)}'")
+        if result["data_start"] == msg.data_start:
+            if commit_lsn is not None:
+                self.feedback.processed(commit_lsn)
+            self.feedback.maybe_send(msg.cursor)
         else:
-            logger.warning(f"Could not confirm message: {str(message_id)}. Did not flush at {str(msg.data_start)}")
+            logger.warning(f"Could not confirm message at {msg.data_start}, did not flush")
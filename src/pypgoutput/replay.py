@@ -0,0 +1,52 @@
+import logging
+import typing
+
+from pypgoutput.capture import CaptureReader
+from pypgoutput.reader import LogicalReplicationReader, RawMessage
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayReader(LogicalReplicationReader):
+    """
+    Replays a capture file written by a reader with capture_path through the same transformation pipeline, without a
+    database: relations are resolved from the catalog records of the capture. Messages are read as fast as they are
+    transformed, which makes it possible to benchmark decoding offline and to reproduce a stream deterministically.
+
+    Takes the options of LogicalReplicationReader that apply to transforming messages, e.g. strict_validation, type
+    parsers, compact_events, filters or decode_workers. Iteration stops at the end of the capture.
+    """
+
+    def __init__(self, path: str, **kwargs: typing.Any) -> None:
+        self.path = path
+        LogicalReplicationReader.__init__(self, publication_name="", slot_name="", **kwargs)
+
+    def setup(self) -> None:
+        self.capture_reader = CaptureReader(path=self.path)
+        self.publication_name = self.capture_reader.metadata.get("publication_name", "")
+        self.slot_name = self.capture_reader.metadata.get("slot_name", "")
+        self.setup_catalog()
+        self.raw_msgs = self.read_capture()
+        self.setup_transform()
+
+    def setup_catalog(self) -> None:
+        self.database = self.capture_reader.metadata.get("database", "")
+        self.catalog = self.capture_reader.catalog
+
+    def read_capture(self) -> typing.Generator[typing.Optional[RawMessage], None, None]:
+        yield from self.capture_reader
+        # report the end of the capture as idle, so batches waiting for more transactions are yielded
+        yield None
+        logger.info(f"Replayed capture file {self.path}")
+
+    def stop(self) -> None:
+        """Close the capture file"""
+        if self.decode_pool is not None:
+            self.decode_pool.shutdown()
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+        if self.metrics is not None:
+            self.metrics.close()
+        if self.profiler is not None:
+            self.profiler.close()
+        self.capture_reader.close()
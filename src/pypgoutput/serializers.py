@@ -0,0 +1,556 @@
+import json
+import logging
+import re
+import struct
+import typing
+import uuid
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+
+from pypgoutput.converters import ARRAY_ELEMENT_TYPES
+from pypgoutput.reader import (
+    AnyChangeEvent,
+    ChangeEvent,
+    CompactChangeEvent,
+    SchemaRegistry,
+    TableSchema,
+    Transaction,
+)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import msgpack  # type: ignore
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+
+def json_default(value: typing.Any) -> typing.Any:
+    """Encode the values produced by the column parsers which json does not support"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def schema_record(table_schema: TableSchema, version: int) -> typing.Dict[str, typing.Any]:
+    return {
+        "type": "schema",
+        "relation_id": table_schema.relation_id,
+        "version": version,
+        "db": table_schema.db,
+        "schema_name": table_schema.schema_name,
+        "table": table_schema.table,
+        "columns": [column.dict() for column in table_schema.column_definitions],
+    }
+
+
+class EventSchemas:
+    """
+    Relation id, schema version and schema of change events. CompactChangeEvents refer to a version in the reader's
+    SchemaRegistry, ChangeEvents embed their schema which is versioned in a registry of its own. The events of a
+    relation share their schema object until it changes, so schemas are only compared when a new object comes along.
+    """
+
+    def __init__(self, schema_registry: SchemaRegistry) -> None:
+        self.schema_registry = schema_registry
+        self.embedded = SchemaRegistry()
+        # last embedded schema and its version by relation id
+        self.last: typing.Dict[int, typing.Tuple[TableSchema, int]] = dict()
+
+    def version(self, event: AnyChangeEvent) -> typing.Tuple[int, int]:
+        """(relation_id, schema_version) of an event"""
+        if isinstance(event, CompactChangeEvent):
+            return event.relation_id, event.schema_version
+        if not isinstance(event, ChangeEvent):
+            raise TypeError(f"Expected a ChangeEvent or CompactChangeEvent, got {type(event).__name__}")
+        table_schema = event.table_schema
+        relation_id = table_schema.relation_id
+        last = self.last.get(relation_id)
+        if last is not None and last[0] is table_schema:
+            return relation_id, last[1]
+        version = self.embedded.register(table_schema)
+        self.last[relation_id] = (table_schema, version)
+        return relation_id, version
+
+    def get(self, event: AnyChangeEvent, relation_id: int, version: int) -> TableSchema:
+        if isinstance(event, ChangeEvent):
+            return event.table_schema
+        return self.schema_registry.get(relation_id=relation_id, version=version)
+
+
+class StreamSerializer(ABC):
+    """
+    Encodes batches of ChangeEvents or CompactChangeEvents to a stream of records. The schema of a relation version is
+    written as a record of its own before the first event referring to it, change records only carry relation_id and
+    schema_version. Change records are written straight from the events, row values from the dicts of the row
+    converters as they are.
+    """
+
+    def __init__(self, schema_registry: SchemaRegistry) -> None:
+        self.schema_registry = schema_registry
+        self.event_schemas = EventSchemas(schema_registry=schema_registry)
+        # (relation_id, version) of the schemas written so far
+        self.emitted: typing.Set[typing.Tuple[int, int]] = set()
+        # encoded fields of the transaction of the last event, shared by the events of a transaction
+        self.transaction: typing.Optional[Transaction] = None
+        self.transaction_fields = b""
+
+    def reset(self) -> None:
+        """Write the schemas again, e.g. when the output moves to a new file"""
+        self.emitted.clear()
+
+    @abstractmethod
+    def encode_record(self, record: typing.Dict[str, typing.Any]) -> bytes:
+        """Encoding of a record is implemented for each format"""
+
+    @abstractmethod
+    def encode_change(self, event: AnyChangeEvent, relation_id: int, version: int) -> bytes:
+        """
+        Encoding of the change record of an event is implemented for each format, its fields are type ("change"), op,
+        message_id, lsn, tx_id, begin_lsn, commit_ts, relation_id, schema_version, before and after
+        """
+
+    def encode(self, events: typing.Iterable[AnyChangeEvent]) -> bytes:
+        chunks: typing.List[bytes] = []
+        event_schemas = self.event_schemas
+        for event in events:
+            key = event_schemas.version(event)
+            relation_id, version = key
+            if key not in self.emitted:
+                table_schema = event_schemas.get(event, relation_id=relation_id, version=version)
+                chunks.append(self.encode_record(schema_record(table_schema=table_schema, version=version)))
+                self.emitted.add(key)
+            chunks.append(self.encode_change(event, relation_id=relation_id, version=version))
+        return b"".join(chunks)
+
+
+class JsonLinesSerializer(StreamSerializer):
+    """JSON Lines, encoded with orjson when it is installed (pip install pypgoutput[orjson]) and json otherwise"""
+
+    def __init__(self, schema_registry: SchemaRegistry) -> None:
+        super().__init__(schema_registry=schema_registry)
+        self.use_orjson = orjson is not None
+
+    def dumps(self, value: typing.Any) -> bytes:
+        if self.use_orjson:
+            # time with a time zone is not supported by orjson, date and time types all go through json_default
+            try:
+                return orjson.dumps(value, default=json_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+            except TypeError:
+                # integers beyond 64 bits, e.g. in json and jsonb documents, are only encoded by json
+                pass
+        return json.dumps(value, separators=(",", ":"), default=json_default).encode("utf-8")
+
+    def encode_record(self, record: typing.Dict[str, typing.Any]) -> bytes:
+        return self.dumps(record) + b"\n"
+
+    def encode_change(self, event: AnyChangeEvent, relation_id: int, version: int) -> bytes:
+        transaction = event.transaction
+        if transaction is not self.transaction:
+            self.transaction = transaction
+            self.transaction_fields = b'"tx_id":%d,"begin_lsn":%d,"commit_ts":"%b"' % (
+                transaction.tx_id,
+                transaction.begin_lsn,
+                transaction.commit_ts.isoformat().encode("utf-8"),
+            )
+        return b'{"type":"change","op":"%b","message_id":"%b","lsn":%d,%b,"relation_id":%d,"schema_version":%d,' % (
+            event.op.encode("utf-8"),
+            str(event.message_id).encode("utf-8"),
+            event.lsn,
+            self.transaction_fields,
+            relation_id,
+            version,
+        ) + b'"before":%b,"after":%b}\n' % (self.dumps(event.before), self.dumps(event.after))
+
+
+class MsgpackSerializer(StreamSerializer):
+    """MessagePack records, requires msgpack (pip install pypgoutput[msgpack]). bytes are packed as bin"""
+
+    def __init__(self, schema_registry: SchemaRegistry) -> None:
+        if msgpack is None:
+            raise ImportError("MsgpackSerializer requires msgpack, install it with pip install pypgoutput[msgpack]")
+        super().__init__(schema_registry=schema_registry)
+        self.packer = msgpack.Packer(default=json_default, use_bin_type=True)
+        # map header and keys of the change records, packed once
+        self.change_header: bytes = (
+            self.packer.pack_map_header(11) + self.packer.pack("type") + self.packer.pack("change")
+        )
+        self.keys: typing.Dict[str, bytes] = {
+            key: self.packer.pack(key)
+            for key in (
+                "op",
+                "message_id",
+                "lsn",
+                "tx_id",
+                "begin_lsn",
+                "commit_ts",
+                "relation_id",
+                "schema_version",
+                "before",
+                "after",
+            )
+        }
+
+    def encode_record(self, record: typing.Dict[str, typing.Any]) -> bytes:
+        packed: bytes = self.packer.pack(record)
+        return packed
+
+    def encode_change(self, event: AnyChangeEvent, relation_id: int, version: int) -> bytes:
+        pack = self.packer.pack
+        keys = self.keys
+        transaction = event.transaction
+        if transaction is not self.transaction:
+            self.transaction = transaction
+            self.transaction_fields = b"".join(
+                (
+                    keys["tx_id"],
+                    pack(transaction.tx_id),
+                    keys["begin_lsn"],
+                    pack(transaction.begin_lsn),
+                    keys["commit_ts"],
+                    pack(transaction.commit_ts),
+                )
+            )
+        return b"".join(
+            (
+                self.change_header,
+                keys["op"],
+                pack(event.op),
+                keys["message_id"],
+                pack(event.message_id),
+                keys["lsn"],
+                pack(event.lsn),
+                self.transaction_fields,
+                keys["relation_id"],
+                pack(relation_id),
+                keys["schema_version"],
+                pack(version),
+                keys["before"],
+                pack(event.before),
+                keys["after"],
+                pack(event.after),
+            )
+        )
+
+
+# Avro binary encoding, see https://avro.apache.org/docs/current/specification/
+AvroWriter = typing.Callable[[bytearray, typing.Any], None]
+
+AVRO_NAME_PATTERN = re.compile(r"[^A-Za-z0-9_]")
+NUMERIC_PATTERN = re.compile(r"numeric\((\d+),(\d+)\)")
+FLOAT_STRUCT = struct.Struct("<f")
+DOUBLE_STRUCT = struct.Struct("<d")
+FINGERPRINT_STRUCT = struct.Struct("<Q")
+# header of Avro single object encoding, followed by the schema fingerprint
+SINGLE_OBJECT_MARKER = b"\xc3\x01"
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+UNIX_EPOCH_NAIVE = datetime(1970, 1, 1)
+UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MICROSECOND = timedelta(microseconds=1)
+AVRO_PRIMITIVE_TYPES = frozenset(("null", "boolean", "int", "long", "float", "double", "bytes", "string"))
+
+
+def crc64_avro_table() -> typing.List[int]:
+    table = []
+    for idx in range(256):
+        fingerprint = idx
+        for _ in range(8):
+            fingerprint = (fingerprint >> 1) ^ (0xC15D213AA4D7A795 & -(fingerprint & 1))
+        table.append(fingerprint)
+    return table
+
+
+CRC64_AVRO_TABLE = crc64_avro_table()
+
+
+def avro_fingerprint(canonical_form: bytes) -> int:
+    """64-bit Rabin fingerprint (CRC-64-AVRO) of the parsing canonical form of a schema"""
+    fingerprint = 0xC15D213AA4D7A795
+    for byte in canonical_form:
+        fingerprint = (fingerprint >> 8) ^ CRC64_AVRO_TABLE[(fingerprint ^ byte) & 0xFF]
+    return fingerprint
+
+
+def avro_canonical_form(schema: typing.Any, namespace: str = "") -> str:
+    """Parsing canonical form of the schemas created by avro_table_schema"""
+    if isinstance(schema, str):
+        if schema not in AVRO_PRIMITIVE_TYPES and namespace and "." not in schema:
+            schema = f"{namespace}.{schema}"
+        return json.dumps(schema)
+    if isinstance(schema, list):
+        return "[" + ",".join(avro_canonical_form(branch, namespace) for branch in schema) + "]"
+    schema_type = schema["type"]
+    if schema_type == "record":
+        namespace = schema.get("namespace", namespace)
+        name = f"{namespace}.{schema['name']}" if namespace else schema["name"]
+        fields = ",".join(
+            f'{{"name":{json.dumps(field["name"])},"type":{avro_canonical_form(field["type"], namespace)}}}'
+            for field in schema["fields"]
+        )
+        return f'{{"name":{json.dumps(name)},"type":"record","fields":[{fields}]}}'
+    if schema_type == "array":
+        return f'{{"type":"array","items":{avro_canonical_form(schema["items"], namespace)}}}'
+    # primitive types with a logical type reduce to the primitive type
+    return avro_canonical_form(schema_type, namespace)
+
+
+def avro_name(name: str) -> str:
+    name = AVRO_NAME_PATTERN.sub("_", name)
+    return f"_{name}" if name[:1].isdigit() else name
+
+
+def write_long(buffer: bytearray, value: int) -> None:
+    value = (value << 1) ^ (value >> 63)  # zigzag
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def write_boolean(buffer: bytearray, value: bool) -> None:
+    buffer.append(1 if value else 0)
+
+
+def write_float(buffer: bytearray, value: float) -> None:
+    buffer += FLOAT_STRUCT.pack(value)
+
+
+def write_double(buffer: bytearray, value: float) -> None:
+    buffer += DOUBLE_STRUCT.pack(value)
+
+
+def write_bytes(buffer: bytearray, value: bytes) -> None:
+    write_long(buffer, len(value))
+    buffer += value
+
+
+def write_string(buffer: bytearray, value: str) -> None:
+    write_bytes(buffer, value.encode("utf-8"))
+
+
+def write_str(buffer: bytearray, value: typing.Any) -> None:
+    write_string(buffer, str(value))
+
+
+def write_json(buffer: bytearray, value: typing.Any) -> None:
+    write_string(buffer, json.dumps(value, separators=(",", ":"), default=json_default))
+
+
+def write_date(buffer: bytearray, value: date) -> None:
+    write_long(buffer, value.toordinal() - UNIX_EPOCH_ORDINAL)
+
+
+def write_time(buffer: bytearray, value: time) -> None:
+    write_long(buffer, ((value.hour * 60 + value.minute) * 60 + value.second) * 1_000_000 + value.microsecond)
+
+
+def write_timestamp(buffer: bytearray, value: datetime) -> None:
+    write_long(buffer, (value - UNIX_EPOCH) // MICROSECOND)
+
+
+def write_local_timestamp(buffer: bytearray, value: datetime) -> None:
+    write_long(buffer, (value - UNIX_EPOCH_NAIVE) // MICROSECOND)
+
+
+def write_unknown(buffer: bytearray, value: typing.Any) -> None:
+    # values of types without a parser, text in text mode and the raw bytes in binary mode
+    if value is None:
+        buffer.append(0)  # union branch 0, null
+    elif isinstance(value, bytes):
+        buffer.append(4)  # union branch 2, bytes
+        write_bytes(buffer, value)
+    else:
+        buffer.append(2)  # union branch 1, string
+        write_string(buffer, str(value))
+
+
+def decimal_writer(scale: int) -> AvroWriter:
+    def write_decimal(buffer: bytearray, value: Decimal) -> None:
+        if not value.is_finite():
+            raise ValueError(f"{value} is not a finite decimal")
+        unscaled = int(value.scaleb(scale))
+        write_bytes(buffer, unscaled.to_bytes((unscaled.bit_length() + 8) // 8, "big", signed=True))
+
+    return write_decimal
+
+
+def nullable_writer(writer: AvroWriter) -> AvroWriter:
+    """
+    Writer of a nullable column. Values its Avro type can't represent, e.g. numeric NaN, the infinite timestamps and
+    multi-dimensional arrays the column parsers keep as text or raw bytes, are written as null with a warning.
+    """
+
+    def write_nullable(buffer: bytearray, value: typing.Any) -> None:
+        if value is None:
+            buffer.append(0)  # union branch 0, null
+            return
+        start = len(buffer)
+        buffer.append(2)  # union branch 1
+        try:
+            writer(buffer, value)
+        except (TypeError, ValueError, AttributeError, OverflowError) as err:
+            del buffer[start:]
+            buffer.append(0)
+            logger.warning(f"Wrote {value!r} as null, the Avro type of its column can't represent it: {err}")
+
+    return write_nullable
+
+
+def array_writer(items_writer: AvroWriter) -> AvroWriter:
+    def write_array(buffer: bytearray, value: typing.List[typing.Any]) -> None:
+        if not isinstance(value, list):
+            raise TypeError(f"{type(value).__name__} is not a list")
+        if value:
+            write_long(buffer, len(value))
+            for item in value:
+                items_writer(buffer, item)
+        buffer.append(0)  # end of the blocks
+
+    return write_array
+
+
+def row_writer(fields: typing.List[typing.Tuple[str, AvroWriter]]) -> AvroWriter:
+    def write_row(buffer: bytearray, row: typing.Dict[str, typing.Any]) -> None:
+        # columns missing from the row (key only tuples) are null
+        for name, writer in fields:
+            writer(buffer, row.get(name))
+
+    return write_row
+
+
+# Avro schema and writer by type OID
+AVRO_TYPES: typing.Dict[int, typing.Tuple[typing.Any, AvroWriter]] = {
+    16: ("boolean", write_boolean),
+    17: ("bytes", write_bytes),
+    18: ("string", write_string),
+    19: ("string", write_string),
+    20: ("long", write_long),
+    21: ("int", write_long),
+    23: ("int", write_long),
+    25: ("string", write_string),
+    26: ("long", write_long),
+    114: ("string", write_json),
+    700: ("float", write_float),
+    701: ("double", write_double),
+    1042: ("string", write_string),
+    1043: ("string", write_string),
+    1082: ({"type": "int", "logicalType": "date"}, write_date),
+    1083: ({"type": "long", "logicalType": "time-micros"}, write_time),
+    1114: ({"type": "long", "logicalType": "local-timestamp-micros"}, write_local_timestamp),
+    1184: ({"type": "long", "logicalType": "timestamp-micros"}, write_timestamp),
+    1266: ("string", write_str),  # Avro times have no time zone
+    1700: ("string", write_str),  # numeric without precision and scale
+    2950: ({"type": "string", "logicalType": "uuid"}, write_str),
+    3802: ("string", write_json),
+}
+
+
+def avro_nullable_type(type_id: int, type_name: str) -> typing.Tuple[typing.Any, AvroWriter]:
+    """Nullable Avro type of a column and the writer of its values, unknown types are a union of string and bytes"""
+    if type_id == 1700:
+        match = NUMERIC_PATTERN.match(type_name)
+        if match is not None:
+            precision, scale = int(match.group(1)), int(match.group(2))
+            avro_type = {"type": "bytes", "logicalType": "decimal", "precision": precision, "scale": scale}
+            return ["null", avro_type], nullable_writer(decimal_writer(scale))
+    element_type_id = ARRAY_ELEMENT_TYPES.get(type_id)
+    if element_type_id is not None:
+        items_type, items_writer = avro_nullable_type(type_id=element_type_id, type_name="")
+        return ["null", {"type": "array", "items": items_type}], nullable_writer(array_writer(items_writer))
+    known_type = AVRO_TYPES.get(type_id)
+    if known_type is None:
+        return ["null", "string", "bytes"], write_unknown
+    avro_type, writer = known_type
+    return ["null", avro_type], nullable_writer(writer)
+
+
+def avro_table_schema(table_schema: TableSchema) -> typing.Tuple[typing.Dict[str, typing.Any], AvroWriter]:
+    """
+    Avro schema of the change events of a table and the writer of their before/after rows. Row columns are all
+    nullable, as before rows may only hold the key columns.
+    """
+    name = avro_name(table_schema.table)
+    namespace = ".".join(avro_name(part) for part in (table_schema.db, table_schema.schema_name))
+    row_fields = []
+    writers = []
+    for column in table_schema.column_definitions:
+        column_type, writer = avro_nullable_type(type_id=column.type_id, type_name=column.type_name)
+        row_fields.append({"name": avro_name(column.name), "type": column_type})
+        writers.append((column.name, writer))
+    schema = {
+        "type": "record",
+        "name": name,
+        "namespace": namespace,
+        "fields": [
+            {"name": "op", "type": "string"},
+            {"name": "message_id", "type": {"type": "string", "logicalType": "uuid"}},
+            {"name": "lsn", "type": "long"},
+            {"name": "tx_id", "type": "long"},
+            {"name": "begin_lsn", "type": "long"},
+            {"name": "commit_ts", "type": {"type": "long", "logicalType": "timestamp-micros"}},
+            {"name": "before", "type": ["null", {"type": "record", "name": f"{name}_row", "fields": row_fields}]},
+            {"name": "after", "type": ["null", f"{name}_row"]},
+        ],
+    }
+    return schema, row_writer(writers)
+
+
+class AvroSerializer:
+    """
+    Encodes ChangeEvents or CompactChangeEvents with Avro single object encoding, one message per event. The Avro schema of each
+    relation version is derived from its column definitions and identified in the messages by its fingerprint, sinks
+    look it up in schemas, e.g. to register it with a schema registry. Rows are written by writers compiled per relation
+    version, straight from the dicts of the row converters.
+    """
+
+    def __init__(self, schema_registry: SchemaRegistry) -> None:
+        self.schema_registry = schema_registry
+        self.event_schemas = EventSchemas(schema_registry=schema_registry)
+        # message header and row writer by (relation_id, version)
+        self.writers: typing.Dict[typing.Tuple[int, int], typing.Tuple[bytes, AvroWriter]] = dict()
+        # Avro schemas by fingerprint
+        self.schemas: typing.Dict[int, typing.Dict[str, typing.Any]] = dict()
+
+    def writer(self, event: AnyChangeEvent) -> typing.Tuple[bytes, AvroWriter]:
+        key = self.event_schemas.version(event)
+        writer = self.writers.get(key)
+        if writer is None:
+            relation_id, version = key
+            table_schema = self.event_schemas.get(event, relation_id=relation_id, version=version)
+            schema, write_row = avro_table_schema(table_schema)
+            fingerprint = avro_fingerprint(avro_canonical_form(schema).encode("utf-8"))
+            self.schemas[fingerprint] = schema
+            writer = (SINGLE_OBJECT_MARKER + FINGERPRINT_STRUCT.pack(fingerprint), write_row)
+            self.writers[key] = writer
+        return writer
+
+    def encode_event(self, event: AnyChangeEvent) -> bytes:
+        header, write_row = self.writer(event)
+        buffer = bytearray(header)
+        write_string(buffer, event.op)
+        write_string(buffer, str(event.message_id))
+        write_long(buffer, event.lsn)
+        transaction = event.transaction
+        write_long(buffer, transaction.tx_id)
+        write_long(buffer, transaction.begin_lsn)
+        write_timestamp(buffer, transaction.commit_ts)
+        for row in (event.before, event.after):
+            if row is None:
+                buffer.append(0)  # union branch 0, null
+            else:
+                buffer.append(2)  # union branch 1, row
+                write_row(buffer, row)
+        return bytes(buffer)
+
+    def encode(self, events: typing.Iterable[AnyChangeEvent]) -> typing.List[bytes]:
+        return [self.encode_event(event) for event in events]
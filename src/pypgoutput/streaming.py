@@ -0,0 +1,140 @@
+import struct
+import tempfile
+import typing
+
+# xid of the (sub)transaction following the message type byte of streamed messages
+XID_STRUCT = struct.Struct("!I")
+XID_END = 1 + XID_STRUCT.size
+# header of a change spilled to disk: data_start, subtransaction xid, schema version (0 for none), filtered, payload
+# length
+SPILL_HEADER = struct.Struct("!qII?i")
+# message type and relation id, or number of relations of a Truncate, of a filtered change
+FILTERED_END = XID_END + 4
+
+
+class BufferedMessage:
+    """
+    A change of a streamed transaction, replayed once the transaction commits. The payload is stored without the xid
+    prefix so it decodes like a message of a regular transaction, it is used in place of ReplicationMessage by the
+    reader. schema_version is the version of the relation's schema when the change was streamed, a Relation message
+    may change the schema before the transaction commits.
+
+    A filtered change is only buffered as its message type and relation id (the number of relations of a Truncate),
+    enough to give it its ordinal in the transaction on replay.
+    """
+
+    __slots__ = ("data_start", "payload", "schema_version", "filtered")
+
+    def __init__(
+        self, data_start: int, payload: bytes, schema_version: typing.Optional[int] = None, filtered: bool = False
+    ) -> None:
+        self.data_start = data_start
+        self.payload = payload
+        self.schema_version = schema_version
+        self.filtered = filtered
+
+    def __repr__(self) -> str:
+        return f"BufferedMessage(data_start={self.data_start}, payload_type='{chr(self.payload[0])}')"
+
+
+class StreamedTransaction:
+    """
+    Buffers the changes of one large in-progress transaction that the server streams in chunks (protocol version 2)
+    until it receives Stream Commit or Stream Abort.
+
+    Changes are kept in memory. With a spill_threshold, once more than spill_threshold payload bytes are buffered all
+    changes are moved to an anonymous temporary file and later ones are appended to it. Aborted subtransactions are
+    recorded and their changes skipped on replay.
+    """
+
+    def __init__(
+        self, xid: int, spill_threshold: typing.Optional[int] = None, spill_dir: typing.Optional[str] = None
+    ) -> None:
+        self.xid = xid
+        self.spill_threshold = spill_threshold
+        self.spill_dir = spill_dir
+        self.size = 0
+        self.count = 0
+        # (subtransaction xid, message)
+        self.changes: typing.List[typing.Tuple[int, BufferedMessage]] = []
+        self.spill_file: typing.Optional[typing.IO[bytes]] = None
+        self.aborted_subxids: typing.Set[int] = set()
+
+    @property
+    def spilled(self) -> bool:
+        return self.spill_file is not None
+
+    def append(
+        self,
+        data_start: int,
+        payload: typing.Union[bytes, memoryview],
+        schema_version: typing.Optional[int] = None,
+        filtered: bool = False,
+    ) -> None:
+        """
+        Buffer a streamed message, the xid prefix is removed from the payload and kept alongside. Only the start of the
+        payload of a filtered change is kept
+        """
+        subxid: int = XID_STRUCT.unpack_from(payload, 1)[0]
+        end = FILTERED_END if filtered else len(payload)
+        message = BufferedMessage(
+            data_start=data_start,
+            payload=bytes(payload[:1]) + payload[XID_END:end],
+            schema_version=schema_version,
+            filtered=filtered,
+        )
+        self.size += len(message.payload)
+        self.count += 1
+        if self.spill_file is not None:
+            self.write_spilled(self.spill_file, subxid, message)
+            return
+        self.changes.append((subxid, message))
+        if self.spill_threshold is not None and self.size > self.spill_threshold:
+            self.spill()
+
+    def spill(self) -> None:
+        spill_file = tempfile.TemporaryFile(dir=self.spill_dir)
+        for subxid, message in self.changes:
+            self.write_spilled(spill_file, subxid, message)
+        self.changes = []
+        self.spill_file = spill_file
+
+    @staticmethod
+    def write_spilled(spill_file: typing.IO[bytes], subxid: int, message: BufferedMessage) -> None:
+        header = SPILL_HEADER.pack(
+            message.data_start, subxid, message.schema_version or 0, message.filtered, len(message.payload)
+        )
+        spill_file.write(header)
+        spill_file.write(message.payload)
+
+    def read_spilled(self, spill_file: typing.IO[bytes]) -> typing.Iterator[typing.Tuple[int, BufferedMessage]]:
+        spill_file.flush()
+        spill_file.seek(0)
+        for _ in range(self.count):
+            data_start, subxid, schema_version, filtered, length = SPILL_HEADER.unpack(
+                spill_file.read(SPILL_HEADER.size)
+            )
+            message = BufferedMessage(
+                data_start=data_start,
+                payload=spill_file.read(length),
+                schema_version=schema_version or None,
+                filtered=filtered,
+            )
+            yield subxid, message
+
+    def abort_subtransaction(self, subxid: int) -> None:
+        self.aborted_subxids.add(subxid)
+
+    def __iter__(self) -> typing.Iterator[BufferedMessage]:
+        """Replay the changes in the order they were streamed, without those of aborted subtransactions"""
+        changes = self.read_spilled(self.spill_file) if self.spill_file is not None else iter(self.changes)
+        aborted_subxids = self.aborted_subxids
+        for subxid, message in changes:
+            if subxid not in aborted_subxids:
+                yield message
+
+    def close(self) -> None:
+        self.changes = []
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
@@ -0,0 +1,307 @@
+"""
+Synthetic pgoutput messages, the inverse of the decoders, to test and benchmark decoding without a database.
+"""
+import random
+import struct
+import typing
+from datetime import datetime, timedelta, timezone
+
+from pypgoutput.capture import CaptureWriter
+from pypgoutput.decoders import convert_pg_ts
+from pypgoutput.reader import ColumnDefinition, TableSchema
+from pypgoutput.transport import datetime_to_micros
+from pypgoutput.utils import CatalogColumn
+
+PG_EPOCH = convert_pg_ts(0)
+INT8 = struct.Struct("!q")
+INT16 = struct.Struct("!h")
+INT32 = struct.Struct("!i")
+UINT32 = struct.Struct("!I")
+
+
+class UnchangedToast:
+    """Marks an unchanged TOASTed value in a tuple, sent as 'u' without data"""
+
+    def __repr__(self) -> str:
+        return "UNCHANGED_TOAST"
+
+
+UNCHANGED_TOAST = UnchangedToast()
+
+# column value of a tuple: text (t), binary (b), NULL (None) or unchanged TOASTed value
+TupleValue = typing.Union[str, bytes, None, UnchangedToast]
+
+
+def datetime_to_pg_micros(_dt: datetime) -> int:
+    return (_dt - PG_EPOCH) // timedelta(microseconds=1)
+
+
+def encode_string(value: str) -> bytes:
+    return value.encode("utf-8") + b"\x00"
+
+
+def encode_xid(xid: typing.Optional[int]) -> bytes:
+    """xid prefix of messages of streamed transactions"""
+    return b"" if xid is None else UINT32.pack(xid)
+
+
+def encode_begin(final_lsn: int, commit_ts: datetime, xid: int) -> bytes:
+    return b"B" + INT8.pack(final_lsn) + INT8.pack(datetime_to_pg_micros(commit_ts)) + UINT32.pack(xid)
+
+
+def encode_commit(commit_lsn: int, end_lsn: int, commit_ts: datetime, flags: int = 0) -> bytes:
+    return b"C" + struct.pack("!bqqq", flags, commit_lsn, end_lsn, datetime_to_pg_micros(commit_ts))
+
+
+def encode_relation(
+    relation_id: int,
+    namespace: str,
+    relation_name: str,
+    columns: typing.Sequence[typing.Tuple[str, int, int, bool]],
+    replica_identity: str = "d",
+    xid: typing.Optional[int] = None,
+) -> bytes:
+    """Relation message of the (name, type id, type modifier, part of the key) columns"""
+    parts = [
+        b"R",
+        encode_xid(xid),
+        INT32.pack(relation_id),
+        encode_string(namespace),
+        encode_string(relation_name),
+        replica_identity.encode("utf-8"),
+        INT16.pack(len(columns)),
+    ]
+    for name, type_id, atttypmod, part_of_pkey in columns:
+        parts.append(struct.pack("!b", 1 if part_of_pkey else 0) + encode_string(name))
+        parts.append(INT32.pack(type_id) + INT32.pack(atttypmod))
+    return b"".join(parts)
+
+
+def encode_tuple(values: typing.Sequence[TupleValue]) -> bytes:
+    parts = [INT16.pack(len(values))]
+    for value in values:
+        if value is None:
+            parts.append(b"n")
+        elif isinstance(value, UnchangedToast):
+            parts.append(b"u")
+        elif isinstance(value, str):
+            data = value.encode("utf-8")
+            parts.append(b"t" + INT32.pack(len(data)) + data)
+        else:
+            parts.append(b"b" + INT32.pack(len(value)) + value)
+    return b"".join(parts)
+
+
+def encode_insert(relation_id: int, values: typing.Sequence[TupleValue], xid: typing.Optional[int] = None) -> bytes:
+    return b"I" + encode_xid(xid) + INT32.pack(relation_id) + b"N" + encode_tuple(values)
+
+
+def encode_update(
+    relation_id: int,
+    values: typing.Sequence[TupleValue],
+    old_values: typing.Optional[typing.Sequence[TupleValue]] = None,
+    key_only: bool = True,
+    xid: typing.Optional[int] = None,
+) -> bytes:
+    """Update message, with the old key (K) or the old row (O, REPLICA IDENTITY FULL) when old_values are given"""
+    old_tuple = b"" if old_values is None else (b"K" if key_only else b"O") + encode_tuple(old_values)
+    return b"U" + encode_xid(xid) + INT32.pack(relation_id) + old_tuple + b"N" + encode_tuple(values)
+
+
+def encode_delete(
+    relation_id: int, old_values: typing.Sequence[TupleValue], key_only: bool = True, xid: typing.Optional[int] = None
+) -> bytes:
+    return b"D" + encode_xid(xid) + INT32.pack(relation_id) + (b"K" if key_only else b"O") + encode_tuple(old_values)
+
+
+def encode_truncate(relation_ids: typing.Sequence[int], options: int = 0, xid: typing.Optional[int] = None) -> bytes:
+    parts = [b"T", encode_xid(xid), INT32.pack(len(relation_ids)), struct.pack("!b", options)]
+    parts.extend(INT32.pack(relation_id) for relation_id in relation_ids)
+    return b"".join(parts)
+
+
+# (type id, type modifier, type name) of the columns after the integer primary key, repeated to the table width
+COLUMN_TYPES = [
+    (25, -1, "text"),
+    (23, -1, "integer"),
+    (1700, 655366, "numeric(10,2)"),
+    (1184, -1, "timestamp with time zone"),
+    (16, -1, "boolean"),
+]
+
+
+class SyntheticStream:
+    """
+    Generates a realistic pgoutput message stream: Relation messages for n_tables tables, then transactions of
+    transaction_size changes between Begin and Commit, with increasing LSNs. Tables have an integer primary key and
+    n_columns - 1 columns cycling through text, integer, numeric, timestamptz and boolean. Text values are value_size
+    characters long.
+
+    ops weighs the change types, e.g. {"I": 8, "U": 1, "D": 1}; a Truncate is always a whole change. Values of
+    nullable columns are NULL with null_ratio, text values of updated rows are unchanged TOASTed values with
+    toast_ratio. With replica_identity_full Updates and Deletes carry the old row, otherwise Deletes carry the key.
+    The stream is deterministic for a seed.
+    """
+
+    def __init__(
+        self,
+        n_columns: int = 10,
+        value_size: int = 16,
+        null_ratio: float = 0.0,
+        toast_ratio: float = 0.0,
+        transaction_size: int = 100,
+        ops: typing.Optional[typing.Mapping[str, float]] = None,
+        n_tables: int = 1,
+        replica_identity_full: bool = False,
+        seed: int = 0,
+        first_relation_id: int = 16385,
+    ) -> None:
+        if n_columns < 1:
+            raise ValueError("tables need at least the primary key column")
+        self.n_columns = n_columns
+        self.value_size = value_size
+        self.null_ratio = null_ratio
+        self.toast_ratio = toast_ratio
+        self.transaction_size = transaction_size
+        self.ops = {"I": 1.0} if ops is None else dict(ops)
+        self.replica_identity_full = replica_identity_full
+        self.random = random.Random(seed)
+        self.relation_ids = [first_relation_id + idx for idx in range(n_tables)]
+        self.columns: typing.List[typing.Tuple[str, int, int, str]] = [("id", 23, -1, "integer")]
+        for idx in range(1, n_columns):
+            type_id, atttypmod, type_name = COLUMN_TYPES[(idx - 1) % len(COLUMN_TYPES)]
+            self.columns.append((f"column_{idx}", type_id, atttypmod, type_name))
+        self.lsn = 0x1000000
+        self.xid = 1000
+        self.row_id = 0
+        self.commit_ts = datetime(2022, 1, 14, 17, 22, 10, 298334, tzinfo=timezone.utc)
+
+    def table_name(self, relation_id: int) -> str:
+        return f"synthetic_{relation_id}"
+
+    def catalog_columns(self) -> typing.List[CatalogColumn]:
+        """Catalog metadata of the columns, the same for all tables"""
+        return [
+            CatalogColumn(name=name, type_id=type_id, atttypmod=atttypmod, type_name=type_name, optional=name != "id")
+            for name, type_id, atttypmod, type_name in self.columns
+        ]
+
+    def table_schemas(self) -> typing.List[TableSchema]:
+        """Schemas of the tables as the reader builds them from the Relation messages and the catalog"""
+        column_definitions = [
+            ColumnDefinition(
+                name=column.name,
+                part_of_pkey=column.name == "id",
+                type_id=column.type_id,
+                type_name=column.type_name,
+                optional=column.optional,
+            )
+            for column in self.catalog_columns()
+        ]
+        return [
+            TableSchema(
+                column_definitions=column_definitions,
+                db="synthetic",
+                schema_name="public",
+                table=self.table_name(relation_id),
+                relation_id=relation_id,
+            )
+            for relation_id in self.relation_ids
+        ]
+
+    def relations(self) -> typing.List[bytes]:
+        columns = [(name, type_id, atttypmod, name == "id") for name, type_id, atttypmod, _ in self.columns]
+        replica_identity = "f" if self.replica_identity_full else "d"
+        return [
+            encode_relation(relation_id, "public", self.table_name(relation_id), columns, replica_identity)
+            for relation_id in self.relation_ids
+        ]
+
+    def value(self, type_id: int, toast: bool = False) -> TupleValue:
+        rnd = self.random
+        if self.null_ratio and rnd.random() < self.null_ratio:
+            return None
+        if type_id == 25:
+            if toast and self.toast_ratio and rnd.random() < self.toast_ratio:
+                return UNCHANGED_TOAST
+            return "".join(rnd.choices("abcdefghijklmnopqrstuvwxyz0123456789", k=self.value_size))
+        elif type_id == 23:
+            return str(rnd.randrange(-(2**31), 2**31))
+        elif type_id == 1700:
+            return f"{rnd.randrange(0, 10**8) / 100:.2f}"
+        elif type_id == 1184:
+            return (self.commit_ts - timedelta(seconds=rnd.randrange(0, 10**8))).isoformat(" ")
+        return rnd.choice(("t", "f"))
+
+    def row(self, row_id: int, toast: bool = False) -> typing.List[TupleValue]:
+        return [str(row_id)] + [self.value(type_id, toast=toast) for _, type_id, _, _ in self.columns[1:]]
+
+    def key(self, row_id: int) -> typing.List[TupleValue]:
+        return [str(row_id)] + [None] * (self.n_columns - 1)
+
+    def change(self) -> bytes:
+        op = self.random.choices(list(self.ops), weights=list(self.ops.values()))[0]
+        relation_id = self.random.choice(self.relation_ids)
+        if op == "I":
+            self.row_id += 1
+            return encode_insert(relation_id, self.row(self.row_id))
+        row_id = self.random.randint(1, max(self.row_id, 1))
+        if op == "U":
+            old_values = self.row(row_id) if self.replica_identity_full else None
+            return encode_update(relation_id, self.row(row_id, toast=True), old_values=old_values, key_only=False)
+        elif op == "D":
+            if self.replica_identity_full:
+                return encode_delete(relation_id, self.row(row_id), key_only=False)
+            return encode_delete(relation_id, self.key(row_id))
+        elif op == "T":
+            return encode_truncate([relation_id])
+        raise ValueError(f"Unknown change type {op}")
+
+    def transaction_messages(self) -> typing.List[typing.Tuple[int, bytes]]:
+        """
+        LSN and payload of the Begin, transaction_size changes and Commit of the next transaction. Each change is at
+        the LSN after the previous one, the Commit at the commit LSN following the last change.
+        """
+        self.xid += 1
+        self.commit_ts += timedelta(milliseconds=1)
+        changes = [self.change() for _ in range(self.transaction_size)]
+        commit_lsn = self.lsn + 1 + sum(len(change) for change in changes)
+        end_lsn = commit_lsn + 64
+        messages = [(self.lsn, encode_begin(commit_lsn, self.commit_ts, self.xid))]
+        lsn = self.lsn + 1
+        for change in changes:
+            messages.append((lsn, change))
+            lsn += len(change)
+        messages.append((commit_lsn, encode_commit(commit_lsn, end_lsn, self.commit_ts)))
+        self.lsn = end_lsn
+        return messages
+
+    def transaction(self) -> typing.List[bytes]:
+        """Begin, transaction_size changes and Commit of the next transaction"""
+        return [payload for _, payload in self.transaction_messages()]
+
+    def lsn_messages(self, n_transactions: int) -> typing.Iterator[typing.Tuple[int, bytes]]:
+        """LSN and payload of the Relation messages, then of n_transactions transactions"""
+        for relation in self.relations():
+            yield self.lsn, relation
+            self.lsn += len(relation)
+        for _ in range(n_transactions):
+            yield from self.transaction_messages()
+
+    def messages(self, n_transactions: int) -> typing.Iterator[bytes]:
+        """The Relation messages, then n_transactions transactions"""
+        for _, payload in self.lsn_messages(n_transactions):
+            yield payload
+
+    def write_capture(self, path: str, n_transactions: int, compress: bool = False) -> None:
+        """
+        Write the stream to a capture file, to be replayed with ReplayReader. Messages are sent at the commit time of
+        their transaction
+        """
+        writer = CaptureWriter(path=path, compress=compress)
+        writer.write_metadata(database="synthetic", publication_name="synthetic", slot_name="synthetic")
+        for relation_id in self.relation_ids:
+            writer.write_catalog(relation_id=relation_id, columns=self.catalog_columns())
+        for lsn, payload in self.lsn_messages(n_transactions):
+            writer.write_message(lsn, lsn, datetime_to_micros(self.commit_ts), payload)
+        writer.close()
@@ -0,0 +1,206 @@
+import struct
+import typing
+from datetime import datetime
+from multiprocessing import shared_memory
+
+# frame header: data_start, wal_end, send_time (microseconds since the unix epoch), payload length
+FRAME_HEADER = struct.Struct("!qqqi")
+# a frame header with this length marks the rest of the ring as unused, the next frame starts at offset 0
+WRAP_MARKER = -1
+
+# positions of the shared counters at the start of the shared memory block, native byte order
+# the producer only writes head and the consumer only writes tail and waiting
+HEAD = struct.Struct("=Q")
+HEAD_OFFSET = 0
+TAIL = struct.Struct("=Q")
+TAIL_OFFSET = 8
+WAITING = struct.Struct("=B")
+WAITING_OFFSET = 16
+CAPACITY = struct.Struct("=Q")
+CAPACITY_OFFSET = 24
+COUNTERS_SIZE = 64
+
+
+def store_counter(counters: memoryview, counter: struct.Struct, offset: int, value: int) -> None:
+    """Write a shared counter with a single copy, pack_into clears the bytes first so the other process could read 0"""
+    end = offset + counter.size
+    counters[offset:end] = counter.pack(value)
+
+
+def datetime_to_micros(_dt: datetime) -> int:
+    return int(_dt.timestamp() * 1_000_000)
+
+
+def micros_to_datetime(_micros: int) -> datetime:
+    return datetime.fromtimestamp(_micros / 1_000_000)
+
+
+class RingMessage:
+    """
+    Raw replication message of a frame, read in place from the ring buffer or decoded from the frames sent through the
+    pipe. The payload is a memoryview, into shared memory it is only valid until the message is released. It is used
+    in place of ReplicationMessage by the reader.
+    """
+
+    __slots__ = ("data_start", "wal_end", "send_time_micros", "payload")
+
+    def __init__(self, data_start: int, wal_end: int, send_time_micros: int, payload: memoryview) -> None:
+        self.data_start = data_start
+        self.wal_end = wal_end
+        self.send_time_micros = send_time_micros
+        self.payload = payload
+
+    @property
+    def send_time(self) -> datetime:
+        return micros_to_datetime(self.send_time_micros)
+
+    @property
+    def data_size(self) -> int:
+        return len(self.payload)
+
+    def __repr__(self) -> str:
+        return f"RingMessage(data_start={self.data_start}, wal_end={self.wal_end}, data_size={self.data_size})"
+
+
+def encode_frame(data_start: int, wal_end: int, send_time_micros: int, payload: bytes) -> bytes:
+    """A raw replication message as a frame, the frame header followed by the payload"""
+    return FRAME_HEADER.pack(data_start, wal_end, send_time_micros, len(payload)) + payload
+
+
+def decode_frames(buffer: bytes) -> typing.List[RingMessage]:
+    """Messages of consecutive frames, their payloads are views into buffer"""
+    view = memoryview(buffer)
+    header_size = FRAME_HEADER.size
+    unpack_header = FRAME_HEADER.unpack_from
+    messages = []
+    position = 0
+    end = len(view)
+    while position < end:
+        if position + header_size > end:
+            raise ValueError(f"truncated frame at offset {position}")
+        data_start, wal_end, send_time_micros, length = unpack_header(view, position)
+        payload_start = position + header_size
+        if payload_start + length > end:
+            raise ValueError(f"truncated frame at offset {position}")
+        position = payload_start + length
+        messages.append(RingMessage(data_start, wal_end, send_time_micros, view[payload_start:position]))
+    return messages
+
+
+class SharedMemoryRing:
+    """
+    Single producer / single consumer ring buffer of length prefixed raw pgoutput frames in shared memory.
+
+    Head and tail are monotonically increasing byte counters, the position in the ring is the counter modulo the
+    capacity. A frame is never split: if it does not fit before the end of the ring, the remainder is skipped with a
+    wrap marker. The consumer reads payloads in place and calls release() once it is done with the last message read,
+    only then the space can be reused. try_write() returns False when the ring is full so the producer can apply
+    backpressure while staying responsive.
+    """
+
+    def __init__(self, size: int = 32 * 1024 * 1024, name: typing.Optional[str] = None) -> None:
+        """Creates a new ring of `size` bytes, or attaches to the existing ring `name` (size is then ignored)"""
+        create = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=COUNTERS_SIZE + size if create else 0)
+        buf = self.shm.buf
+        if buf is None:
+            raise ValueError(f"shared memory block '{self.shm.name}' is not mapped")
+        self.counters = buf[:COUNTERS_SIZE]
+        if create:
+            self.counters[:] = bytes(COUNTERS_SIZE)
+            CAPACITY.pack_into(self.counters, CAPACITY_OFFSET, size)
+        self.capacity: int = CAPACITY.unpack_from(self.counters, CAPACITY_OFFSET)[0]
+        data_end = COUNTERS_SIZE + self.capacity
+        self.data = buf[COUNTERS_SIZE:data_end]
+        # consumer side position after the last message read, applied on release
+        self.read_end: typing.Optional[int] = None
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def head(self) -> int:
+        head: int = HEAD.unpack_from(self.counters, HEAD_OFFSET)[0]
+        return head
+
+    def tail(self) -> int:
+        tail: int = TAIL.unpack_from(self.counters, TAIL_OFFSET)[0]
+        return tail
+
+    def is_empty(self) -> bool:
+        return self.head() == self.tail()
+
+    def consumer_waiting(self) -> bool:
+        waiting: int = WAITING.unpack_from(self.counters, WAITING_OFFSET)[0]
+        return waiting == 1
+
+    def set_waiting(self, waiting: bool) -> None:
+        store_counter(self.counters, WAITING, WAITING_OFFSET, 1 if waiting else 0)
+
+    def try_write(self, data_start: int, wal_end: int, send_time_micros: int, payload: bytes) -> bool:
+        """Write one frame, returns False without writing if there is not enough free space"""
+        frame_size = FRAME_HEADER.size + len(payload)
+        # padding before a wrapped frame is always smaller than the frame, so frames up to half the capacity always fit
+        # into an empty ring
+        if frame_size > self.capacity // 2:
+            raise ValueError(f"frame of {frame_size} bytes is too large for a ring of {self.capacity} bytes")
+        head = self.head()
+        position = head % self.capacity
+        until_end = self.capacity - position
+        padding = until_end if until_end < frame_size else 0
+        if frame_size + padding > self.capacity - (head - self.tail()):
+            return False
+        if padding:
+            # with less space than a header left the consumer skips to the start without a marker
+            if padding >= FRAME_HEADER.size:
+                FRAME_HEADER.pack_into(self.data, position, 0, 0, 0, WRAP_MARKER)
+            head += padding
+            position = 0
+        FRAME_HEADER.pack_into(self.data, position, data_start, wal_end, send_time_micros, len(payload))
+        payload_start = position + FRAME_HEADER.size
+        payload_end = position + frame_size
+        self.data[payload_start:payload_end] = payload
+        # publish the frame only after it is completely written
+        store_counter(self.counters, HEAD, HEAD_OFFSET, head + frame_size)
+        return True
+
+    def read(self) -> typing.Optional[RingMessage]:
+        """Read the next frame in place, releases the previously read message. None if the ring is empty"""
+        self.release()
+        tail = self.tail()
+        head = self.head()
+        while tail != head:
+            position = tail % self.capacity
+            until_end = self.capacity - position
+            if until_end < FRAME_HEADER.size:
+                tail += until_end
+                continue
+            data_start, wal_end, send_time_micros, length = FRAME_HEADER.unpack_from(self.data, position)
+            if length == WRAP_MARKER:
+                tail += until_end
+                continue
+            payload_start = position + FRAME_HEADER.size
+            payload_end = payload_start + length
+            self.read_end = tail + FRAME_HEADER.size + length
+            return RingMessage(
+                data_start=data_start,
+                wal_end=wal_end,
+                send_time_micros=send_time_micros,
+                payload=self.data[payload_start:payload_end],
+            )
+        store_counter(self.counters, TAIL, TAIL_OFFSET, tail)
+        return None
+
+    def release(self) -> None:
+        """Make the space of the last message read available to the producer"""
+        if self.read_end is not None:
+            store_counter(self.counters, TAIL, TAIL_OFFSET, self.read_end)
+            self.read_end = None
+
+    def close(self) -> None:
+        self.counters.release()
+        self.data.release()
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
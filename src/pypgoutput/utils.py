@@ -1,8 +1,24 @@
-from typing import List
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import psycopg2
 import psycopg2.extras
 
+logger = logging.getLogger(__name__)
+
+# columns of all user attributes (not system or dropped columns) of relations in pg_attribute
+RELATION_COLUMNS_QUERY = """SELECT a.attrelid AS relation_id,
+        a.attname AS column_name,
+        a.atttypid AS type_id,
+        a.atttypmod,
+        format_type(a.atttypid, a.atttypmod) AS data_type,
+        a.attnotnull
+    FROM pg_attribute a
+    WHERE a.attnum > 0
+    AND NOT a.attisdropped
+"""
+
 
 class QueryError(Exception):
     pass
@@ -15,6 +31,8 @@ class ResourceError(Exception):
 class SourceDBHandler:
     def __init__(self, dsn: str) -> None:
         self.dsn = dsn
+        # number of queries run, reported by the reader's metrics
+        self.query_count = 0
         self.connect()
 
     def connect(self) -> None:
@@ -26,6 +44,7 @@ class SourceDBHandler:
             cursor = psycopg2.extras.DictCursor(self.conn)
         except Exception as err:
             raise ResourceError("Could not get cursor") from err
+        self.query_count += 1
         try:
             cursor.execute(query)
             result: psycopg2.extras.DictRow = cursor.fetchone()
@@ -36,13 +55,14 @@ class SourceDBHandler:
         finally:
             cursor.close()
 
-    def fetch(self, query: str) -> List[psycopg2.extras.DictRow]:
+    def fetch(self, query: str, vars: Optional[Sequence[Any]] = None) -> List[psycopg2.extras.DictRow]:
         try:
             cursor = psycopg2.extras.DictCursor(self.conn)
         except Exception as err:
             raise ResourceError("Could not get cursor") from err
+        self.query_count += 1
         try:
-            cursor.execute(query)
+            cursor.execute(query, vars)
             result: List[psycopg2.extras.DictRow] = cursor.fetchall()
             return result
         except Exception as err:
@@ -68,5 +88,141 @@ class SourceDBHandler:
         # attnotnull returns if column has not null constraint, we want to flip it
         return False if result["attnotnull"] else True
 
+    def fetch_relation_columns(self, relation_id: int) -> List[psycopg2.extras.DictRow]:
+        """Get formatted data type name and not null constraint of all columns of a relation in one query"""
+        query = f"""{RELATION_COLUMNS_QUERY}
+            AND a.attrelid = %s::oid
+            ORDER BY a.attnum;
+        """
+        return self.fetch(query=query, vars=(relation_id,))
+
+    def fetch_publication_columns(self, publication_name: str) -> List[psycopg2.extras.DictRow]:
+        """Get formatted data type name and not null constraint of all columns of all tables in a publication"""
+        query = f"""{RELATION_COLUMNS_QUERY}
+            AND a.attrelid IN (
+                SELECT format('%%I.%%I', schemaname, tablename)::regclass::oid
+                FROM pg_publication_tables
+                WHERE pubname = %s
+            )
+            ORDER BY a.attrelid, a.attnum;
+        """
+        return self.fetch(query=query, vars=(publication_name,))
+
     def close(self) -> None:
         self.conn.close()
+
+
+@dataclass(frozen=True)
+class CatalogColumn:
+    name: str
+    type_id: int
+    atttypmod: int
+    type_name: str
+    optional: bool
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    schema_version: int
+    columns: List[CatalogColumn]
+
+
+class CatalogCache:
+    """
+    Cache of catalog metadata (formatted type name and nullability) for the columns of replicated relations.
+
+    All columns of a relation are loaded with a single query, or all relations of a publication at once with
+    prefetch(). Entries are keyed by relation OID and a schema version derived from the (name, type id, type modifier)
+    of the columns in the Relation message, a Relation message with differing columns invalidates the entry and the
+    relation is loaded again.
+    """
+
+    def __init__(self, handler: SourceDBHandler) -> None:
+        self.handler = handler
+        self.entries: Dict[int, CatalogEntry] = dict()
+        # catalog rows loaded but not yet matched against a Relation message, by relation OID and column name
+        self.loaded: Dict[int, Dict[str, CatalogColumn]] = dict()
+
+    @staticmethod
+    def schema_version(columns: Sequence[Tuple[str, int, int]]) -> int:
+        return hash(tuple(columns))
+
+    @staticmethod
+    def to_catalog_column(row: psycopg2.extras.DictRow) -> CatalogColumn:
+        return CatalogColumn(
+            name=row["column_name"],
+            type_id=row["type_id"],
+            atttypmod=row["atttypmod"],
+            type_name=row["data_type"],
+            # attnotnull returns if column has not null constraint, we want to flip it
+            optional=not row["attnotnull"],
+        )
+
+    def prefetch(self, publication_name: str) -> None:
+        """Load the columns of every table in the publication with one query"""
+        for row in self.handler.fetch_publication_columns(publication_name=publication_name):
+            self.loaded.setdefault(row["relation_id"], dict())[row["column_name"]] = self.to_catalog_column(row)
+        logger.debug(f"Prefetched catalog for {len(self.loaded)} relations in publication '{publication_name}'")
+
+    def load(self, relation_id: int) -> Dict[str, CatalogColumn]:
+        rows = self.handler.fetch_relation_columns(relation_id=relation_id)
+        return {row["column_name"]: self.to_catalog_column(row) for row in rows}
+
+    @staticmethod
+    def match(
+        catalog: Dict[str, CatalogColumn], columns: Sequence[Tuple[str, int, int]]
+    ) -> Optional[List[CatalogColumn]]:
+        """Catalog columns in the order of the Relation message, None if the catalog does not match the message"""
+        matched = []
+        for name, type_id, atttypmod in columns:
+            column = catalog.get(name)
+            if column is None or column.type_id != type_id or column.atttypmod != atttypmod:
+                return None
+            matched.append(column)
+        return matched
+
+    def get_columns(
+        self, relation_id: int, table_schema: str, table_name: str, columns: Sequence[Tuple[str, int, int]]
+    ) -> List[CatalogColumn]:
+        """
+        Catalog metadata for the (name, type id, type modifier) columns of a Relation message, in message order.
+        """
+        schema_version = self.schema_version(columns)
+        entry = self.entries.get(relation_id)
+        if entry is not None and entry.schema_version == schema_version:
+            return entry.columns
+
+        matched = None
+        prefetched = self.loaded.pop(relation_id, None)
+        if prefetched is not None:
+            matched = self.match(prefetched, columns)
+        if matched is None:
+            matched = self.match(self.load(relation_id=relation_id), columns)
+        if matched is None:
+            # the catalog already moved on from the replicated schema (e.g. a later DDL), fall back to the values in
+            # the message and a lookup per column
+            logger.warning(f"Catalog does not match relation '{table_schema}.{table_name}' ({relation_id})")
+            matched = [self.fallback_column(table_schema, table_name, *column) for column in columns]
+        self.entries[relation_id] = CatalogEntry(schema_version=schema_version, columns=matched)
+        return matched
+
+    def fallback_column(
+        self, table_schema: str, table_name: str, name: str, type_id: int, atttypmod: int
+    ) -> CatalogColumn:
+        type_name = self.handler.fetch_column_type(type_id=type_id, atttypmod=atttypmod)
+        try:
+            optional = self.handler.fetch_if_column_is_optional(
+                table_schema=table_schema, table_name=table_name, column_name=name
+            )
+        except (QueryError, TypeError):
+            optional = True
+        return CatalogColumn(name=name, type_id=type_id, atttypmod=atttypmod, type_name=type_name, optional=optional)
+
+    def invalidate(self, relation_id: Optional[int] = None) -> None:
+        """Drop one relation, or everything when relation_id is None"""
+        if relation_id is None:
+            self.entries.clear()
+            self.loaded.clear()
+        else:
+            self.entries.pop(relation_id, None)
+            self.loaded.pop(relation_id, None)
@@ -0,0 +1,159 @@
+import decimal
+import pathlib
+import struct
+import typing
+import uuid
+
+import pytest
+
+from pypgoutput import ChangeEvent, ReplayReader
+from pypgoutput.capture import CaptureReader, CaptureWriter
+from pypgoutput.synthetic import SyntheticStream
+from pypgoutput.utils import CatalogColumn
+
+RELATION_ID = 16385
+COLUMNS = [
+    CatalogColumn(name="id", type_id=23, atttypmod=-1, type_name="integer", optional=False),
+    CatalogColumn(name="amount", type_id=1700, atttypmod=655366, type_name="numeric(10,2)", optional=True),
+]
+
+
+def relation() -> bytes:
+    payload = b"R" + struct.pack("!i", RELATION_ID) + b"public\x00test_table\x00d" + struct.pack("!h", len(COLUMNS))
+    for column in COLUMNS:
+        payload += struct.pack("!b", column.name == "id") + column.name.encode("utf-8") + b"\x00"
+        payload += struct.pack("!ii", column.type_id, column.atttypmod)
+    return payload
+
+
+def begin(xid: int, lsn: int) -> bytes:
+    return b"B" + struct.pack("!qqi", lsn, 695_000_000_000_000, xid)
+
+
+def insert(row_id: int, amount: bytes) -> bytes:
+    values = [str(row_id).encode("utf-8"), amount]
+    payload = b"I" + struct.pack("!i", RELATION_ID) + b"N" + struct.pack("!h", len(values))
+    return payload + b"".join(b"t" + struct.pack("!i", len(value)) + value for value in values)
+
+
+def commit(lsn: int) -> bytes:
+    return b"C" + struct.pack("!bqqq", 0, lsn, lsn + 8, 695_000_000_000_000)
+
+
+def write_capture(path: str, compress: bool) -> None:
+    writer = CaptureWriter(path=path, compress=compress)
+    writer.write_metadata(database="test_db", publication_name="test_pub", slot_name="test_slot")
+    writer.write_catalog(relation_id=RELATION_ID, columns=COLUMNS)
+    messages = [relation()]
+    for xid in range(1, 4):
+        lsn = xid * 1000
+        messages += [begin(xid, lsn), insert(xid, b"10.20"), insert(xid + 100, b"1.00"), commit(lsn)]
+    for idx, payload in enumerate(messages):
+        writer.write_message(data_start=idx, wal_end=idx, send_time_micros=1_600_000_000_000_000, payload=payload)
+    writer.close()
+
+
+@pytest.fixture(params=[False, True], ids=["plain", "zstd"])
+def capture_path(request: pytest.FixtureRequest, tmp_path: pathlib.Path) -> str:
+    if request.param:
+        pytest.importorskip("zstandard")
+    path = str(tmp_path / "capture.pgo")
+    write_capture(path=path, compress=bool(request.param))
+    return path
+
+
+def test_capture_reader(capture_path: str) -> None:
+    reader = CaptureReader(path=capture_path)
+    assert reader.metadata["database"] == "test_db"
+    messages = list(reader)
+    assert len(messages) == 13
+    assert bytes(messages[0].payload) == relation()
+    assert messages[1].data_start == 1
+    assert messages[1].send_time_micros == 1_600_000_000_000_000
+    # catalog records are applied while reading
+    assert (
+        reader.catalog.get_columns(
+            relation_id=RELATION_ID,
+            table_schema="public",
+            table_name="test_table",
+            columns=[(c.name, c.type_id, c.atttypmod) for c in COLUMNS],
+        )
+        == COLUMNS
+    )
+    reader.close()
+
+
+def test_capture_reader_partial(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "capture.pgo")
+    write_capture(path=path, compress=False)
+    with open(path, "r+b") as f:
+        f.truncate(pathlib.Path(path).stat().st_size - 3)
+    reader = CaptureReader(path=path)
+    # the partially written last message is dropped
+    assert len(list(reader)) == 12
+    reader.close()
+
+
+def test_replay_reader(capture_path: str) -> None:
+    reader = ReplayReader(path=capture_path)
+    events = list(reader)
+    assert len(events) == 6
+    event = events[0]
+    assert isinstance(event, ChangeEvent)
+    assert event.table_schema.db == "test_db"
+    assert event.table_schema.column_definitions[1].type_name == "numeric(10,2)"
+    assert event.after is not None
+    assert str(event.after["amount"]) == "10.20"
+    assert [typing.cast(typing.Dict[str, int], e.after)["id"] for e in events] == [1, 101, 2, 102, 3, 103]
+
+    # replayed deterministically, whole transactions at a time
+    reader = ReplayReader(path=capture_path, compact_events=True, table_columns={"public.*": ["id"]})
+    batches = list(reader.iter_transactions(max_transactions=2))
+    reader.stop()
+    assert [batch.xids for batch in batches] == [[1, 2], [3]]
+    assert [event.after for event in batches[1].events] == [{"id": 3}, {"id": 103}]
+    assert batches[1].end_lsn == 3008
+
+
+def test_replay_transactions_error(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "capture.pgo")
+    writer = CaptureWriter(path=path)
+    writer.write_metadata(database="test_db", publication_name="test_pub", slot_name="test_slot")
+    writer.write_catalog(relation_id=RELATION_ID, columns=COLUMNS)
+    messages = [relation(), begin(1, 1000), insert(1, b"1.00"), commit(1000)]
+    messages += [begin(2, 2000), insert(2, b"not a number"), commit(2000)]
+    for idx, payload in enumerate(messages):
+        writer.write_message(data_start=idx, wal_end=idx, send_time_micros=1_600_000_000_000_000, payload=payload)
+    writer.close()
+
+    # a failure is raised, not taken for the end of the stream
+    batches = ReplayReader(path=path).iter_transactions()
+    assert next(batches).xids == [1]
+    with pytest.raises(decimal.InvalidOperation):
+        next(batches)
+
+
+def test_replay_decode_workers(capture_path: str) -> None:
+    reader = ReplayReader(path=capture_path, decode_workers=1)
+    events = list(reader)
+    assert [typing.cast(typing.Dict[str, int], e.after)["id"] for e in events] == [1, 101, 2, 102, 3, 103]
+
+
+def test_replay_change_ids(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "synthetic.pgo")
+    stream = SyntheticStream(n_columns=4, transaction_size=10, n_tables=2, ops={"I": 4, "D": 1, "T": 1}, seed=1)
+    stream.write_capture(path=path, n_transactions=3)
+
+    def message_ids(**kwargs: typing.Any) -> typing.Dict[uuid.UUID, typing.Tuple[str, int]]:
+        return {event.message_id: (event.op, event.lsn) for event in ReplayReader(path=path, **kwargs)}
+
+    # derived from the commit LSN and the ordinal of the change in the transaction, the same on every replay
+    ids = message_ids()
+    assert len(ids) == 30
+    assert ids == message_ids(compact_events=True, decode_workers=1)
+    commit_lsn, ordinal = divmod(next(iter(ids)).int, 1 << 64)
+    assert commit_lsn > 0 and ordinal == 0
+    # filtered changes keep the ordinals of the changes after them
+    filtered = message_ids(exclude_tables=["public.synthetic_16386"], ops="IT")
+    assert 0 < len(filtered) < len(ids)
+    assert all(ids[message_id] == value for message_id, value in filtered.items())
@@ -0,0 +1,95 @@
+import os
+import pathlib
+import typing
+
+from pypgoutput import ReplayReader
+from pypgoutput.checkpoint import CHECKPOINT_RECORD, CheckpointStore
+from pypgoutput.reader import RawMessage
+from pypgoutput.synthetic import SyntheticStream
+
+
+def test_checkpoint_group_commit(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "checkpoint")
+    store = CheckpointStore(path=path, flush_interval=1.0)
+    assert (store.commit_lsn, store.end_lsn) == (0, 0)
+    now = store.last_flush
+    # recorded in memory until flush_interval passed
+    assert not store.record(commit_lsn=100, end_lsn=110, now=now + 0.1)
+    assert not store.record(commit_lsn=200, end_lsn=210, now=now + 0.5)
+    assert os.path.getsize(path) == 0
+    # one write and fsync for both transactions
+    assert store.record(commit_lsn=300, end_lsn=310, now=now + 1.0)
+    assert os.path.getsize(path) == CHECKPOINT_RECORD.size
+    # positions only move forward
+    assert not store.record(commit_lsn=200, end_lsn=210, now=now + 5.0)
+    assert store.end_lsn == 310
+    assert store.is_delivered(300)
+    assert not store.is_delivered(301)
+    store.record(commit_lsn=400, end_lsn=410, now=now + 1.5)
+    store.close()
+    assert os.path.getsize(path) == 2 * CHECKPOINT_RECORD.size
+
+    store = CheckpointStore(path=path)
+    assert (store.commit_lsn, store.end_lsn) == (400, 410)
+    store.close()
+
+
+def test_checkpoint_recovery(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "checkpoint")
+    store = CheckpointStore(path=path, flush_interval=0.0)
+    store.record(commit_lsn=100, end_lsn=110)
+    store.record(commit_lsn=200, end_lsn=210)
+    store.close()
+    # a torn write of the next record is cut off
+    with open(path, "ab") as f:
+        f.write(b"\x00" * (CHECKPOINT_RECORD.size // 2))
+    store = CheckpointStore(path=path)
+    assert (store.commit_lsn, store.end_lsn) == (200, 210)
+    assert os.path.getsize(path) == 2 * CHECKPOINT_RECORD.size
+    store.close()
+
+    # a corrupt record falls back to the previous one
+    with open(path, "r+b") as f:
+        f.seek(CHECKPOINT_RECORD.size + 3)
+        f.write(b"\xff")
+    store = CheckpointStore(path=path)
+    assert (store.commit_lsn, store.end_lsn) == (100, 110)
+    store.close()
+
+
+def test_checkpoint_compaction(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "checkpoint")
+    store = CheckpointStore(path=path, flush_interval=0.0, max_size=3 * CHECKPOINT_RECORD.size)
+    for lsn in range(1, 8):
+        store.record(commit_lsn=lsn * 100, end_lsn=lsn * 100 + 10)
+        assert os.path.getsize(path) <= 3 * CHECKPOINT_RECORD.size
+    store.close()
+    assert not os.path.exists(f"{path}.tmp")
+    store = CheckpointStore(path=path)
+    assert (store.commit_lsn, store.end_lsn) == (700, 710)
+    store.close()
+
+
+def test_checkpoint_idle_flush(tmp_path: pathlib.Path) -> None:
+    """Transactions recorded in memory are flushed once the stream goes idle"""
+    capture_path = str(tmp_path / "synthetic.pgo")
+    checkpoint_path = str(tmp_path / "checkpoint")
+    SyntheticStream(transaction_size=2).write_capture(path=capture_path, n_transactions=3)
+    # positions on disk while the stream is idle
+    idle_positions: typing.List[typing.Tuple[int, int]] = []
+
+    class IdleReplayReader(ReplayReader):
+        def read_capture(self) -> typing.Generator[typing.Optional[RawMessage], None, None]:
+            yield from self.capture_reader
+            yield None
+            # the reader handled the idle stream and asked for the next message, the checkpoint is still open
+            store = CheckpointStore(path=checkpoint_path)
+            idle_positions.append((store.commit_lsn, store.end_lsn))
+            store.close()
+
+    reader = IdleReplayReader(path=capture_path, checkpoint_path=checkpoint_path, checkpoint_interval=3600.0)
+    assert len(list(reader)) == 6
+    assert reader.checkpoint is not None
+    # no flush_interval passed between the transactions, the idle stream flushed all of them
+    assert idle_positions == [(reader.checkpoint.commit_lsn, reader.checkpoint.end_lsn)]
+    assert reader.checkpoint.end_lsn == reader.processed_lsn > 0
@@ -0,0 +1,207 @@
+import struct
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from pypgoutput import ColumnData, TupleData, decoders
+from pypgoutput.converters import (
+    ParserRegistry,
+    RowConverter,
+    parse_array_elements,
+    parse_bytea,
+    parse_date,
+    parse_time,
+    parse_timestamp,
+)
+from pypgoutput.reader import ColumnDefinition
+
+
+def test_parse_timestamp() -> None:
+    assert parse_timestamp("2020-01-01 00:00:00+00") == datetime(2020, 1, 1, tzinfo=timezone.utc)
+    assert parse_timestamp("2020-01-01 12:30:15.5+00") == datetime(2020, 1, 1, 12, 30, 15, 500000, tzinfo=timezone.utc)
+    assert parse_timestamp("2020-01-01 12:30:15.123456+05:30") == datetime(
+        2020, 1, 1, 12, 30, 15, 123456, tzinfo=timezone(timedelta(hours=5, minutes=30))
+    )
+    assert parse_timestamp("2020-01-01 12:30:15-08") == datetime(
+        2020, 1, 1, 12, 30, 15, tzinfo=timezone(timedelta(hours=-8))
+    )
+    assert parse_timestamp("2020-01-01 12:30:15.001") == datetime(2020, 1, 1, 12, 30, 15, 1000)
+    # values datetime can't represent stay text
+    for value in ("infinity", "-infinity", "2020-01-01 12:30:15+00 BC", "10000-01-01 00:00:00"):
+        assert parse_timestamp(value) == value
+
+
+def test_row_converter() -> None:
+    columns = [
+        ColumnDefinition(name="id", part_of_pkey=True, type_id=23, type_name="integer", optional=False),
+        ColumnDefinition(name="json_data", part_of_pkey=False, type_id=3802, type_name="jsonb", optional=True),
+        ColumnDefinition(name="amount", part_of_pkey=False, type_id=1700, type_name="numeric(10,2)", optional=True),
+        ColumnDefinition(
+            name="updated", part_of_pkey=False, type_id=1184, type_name="timestamp with time zone", optional=True
+        ),
+        ColumnDefinition(name="text_data", part_of_pkey=False, type_id=25, type_name="text", optional=True),
+    ]
+    converter = RowConverter(columns=columns)
+    tuple_data = TupleData(
+        n_columns=5,
+        column_data=[
+            ColumnData(col_data_category="t", col_data_length=2, col_data="10"),
+            ColumnData(col_data_category="t", col_data_length=10, col_data='{"a": [1]}'),
+            ColumnData(col_data_category="t", col_data_length=5, col_data="10.50"),
+            ColumnData(col_data_category="t", col_data_length=22, col_data="2020-01-01 00:00:00+00"),
+            ColumnData(col_data_category="n"),
+        ],
+    )
+    assert converter.convert(tuple_data) == {
+        "id": 10,
+        "json_data": {"a": [1]},
+        "amount": Decimal("10.50"),
+        "updated": datetime(2020, 1, 1, tzinfo=timezone.utc),
+        "text_data": None,
+    }
+    # REPLICA IDENTITY DEFAULT before tuples only hold the primary key, the other columns are sent as null
+    key_tuple = TupleData(
+        n_columns=5,
+        column_data=[ColumnData(col_data_category="t", col_data_length=2, col_data="10")]
+        + [ColumnData(col_data_category="n") for _ in range(4)],
+    )
+    assert converter.convert_key(key_tuple) == {"id": 10}
+
+    # lazily decoded tuples convert to the same values
+    message = b'I\x00\x00@\x01N\x00\x05t\x00\x00\x00\x0210t\x00\x00\x00\n{"a": [1]}t\x00\x00\x00\x0510.50t\x00\x00\x00\x162020-01-01 00:00:00+00n'
+    decoded_msg = decoders.Insert(message, lazy_tuples=True)
+    assert converter.convert(decoded_msg.new_tuple) == converter.convert(tuple_data)
+
+
+def test_parse_date() -> None:
+    assert parse_date("2020-02-29") == date(2020, 2, 29)
+    # values date can't represent stay text, BC dates are not read as AD dates
+    for value in ("infinity", "-infinity", "2020-01-01 BC", "10000-01-01"):
+        assert parse_date(value) == value
+
+
+def test_parse_time_and_bytea() -> None:
+    assert parse_time("12:30:15") == time(12, 30, 15)
+    assert parse_time("12:30:15.25+02") == time(12, 30, 15, 250000, tzinfo=timezone(timedelta(hours=2)))
+    assert parse_time("24:00:00") == "24:00:00"
+    assert parse_bytea("\\x00ff10") == b"\x00\xff\x10"
+    assert parse_bytea("a\\000\\\\") == b"a\x00\\"
+
+
+def test_parse_array_elements() -> None:
+    assert parse_array_elements("{}") == []
+    assert parse_array_elements("{1,NULL,3}") == ["1", None, "3"]
+    assert parse_array_elements('{"a b","NULL","q\\"uote","back\\\\slash",plain}') == [
+        "a b",
+        "NULL",
+        'q"uote',
+        "back\\slash",
+        "plain",
+    ]
+    with pytest.raises(ValueError):
+        parse_array_elements("{{1,2},{3,4}}")
+
+
+def test_parser_registry() -> None:
+    registry = ParserRegistry()
+    assert registry.get(16)("t") is True
+    assert registry.get(16)("f") is False
+    assert registry.get(1700)("1.10") == Decimal("1.10")
+    assert registry.get(1082)("2020-02-29") == date(2020, 2, 29)
+    assert registry.get(2950)("a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a11") == uuid.UUID(
+        "a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a11"
+    )
+    assert registry.get(3802)('{"a": null}') == {"a": None}
+    assert registry.get(1007)("{1,NULL,-3}") == [1, None, -3]
+    assert registry.get(1009)('{a,"b,c"}') == ["a", "b,c"]
+    assert registry.get(1185)('{"2020-01-01 00:00:00+00"}') == [datetime(2020, 1, 1, tzinfo=timezone.utc)]
+    assert registry.get(1182)("{2020-01-01,infinity}") == [date(2020, 1, 1), "infinity"]
+    # multi-dimensional arrays and arrays with explicit bounds stay text
+    assert registry.get(1007)("{{1,2},{3,4}}") == "{{1,2},{3,4}}"
+    assert registry.get(1007)("[0:1]={1,2}") == "[0:1]={1,2}"
+    # unknown types, e.g. enums, stay text
+    assert registry.get(99999)("happy") == "happy"
+
+    # overrides also apply to the elements of the matching array type
+    registry = ParserRegistry(overrides={1700: float})
+    assert registry.get(1700)("1.5") == 1.5
+    assert registry.get(1231)("{1.5,NULL}") == [1.5, None]
+    assert ParserRegistry().get(1700)("1.5") == Decimal("1.5")
+
+
+def test_binary_parsers() -> None:
+    registry = ParserRegistry()
+    assert registry.get_binary(21)(struct.pack("!h", -2)) == -2
+    assert registry.get_binary(20)(struct.pack("!q", 2**40)) == 2**40
+    assert registry.get_binary(701)(struct.pack("!d", 1.5)) == 1.5
+    assert registry.get_binary(16)(b"\x01") is True
+    assert registry.get_binary(1184)(struct.pack("!q", 1_000_000)) == datetime(2000, 1, 1, 0, 0, 1, tzinfo=timezone.utc)
+    assert registry.get_binary(1114)(struct.pack("!q", -1)) == datetime(1999, 12, 31, 23, 59, 59, 999999)
+    assert registry.get_binary(1082)(struct.pack("!i", -1)) == date(1999, 12, 31)
+    assert registry.get_binary(1083)(struct.pack("!q", 45015250000)) == time(12, 30, 15, 250000)
+    value = uuid.uuid4()
+    assert registry.get_binary(2950)(value.bytes) == value
+    assert registry.get_binary(3802)(b'\x01{"a": 1}') == {"a": 1}
+    assert registry.get_binary(25)("ünïcode".encode("utf-8")) == "ünïcode"
+    # unknown types stay bytes
+    assert registry.get_binary(99999)(b"\x00\x01") == b"\x00\x01"
+
+    # ndigits, weight, sign, dscale followed by base 10000 digits
+    numeric = registry.get_binary(1700)
+    assert str(numeric(struct.pack("!hhHhhh", 2, 0, 0, 2, 10, 2000))) == "10.20"
+    assert str(numeric(struct.pack("!hhHhhhh", 3, 1, 0x4000, 3, 123, 4567, 8910))) == "-1234567.891"
+    assert str(numeric(struct.pack("!hhHhh", 1, 1, 0, 0, 10))) == "100000"
+    assert str(numeric(struct.pack("!hhHhh", 1, -1, 0, 5, 12))) == "0.00120"
+    assert str(numeric(struct.pack("!hhHh", 0, 0, 0, 0))) == "0"
+    assert numeric(struct.pack("!hhHh", 0, 0, 0xC000, 0)).is_nan()
+
+    # one dimensional int4 array {1,NULL,-3}
+    array = struct.pack("!iiiii", 1, 1, 23, 3, 1) + struct.pack("!ii", 4, 1) + struct.pack("!i", -1)
+    array += struct.pack("!ii", 4, -3)
+    assert registry.get_binary(1007)(array) == [1, None, -3]
+    assert registry.get_binary(1007)(struct.pack("!iii", 0, 0, 23)) == []
+    # multi-dimensional arrays stay bytes, {{1},{2}}
+    array = struct.pack("!iiiiiii", 2, 0, 23, 2, 1, 1, 1) + struct.pack("!ii", 4, 1) + struct.pack("!ii", 4, 2)
+    assert registry.get_binary(1007)(array) == array
+
+
+def test_binary_parsers_out_of_range() -> None:
+    registry = ParserRegistry()
+    for type_id in (1114, 1184):
+        parse = registry.get_binary(type_id)
+        assert parse(struct.pack("!q", 2**63 - 1)) == "infinity"
+        assert parse(struct.pack("!q", -(2**63))) == "-infinity"
+        # 4714-11-24 BC, the earliest timestamp
+        assert parse(struct.pack("!q", -211813488000000000)) == struct.pack("!q", -211813488000000000)
+    date_parser = registry.get_binary(1082)
+    assert date_parser(struct.pack("!i", 2**31 - 1)) == "infinity"
+    assert date_parser(struct.pack("!i", -(2**31))) == "-infinity"
+    assert date_parser(struct.pack("!i", -2451545)) == struct.pack("!i", -2451545)
+    assert registry.get_binary(1083)(struct.pack("!q", 86_400_000_000)) == struct.pack("!q", 86_400_000_000)
+    assert registry.get_binary(1182)(struct.pack("!iiiii", 1, 0, 1082, 1, 1) + struct.pack("!ii", 4, 2**31 - 1)) == [
+        "infinity"
+    ]
+
+
+def test_row_converter_binary() -> None:
+    columns = [
+        ColumnDefinition(name="id", part_of_pkey=True, type_id=23, type_name="integer", optional=False),
+        ColumnDefinition(name="state", part_of_pkey=False, type_id=99999, type_name="state_enum", optional=True),
+        ColumnDefinition(name="amount", part_of_pkey=False, type_id=1700, type_name="numeric", optional=True),
+    ]
+    converter = RowConverter(columns=columns)
+    # types without a binary send function are still sent as text in binary mode
+    message = b"I\x00\x00@\x01N\x00\x03b\x00\x00\x00\x04\x00\x00\x00\x05t\x00\x00\x00\x02onn"
+    decoded_msg = decoders.Insert(message)
+    assert decoded_msg.new_tuple.column_data[0] == ColumnData(
+        col_data_category="b", col_data_length=4, col_data=b"\x00\x00\x00\x05"
+    )
+    assert converter.convert(decoded_msg.new_tuple) == {"id": 5, "state": "on", "amount": None}
+    assert converter.convert(decoders.Insert(message, lazy_tuples=True).new_tuple) == {
+        "id": 5,
+        "state": "on",
+        "amount": None,
+    }
+    assert converter.convert_key(decoded_msg.new_tuple) == {"id": 5}
@@ -37,6 +37,10 @@ def test_begin_message() -> None:
         "2021-04-20 20:13:16.867121+00:00".split("+")[0], "%Y-%m-%d %H:%M:%S.%f"
     ).replace(tzinfo=timezone.utc)
 
+    # xids are unsigned, as in the messages of streamed transactions
+    message = b"B\x00\x00\x00\x00\x01f4\x98\x00\x02ck\xd8i\x8a1\xff\xff\xff\xfe"
+    assert decoders.Begin(message).tx_xid == 2**32 - 2
+
     # test exceptions
     # wrong first byte
     message = b"R\x00\x00\x00\x00\x01f4\x98\x00\x02ck\xd8i\x8a1\x00\x00\x01\xeb"
@@ -134,3 +138,131 @@ def test_tuple_data() -> None:
     assert test_tuple.column_data[0].col_data_category == "t"
     assert test_tuple.column_data[0].col_data_length == 1
     assert test_tuple.column_data[0].col_data == "1"
+
+
+def test_decode_from_memoryview() -> None:
+    """decoders read in place from any buffer, including a slice of a larger payload"""
+    message = b"xxI\x00\x00@\x01N\x00\x03t\x00\x00\x00\x015nu"
+    decoded_msg = decoders.Insert(memoryview(message)[2:])
+    assert decoded_msg.relation_id == 16385
+    assert decoded_msg.new_tuple.n_columns == 3
+    assert decoded_msg.new_tuple.column_data[0] == ColumnData(col_data_category="t", col_data_length=1, col_data="5")
+    assert decoded_msg.new_tuple.column_data[1] == ColumnData(col_data_category="n")
+    assert decoded_msg.new_tuple.column_data[2] == ColumnData(col_data_category="u")
+    assert decoded_msg.offset == len(message) - 2
+
+    message = b"T\x00\x00\x00\x02\x01\x00\x00@\x01\x00\x00@\x02"
+    truncate_msg = decoders.Truncate(bytearray(message))
+    assert truncate_msg.relation_ids == [16385, 16386]
+    assert truncate_msg.option_bits == 1
+
+    # truncated payloads raise instead of returning partial values
+    with pytest.raises(ValueError):
+        decoders.Insert(b"I\x00\x00@\x01N\x00\x01t\x00\x00\x00\x055")
+
+
+def test_origin_message() -> None:
+    message = b"O\x00\x00\x00\x00\x01f4\x98origin_a\x00"
+    decoded_msg = decoders.Origin(message)
+    assert decoded_msg.byte1 == "O"
+    assert decoded_msg.origin_lsn == 23475352
+    assert decoded_msg.origin_name == "origin_a"
+
+    # test exceptions
+    # wrong first byte
+    message = b"B\x00\x00\x00\x00\x01f4\x98origin_a\x00"
+    with pytest.raises(ValueError):
+        decoded_msg = decoders.Origin(message)
+
+
+def test_type_message() -> None:
+    message = b"Y\x00\x00@\x05public\x00mood\x00"
+    decoded_msg = decoders.PgType(message)
+    assert decoded_msg.byte1 == "Y"
+    assert decoded_msg.type_id == 16389
+    assert decoded_msg.namespace == "public"
+    assert decoded_msg.type_name == "mood"
+
+    # test exceptions
+    # missing string terminator
+    message = b"Y\x00\x00@\x05public\x00mood"
+    with pytest.raises(ValueError):
+        decoded_msg = decoders.PgType(message)
+
+
+def test_relation_message_non_ascii_names() -> None:
+    name = "größe"
+    message = (
+        b"R\x00\x00@\x01\x00t\xc3\xa4ble\x00d\x00\x01\x00"
+        + name.encode("utf-8")
+        + b"\x00\x00\x00\x00\x19\xff\xff\xff\xff"
+    )
+    decoded_msg = decoders.Relation(message)
+    assert decoded_msg.namespace == ""
+    assert decoded_msg.relation_name == "täble"
+    assert decoded_msg.columns == [ColumnType(part_of_pkey=0, name=name, type_id=25, atttypmod=-1)]
+
+
+def test_lazy_tuple_data() -> None:
+    message = b"U\x00\x00@\x01O\x00\x02t\x00\x00\x00\x014nN\x00\x03t\x00\x00\x00\x015ut\x00\x00\x00\x03abc"
+    decoded_msg = decoders.Update(message, lazy_tuples=True)
+    assert decoded_msg.relation_id == 16385
+    assert decoded_msg.optional_tuple_identifier == "O"
+
+    old_tuple = decoded_msg.old_tuple
+    assert isinstance(old_tuple, decoders.LazyTupleData)
+    assert len(old_tuple) == 2
+    assert old_tuple.get_value(0) == "4"
+    assert old_tuple.get_value(1) is None
+
+    new_tuple = decoded_msg.new_tuple
+    assert isinstance(new_tuple, decoders.LazyTupleData)
+    assert new_tuple.n_columns == 3
+    assert new_tuple.get_category(1) == "u"
+    assert new_tuple.get_value(2) == "abc"
+    assert new_tuple[0] == ColumnData(col_data_category="t", col_data_length=1, col_data="5")
+    assert new_tuple[1] == ColumnData(col_data_category="u")
+
+    # materialized columns are the same as the eagerly decoded ones
+    eager_msg = decoders.Update(message)
+    assert new_tuple.column_data == eager_msg.new_tuple.column_data
+    assert old_tuple is not None and eager_msg.old_tuple is not None
+    assert old_tuple.column_data == eager_msg.old_tuple.column_data
+
+    # lengths are still validated on the first pass
+    with pytest.raises(ValueError):
+        decoders.Insert(b"I\x00\x00@\x01N\x00\x01t\x00\x00\x00\x055", lazy_tuples=True)
+
+
+def test_stream_messages() -> None:
+    decoded_start = decoders.StreamStart(b"S\x00\x00\x02\xf1\x01")
+    assert decoded_start.xid == 753
+    assert decoded_start.first_segment is True
+    assert decoders.StreamStart(b"S\xff\xff\xff\xfe\x00").xid == 2**32 - 2
+
+    assert decoders.StreamStop(b"E").byte1 == "E"
+
+    message = b"c\x00\x00\x02\xf1\x00\x00\x00\x00\x00\x01f4\x98\x00\x00\x00\x00\x01f4\xc8\x00\x02ck\xd8i\x8a1"
+    decoded_commit = decoders.StreamCommit(message)
+    assert decoded_commit.xid == 753
+    assert decoded_commit.flags == 0
+    assert decoded_commit.lsn_commit == 23475352
+    assert decoded_commit.lsn == 23475400
+    assert decoded_commit.commit_ts == datetime(2021, 4, 20, 20, 13, 16, 867121, tzinfo=timezone.utc)
+
+    decoded_abort = decoders.StreamAbort(b"A\x00\x00\x02\xf1\x00\x00\x02\xf2")
+    assert decoded_abort.xid == 753
+    assert decoded_abort.subxid == 754
+
+    with pytest.raises(ValueError):
+        decoders.StreamCommit(b"C\x00\x00\x02\xf1")
+
+
+def test_streamed_insert_message() -> None:
+    # same insert as test_insert_message with the xid following the message type
+    message = b"I\x00\x00\x02\xf1\x00\x00@\x01N\x00\x02t\x00\x00\x00\x015t\x00\x00\x00\x162012-01-01 12:00:00+00"
+    decoded_msg = decoders.Insert(message, streamed=True)
+    assert decoded_msg.xid == 753
+    assert decoded_msg.relation_id == 16385
+    assert decoded_msg.new_tuple.column_data[0] == ColumnData(col_data_category="t", col_data_length=1, col_data="5")
+    assert decoders.Insert(message[:1] + message[5:]).xid is None
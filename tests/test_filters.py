@@ -0,0 +1,250 @@
+import typing
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from pypgoutput.converters import DEFAULT_REGISTRY
+from pypgoutput.decoders import Insert
+from pypgoutput.filters import ChangeFilter, compile_predicate
+from pypgoutput.reader import (
+    AnyChangeEvent,
+    ChangeEvent,
+    ChangeTransformer,
+    ColumnDefinition,
+    DecodeJob,
+    DecodeWorker,
+    ReplicationMessage,
+    SchemaRegistry,
+    TableSchema,
+    Transaction,
+)
+
+TRANSACTION = Transaction(tx_id=491, begin_lsn=23475352, commit_ts=datetime(2022, 1, 1, tzinfo=timezone.utc))
+
+
+def make_schema(relation_id: int, table: str, columns: int = 3) -> TableSchema:
+    return TableSchema(
+        column_definitions=[
+            ColumnDefinition(name="id", part_of_pkey=True, type_id=23, type_name="integer", optional=False)
+        ]
+        + [
+            ColumnDefinition(name=f"col_{idx}", part_of_pkey=False, type_id=25, type_name="text", optional=True)
+            for idx in range(1, columns)
+        ],
+        db="test_db",
+        schema_name="public",
+        table=table,
+        relation_id=relation_id,
+    )
+
+
+def make_message(payload: bytes) -> ReplicationMessage:
+    return ReplicationMessage(
+        data_start=100,
+        payload=payload,
+        send_time=datetime.now(timezone.utc),
+        data_size=len(payload),
+        wal_end=100,
+    )
+
+
+def tuple_data(*values: bytes) -> bytes:
+    return len(values).to_bytes(2, "big") + b"".join(b"t" + len(v).to_bytes(4, "big") + v for v in values)
+
+
+def insert(relation_id: int, *values: bytes) -> ReplicationMessage:
+    return make_message(b"I" + relation_id.to_bytes(4, "big") + b"N" + tuple_data(*values))
+
+
+def delete(relation_id: int, *values: bytes) -> ReplicationMessage:
+    return make_message(b"D" + relation_id.to_bytes(4, "big") + b"K" + tuple_data(*values))
+
+
+def truncate(*relation_ids: int) -> ReplicationMessage:
+    payload = b"T" + len(relation_ids).to_bytes(4, "big") + b"\x00"
+    return make_message(payload + b"".join(r.to_bytes(4, "big") for r in relation_ids))
+
+
+def test_change_filter() -> None:
+    change_filter = ChangeFilter(
+        include_tables=["public.*", "audit.events"],
+        exclude_tables=["public.tmp_*"],
+        columns={"public.users": ["id", "email"], "public.*": ["id"]},
+    )
+    assert change_filter.accepts_table(schema_name="public", table="users")
+    assert change_filter.accepts_table(schema_name="audit", table="events")
+    assert not change_filter.accepts_table(schema_name="audit", table="logins")
+    assert not change_filter.accepts_table(schema_name="public", table="tmp_import")
+    # the first matching pattern applies
+    assert change_filter.columns_for(schema_name="public", table="users") == ["id", "email"]
+    assert change_filter.columns_for(schema_name="public", table="orders") == ["id"]
+    assert change_filter.columns_for(schema_name="audit", table="events") is None
+    assert change_filter.accepts_op("T")
+    assert not ChangeFilter(ops="ID").accepts_op("U")
+    with pytest.raises(ValueError):
+        ChangeFilter(ops=["I", "R"])
+    with pytest.raises(ValueError):
+        ChangeTransformer(strict_validation=True, change_filter=ChangeFilter(columns={"*": ["id"]}))
+
+
+def test_filtered_transformer() -> None:
+    change_filter = ChangeFilter(exclude_tables=["public.skipped"], columns={"public.projected": ["id", "col_2"]})
+    transformer = ChangeTransformer(change_filter=change_filter)
+    transformer.set_table_schema(make_schema(1, "skipped"))
+    transformer.set_table_schema(make_schema(2, "projected"))
+    transformer.set_table_schema(make_schema(3, "other"))
+    assert transformer.skipped_relations == {1}
+    assert transformer.projected_relations == {2}
+
+    # the change of a filtered relation is dropped before decoding, the broken tuple is never read
+    assert list(transformer.process_change(message=make_message(b"I\x00\x00\x00\x01N"), transaction=TRANSACTION)) == []
+
+    (event,) = transformer.process_change(message=insert(2, b"1", b"a", b"b"), transaction=TRANSACTION)
+    assert isinstance(event, ChangeEvent)
+    assert event.after == {"id": 1, "col_2": "b"}
+    assert [c.name for c in event.table_schema.column_definitions] == ["id", "col_2"]
+    assert [c.name for c in transformer.schema_registry.get(relation_id=2).column_definitions] == ["id", "col_2"]
+    (event,) = transformer.process_change(message=delete(2, b"1"), transaction=TRANSACTION)
+    assert isinstance(event, ChangeEvent)
+    assert event.before == {"id": 1}
+
+    (event,) = transformer.process_change(message=insert(3, b"2", b"a", b"b"), transaction=TRANSACTION)
+    assert isinstance(event, ChangeEvent)
+    assert event.after == {"id": 2, "col_1": "a", "col_2": "b"}
+
+    events = list(transformer.process_change(message=truncate(1, 2, 3), transaction=TRANSACTION))
+    assert [event.table_schema.table for event in events if isinstance(event, ChangeEvent)] == ["projected", "other"]
+
+
+def test_filtered_ops() -> None:
+    transformer = ChangeTransformer(change_filter=ChangeFilter(ops="D"))
+    transformer.set_table_schema(make_schema(1, "table"))
+    assert list(transformer.process_change(message=insert(1, b"1", b"a", b"b"), transaction=TRANSACTION)) == []
+    assert list(transformer.process_change(message=truncate(1), transaction=TRANSACTION)) == []
+    assert len(list(transformer.process_change(message=delete(1, b"1"), transaction=TRANSACTION))) == 1
+
+
+def test_filtered_decode_worker() -> None:
+    change_filter = ChangeFilter(columns={"*": ["id", "col_2"]})
+    transformer = ChangeTransformer(change_filter=change_filter)
+    worker = DecodeWorker(change_filter=change_filter)
+    schema_registry: SchemaRegistry = transformer.schema_registry
+
+    transformer.set_table_schema(make_schema(1, "table", columns=3))
+    job = DecodeJob(transaction=TRANSACTION)
+    job.add(
+        message=insert(1, b"1", b"a", b"b"), schema_registry=schema_registry, source_schemas=transformer.source_schemas
+    )
+    assert [event.after for event in worker.decode(job)] == [{"id": 1, "col_2": "b"}]
+
+    # a new column before the projected one keeps the projected schema and its version, the worker still moves on
+    table_schema = make_schema(1, "table", columns=3)
+    table_schema.column_definitions.insert(
+        1, ColumnDefinition(name="new", part_of_pkey=False, type_id=25, type_name="text", optional=True)
+    )
+    transformer.set_table_schema(table_schema)
+    assert schema_registry.version(1) == 1
+    job = DecodeJob(transaction=TRANSACTION)
+    job.add(
+        message=insert(1, b"2", b"new", b"a", b"b"),
+        schema_registry=schema_registry,
+        source_schemas=transformer.source_schemas,
+    )
+    assert [event.after for event in worker.decode(job)] == [{"id": 2, "col_2": "b"}]
+
+
+def test_row_predicate() -> None:
+    columns = [
+        ColumnDefinition(name="tenant_id", part_of_pkey=False, type_id=23, type_name="integer", optional=False),
+        ColumnDefinition(name="status", part_of_pkey=False, type_id=25, type_name="text", optional=True),
+        ColumnDefinition(name="amount", part_of_pkey=False, type_id=1700, type_name="numeric", optional=True),
+    ]
+    predicate = compile_predicate(
+        conditions={"tenant_id": 42, "status": ("paid", "refunded"), "amount": Decimal("10.20")},
+        columns=columns,
+        registry=DEFAULT_REGISTRY,
+    )
+    assert predicate.checks is not None
+    # values with the same text form match without parsing
+    assert [texts for _, _, texts, _, _, _ in predicate.checks] == [
+        frozenset({"42"}),
+        frozenset({"paid", "refunded"}),
+        frozenset({"10.20"}),
+    ]
+
+    def row(*values: bytes) -> Insert:
+        return Insert(insert(1, *values).payload, lazy_tuples=True)
+
+    assert predicate(row(b"42", b"paid", b"10.20").new_tuple)
+    # parsed when the text form differs
+    assert predicate(row(b"42", b"refunded", b"10.2").new_tuple)
+    assert not predicate(row(b"41", b"paid", b"10.20").new_tuple)
+    assert not predicate(row(b"42", b"pending", b"10.20").new_tuple)
+
+    predicate = compile_predicate(
+        conditions={"tenant_id": lambda value: value > 40, "status": [None, "paid"]},
+        columns=columns,
+        registry=DEFAULT_REGISTRY,
+    )
+    payload = b"I\x00\x00\x00\x01N\x00\x03t\x00\x00\x00\x0242nt\x00\x00\x00\x011"
+    assert predicate(Insert(payload).new_tuple)
+    # rows of tables without a filtered column are dropped
+    assert not compile_predicate(conditions={"missing": 1}, columns=columns, registry=DEFAULT_REGISTRY)(
+        row(b"42", b"paid", b"10.20").new_tuple
+    )
+
+
+def test_row_filters() -> None:
+    change_filter = ChangeFilter(rows={"public.orders": {"id": [1, 3]}}, columns={"public.orders": ["id", "col_1"]})
+    transformer = ChangeTransformer(change_filter=change_filter)
+    transformer.set_table_schema(make_schema(1, "orders"))
+    transformer.set_table_schema(make_schema(2, "other"))
+    events: typing.List[AnyChangeEvent] = []
+    for idx in range(1, 5):
+        for relation_id in (1, 2):
+            events.extend(
+                transformer.process_change(
+                    message=insert(relation_id, str(idx).encode(), b"a", b"b"), transaction=TRANSACTION
+                )
+            )
+    assert [(event.table_schema.table, event.after) for event in events if isinstance(event, ChangeEvent)] == [
+        ("orders", {"id": 1, "col_1": "a"}),
+        ("other", {"id": 1, "col_1": "a", "col_2": "b"}),
+        ("other", {"id": 2, "col_1": "a", "col_2": "b"}),
+        ("orders", {"id": 3, "col_1": "a"}),
+        ("other", {"id": 3, "col_1": "a", "col_2": "b"}),
+        ("other", {"id": 4, "col_1": "a", "col_2": "b"}),
+    ]
+    assert transformer.process_delete(message=delete(1, b"2"), transaction=TRANSACTION) is None
+    assert transformer.process_delete(message=delete(1, b"3"), transaction=TRANSACTION) is not None
+
+
+def test_row_filters_unknown_values() -> None:
+    """Conditions on values missing from the tuple data don't drop the row"""
+    transformer = ChangeTransformer(change_filter=ChangeFilter(rows={"public.orders": {"id": 1, "col_1": "a"}}))
+    transformer.set_table_schema(make_schema(1, "orders"))
+
+    def update(col_1: bytes) -> ReplicationMessage:
+        # col_1 is NULL (n) or an unchanged TOASTed value (u)
+        payload = b"U\x00\x00\x00\x01N\x00\x03t\x00\x00\x00\x011" + col_1 + b"t\x00\x00\x00\x01b"
+        return make_message(payload)
+
+    event = transformer.process_update(message=update(b"u"), transaction=TRANSACTION)
+    assert event is not None and event.after == {"id": 1, "col_1": None, "col_2": "b"}
+    assert transformer.process_update(message=update(b"n"), transaction=TRANSACTION) is None
+    # the same with eagerly decoded tuples
+    predicate = transformer.row_predicates[1]
+    assert predicate(Insert(b"I\x00\x00\x00\x01N\x00\x03t\x00\x00\x00\x011ut\x00\x00\x00\x01b").new_tuple)
+    assert not predicate(Insert(b"I\x00\x00\x00\x01N\x00\x03t\x00\x00\x00\x011nt\x00\x00\x00\x01b").new_tuple)
+
+    # the old row of a Delete without REPLICA IDENTITY FULL only has the key, its other columns are sent as NULL
+    key_only = make_message(b"D\x00\x00\x00\x01K\x00\x03t\x00\x00\x00\x011nn")
+    event = transformer.process_delete(message=key_only, transaction=TRANSACTION)
+    assert event is not None and event.before == {"id": 1}
+    assert transformer.process_delete(message=delete(1, b"2", b"a", b"b"), transaction=TRANSACTION) is None
+    # with REPLICA IDENTITY FULL all conditions apply
+    full = make_message(b"D\x00\x00\x00\x01O" + tuple_data(b"1", b"x", b"b"))
+    assert transformer.process_delete(message=full, transaction=TRANSACTION) is None
+    full = make_message(b"D\x00\x00\x00\x01O" + tuple_data(b"1", b"a", b"b"))
+    assert transformer.process_delete(message=full, transaction=TRANSACTION) is not None
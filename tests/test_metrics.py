@@ -0,0 +1,59 @@
+import pathlib
+import typing
+import urllib.request
+
+from pypgoutput import CallbackSink, PrometheusSink, ReplayReader, ReplicationMetrics
+from pypgoutput.metrics import Histogram
+from pypgoutput.synthetic import SyntheticStream
+
+
+def test_histogram() -> None:
+    histogram = Histogram(buckets=(0.001, 0.01))
+    for value in (0.0005, 0.001, 0.005, 0.5):
+        histogram.observe(value)
+    assert histogram.count == 4
+    assert histogram.cumulative() == [("0.001", 2), ("0.01", 3), ("+Inf", 4)]
+
+
+def test_replay_metrics(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "synthetic.pgo")
+    SyntheticStream(n_columns=4, transaction_size=10, n_tables=2, ops={"I": 3, "D": 1}, seed=1).write_capture(
+        path=path, n_transactions=5
+    )
+    snapshots: typing.List[typing.Dict[str, typing.Any]] = []
+    prometheus = PrometheusSink(port=0)
+    metrics = ReplicationMetrics(sinks=[CallbackSink(snapshots.append), prometheus], report_interval=3600)
+    reader = ReplayReader(path=path, compact_events=True, metrics=metrics)
+    events = [next(reader) for _ in range(50)]
+    assert len(events) == 50
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{prometheus.port}/metrics") as response:
+        exposition = response.read().decode("utf-8")
+    assert 'pgoutput_messages_total{type="B"} 5' in exposition
+    assert 'pgoutput_decode_seconds_count{type="I"}' in exposition
+    # the last Commit is read when the event after the last one is requested
+    assert 'pgoutput_decode_seconds_bucket{type="C",le="+Inf"} 4' in exposition
+    assert "# TYPE pgoutput_replication_lag_bytes gauge" in exposition
+
+    # reported when the reader stops at the end of the capture
+    assert list(reader) == []
+    (snapshot,) = snapshots
+    assert snapshot["messages"]["R"] == 2
+    assert snapshot["messages"]["I"] + snapshot["messages"]["D"] == 50
+    assert sum(snapshot["message_bytes"].values()) > 0
+    assert sum(snapshot["relation_events"].values()) == 50
+    assert set(snapshot["relation_events"]) == {"public.synthetic_16385", "public.synthetic_16386"}
+    assert snapshot["decode_seconds"]["I"]["count"] == snapshot["messages"]["I"]
+    assert snapshot["replication_lag_bytes"] == 0
+    assert snapshot["lag_seconds"] > 0
+    assert prometheus.server is None
+
+
+def test_replay_metrics_decode_workers(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "synthetic.pgo")
+    SyntheticStream(n_columns=4, transaction_size=10, seed=1).write_capture(path=path, n_transactions=3)
+    metrics = ReplicationMetrics()
+    reader = ReplayReader(path=path, metrics=metrics, decode_workers=1)
+    assert len(list(reader)) == 30
+    assert metrics.messages["I"] == 30
+    assert metrics.relation_events == {"public.synthetic_16385": 30}
@@ -0,0 +1,77 @@
+import pathlib
+import pstats
+import typing
+from datetime import datetime, timezone
+
+import pytest
+
+from pypgoutput import ReplayReader
+from pypgoutput.profiling import STAGES, StageProfiler
+from pypgoutput.reader import ChangeTransformer, Transaction
+from pypgoutput.synthetic import SyntheticStream
+from pypgoutput.transport import RingMessage
+
+TRANSACTION = Transaction(tx_id=1, begin_lsn=1, commit_ts=datetime(2022, 1, 14, tzinfo=timezone.utc))
+
+
+def process(transformer: ChangeTransformer, stream: SyntheticStream, n_transactions: int) -> int:
+    for table_schema in stream.table_schemas():
+        transformer.set_table_schema(table_schema)
+    n_events = 0
+    for idx, payload in enumerate(stream.messages(n_transactions)):
+        if payload[:1] in (b"I", b"U", b"D", b"T"):
+            message = RingMessage(idx, idx, 0, memoryview(payload))
+            n_events += len(list(transformer.process_change(message=message, transaction=TRANSACTION)))
+    return n_events
+
+
+@pytest.mark.parametrize("strict_validation", [False, True])
+def test_stage_profiler(strict_validation: bool) -> None:
+    transformer = ChangeTransformer(strict_validation=strict_validation)
+    profiler = StageProfiler(interval=3600)
+    profiler.install(transformer)
+    stream = SyntheticStream(n_columns=6, transaction_size=10, n_tables=2, ops={"I": 3, "U": 1, "D": 1}, seed=1)
+    assert process(transformer, stream, n_transactions=4) == 40
+
+    assert profiler.changes == 40
+    assert sum(cost.rows for cost in profiler.relations.values()) == 40
+    assert set(profiler.relations) == {16385, 16386}
+    converted = ("map", "validate") if strict_validation else ("convert",)
+    for stage in STAGES:
+        assert (profiler.stages[stage] > 0) == (stage in ("decode", "event") + converted)
+
+    report = profiler.report()
+    assert report.startswith("Profiled 40 of 40 changes")
+    assert "public.synthetic_16385" in report
+    assert "public.synthetic_16386" in report
+
+
+def test_stage_profiler_sampling() -> None:
+    transformer = ChangeTransformer()
+    reports: typing.List[str] = []
+    profiler = StageProfiler(interval=0, sample_every=4, output=reports.append)
+    profiler.install(transformer)
+    stream = SyntheticStream(n_columns=6, transaction_size=10, ops={"I": 1, "T": 1}, seed=1)
+    process(transformer, stream, n_transactions=2)
+    assert profiler.changes == 20
+    # every 4th change is timed and reported, Truncates only by stage
+    assert len(reports) == 5
+    assert sum(cost.rows for cost in profiler.relations.values()) < 5
+
+    with pytest.raises(ValueError):
+        StageProfiler(sample_every=0)
+
+
+def test_replay_profiler(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "synthetic.pgo")
+    SyntheticStream(n_columns=6, transaction_size=10, seed=1).write_capture(path=path, n_transactions=3)
+    reports: typing.List[str] = []
+    profiler = StageProfiler(interval=3600, output=reports.append, cprofile_interval=3600, cprofile_dir=str(tmp_path))
+    reader = ReplayReader(path=path, profiler=profiler)
+    assert len(list(reader)) == 30
+    # reported and snapshotted when the reader stops
+    (report,) = reports
+    assert "public.synthetic_16385" in report
+    (snapshot,) = tmp_path.glob("*.pstats")
+    stats = pstats.Stats(str(snapshot))
+    assert any(function == "process_insert" for _, _, function in stats.stats)  # type: ignore
@@ -1,8 +1,11 @@
+import asyncio
 import logging
 import multiprocessing
 import os
+import pathlib
 import typing
 from datetime import datetime, timezone
+from decimal import Decimal
 
 import psycopg2
 import psycopg2.errors as psycopg_errors
@@ -11,6 +14,15 @@ import psycopg2.extras
 import pytest
 
 import pypgoutput
+from pypgoutput.capture import CapturedCatalog
+from pypgoutput.checkpoint import CheckpointStore
+from pypgoutput.synthetic import (
+    encode_begin,
+    encode_commit,
+    encode_insert,
+    encode_relation,
+)
+from pypgoutput.utils import CatalogColumn
 
 HOST = os.environ.get("PGHOST")
 PORT = os.environ.get("PGPORT")
@@ -108,10 +120,13 @@ def test_dummy_test(cursor: psycopg2.extras.DictCursor) -> None:
     assert result["n"] == 1
 
 
-def validate_message_table_schema(message: pypgoutput.ChangeEvent, replica_identity_full: bool = False) -> None:
+def validate_message_table_schema(
+    message: pypgoutput.reader.AnyChangeEvent, replica_identity_full: bool = False
+) -> None:
     """Each message from the test table will have the same schema to be tested.
     Schema of table is in configure_test_db
     """
+    assert isinstance(message, pypgoutput.ChangeEvent)
     assert message.table_schema.db == "test_db"
     assert message.table_schema.schema_name == "public"
     assert message.table_schema.table == "integration"
@@ -166,6 +181,7 @@ def test_insert(cursor: psycopg2.extras.DictCursor, cdc_reader: pypgoutput.Logic
     assert cursor.fetchone()["n"] == 1
 
     message = next(cdc_reader)
+    assert isinstance(message, pypgoutput.ChangeEvent)
     assert message.op == "I"
 
     validate_message_table_schema(message=message)
@@ -201,7 +217,7 @@ def test_insert(cursor: psycopg2.extras.DictCursor, cdc_reader: pypgoutput.Logic
     assert list(message.after.keys()) == TEST_TABLE_COLUMNS
     assert message.after["id"] == 10
     assert message.after["json_data"] == {"data": 10}
-    assert message.after["amount"] == 10.2
+    assert message.after["amount"] == Decimal("10.20")
     assert message.after["updated_at"] == datetime.strptime(
         "2020-01-01 00:00:00+00".split("+")[0], "%Y-%m-%d %H:%M:%S"
     ).replace(tzinfo=timezone.utc)
@@ -221,7 +237,7 @@ def test_update(cursor: psycopg2.extras.DictCursor, cdc_reader: pypgoutput.Logic
     assert list(message.after.keys()) == TEST_TABLE_COLUMNS
     assert message.after["id"] == 10
     assert message.after["json_data"] == {"data": 10}
-    assert message.after["amount"] == 10.2
+    assert message.after["amount"] == Decimal("10.20")
     assert message.after["updated_at"] == datetime.strptime(
         "2020-02-01 00:00:00+00".split("+")[0], "%Y-%m-%d %H:%M:%S"
     ).replace(tzinfo=timezone.utc)
@@ -244,7 +260,7 @@ def test_update_key(cursor: psycopg2.extras.DictCursor, cdc_reader: pypgoutput.L
     assert list(message.after.keys()) == TEST_TABLE_COLUMNS
     assert message.after["id"] == 11
     assert message.after["json_data"] == {"data": 10}
-    assert message.after["amount"] == 10.2
+    assert message.after["amount"] == Decimal("10.20")
     assert message.after["updated_at"] == datetime.strptime(
         "2020-01-01 00:00:00+00".split("+")[0], "%Y-%m-%d %H:%M:%S"
     ).replace(tzinfo=timezone.utc)
@@ -278,7 +294,7 @@ def test_update_replica_identity_full(
     assert list(message.before.keys()) == TEST_TABLE_COLUMNS
     assert message.before["id"] == 10
     assert message.before["json_data"] == {"data": 10}
-    assert message.before["amount"] == 10.2
+    assert message.before["amount"] == Decimal("10.20")
     assert message.before["updated_at"] == datetime.strptime(
         "2020-01-01 00:00:00+00".split("+")[0], "%Y-%m-%d %H:%M:%S"
     ).replace(tzinfo=timezone.utc)
@@ -288,7 +304,7 @@ def test_update_replica_identity_full(
     assert list(message.after.keys()) == TEST_TABLE_COLUMNS
     assert message.after["id"] == 10
     assert message.after["json_data"] == {"data": 10}
-    assert message.after["amount"] == 10.2
+    assert message.after["amount"] == Decimal("10.20")
     assert message.after["updated_at"] == datetime.strptime(
         "2020-01-01 00:00:00+00".split("+")[0], "%Y-%m-%d %H:%M:%S"
     ).replace(tzinfo=timezone.utc)
@@ -309,7 +325,7 @@ def test_delete_replica_identity_full(
     assert list(message.before.keys()) == TEST_TABLE_COLUMNS
     assert message.before["id"] == 10
     assert message.before["json_data"] == {"data": 10}
-    assert message.before["amount"] == 10.2
+    assert message.before["amount"] == Decimal("10.20")
     assert message.before["updated_at"] == datetime.strptime(
         "2020-01-01 00:00:00+00".split("+")[0], "%Y-%m-%d %H:%M:%S"
     ).replace(tzinfo=timezone.utc)
@@ -337,3 +353,581 @@ def test_extractor_error(cdc_reader: pypgoutput.LogicalReplicationReader) -> Non
     extractor.connect()
     with pytest.raises(psycopg_errors.ObjectInUse):
         extractor.run()
+
+
+def test_iter_transactions(cursor: psycopg2.extras.DictCursor, cdc_reader: pypgoutput.LogicalReplicationReader) -> None:
+    cursor.execute(BASE_INSERT_STATEMENT)
+    cursor.execute(
+        "BEGIN; UPDATE public.integration SET text_data = 'new_text_value' WHERE id = 10; "
+        "INSERT INTO public.integration (id, updated_at) VALUES (11, '2020-01-01 00:00:00+00'); COMMIT;"
+    )
+    cursor.execute("DELETE FROM public.integration WHERE id = 11;")
+    batches = cdc_reader.iter_transactions(max_transactions=2)
+
+    # two transactions coalesced in one batch
+    batch = next(batches)
+    assert isinstance(batch, pypgoutput.TransactionBatch)
+    assert len(batch.xids) == 2
+    assert batch.xid == batch.xids[-1]
+    assert [event.op for event in batch.events] == ["I", "U", "I"]
+    assert batch.events[0].transaction.tx_id == batch.xids[0]
+    assert batch.events[-1].transaction.tx_id == batch.xids[1]
+    assert batch.begin_lsn == batch.events[0].transaction.begin_lsn
+    assert batch.commit_lsn < batch.end_lsn
+
+    # the last transaction is yielded when the stream goes idle
+    previous_end_lsn = batch.end_lsn
+    batch = next(batches)
+    assert len(batch.xids) == 1
+    assert [event.op for event in batch.events] == ["D"]
+    assert batch.begin_lsn > previous_end_lsn
+    assert cdc_reader.processed_lsn == previous_end_lsn
+
+
+def test_batched_transport(cursor: psycopg2.extras.DictCursor, configure_db: None) -> None:
+    cursor.execute(f"DROP TABLE IF EXISTS public.integration CASCADE; {TEST_TABLE_DDL}")
+    reader = pypgoutput.LogicalReplicationReader(
+        publication_name=PUBLICATION_NAME,
+        slot_name=SLOT_NAME,
+        host=HOST,
+        database=DATABASE_NAME,
+        port=PORT,
+        user=USER,
+        password=PASSWORD,
+        batch_size=50,
+        batch_max_latency=0.05,
+    )
+    cursor.execute(BASE_INSERT_STATEMENT)
+    cursor.execute("UPDATE public.integration SET text_data = 'new_text_value' WHERE id = 10;")
+    message = next(reader)
+    assert message.op == "I"
+    validate_message_table_schema(message=message)
+    assert message.after is not None
+    assert message.after["text_data"] == "dummy_value"
+    message = next(reader)
+    assert message.op == "U"
+    assert message.after is not None
+    assert message.after["text_data"] == "new_text_value"
+    reader.stop()
+
+
+def test_binary_mode(cursor: psycopg2.extras.DictCursor, configure_db: None) -> None:
+    if cursor.connection.server_version < 140000:
+        pytest.skip("binary mode requires PostgreSQL 14")
+    cursor.execute(f"DROP TABLE IF EXISTS public.integration CASCADE; {TEST_TABLE_DDL}")
+    reader = pypgoutput.LogicalReplicationReader(
+        publication_name=PUBLICATION_NAME,
+        slot_name=SLOT_NAME,
+        host=HOST,
+        database=DATABASE_NAME,
+        port=PORT,
+        user=USER,
+        password=PASSWORD,
+        binary=True,
+    )
+    cursor.execute(BASE_INSERT_STATEMENT)
+    message = next(reader)
+    assert message.op == "I"
+    validate_message_table_schema(message=message)
+    assert message.after is not None
+    assert message.after["id"] == 10
+    assert message.after["json_data"] == {"data": 10}
+    assert message.after["amount"] == Decimal("10.20")
+    assert message.after["updated_at"] == datetime(2020, 1, 1, tzinfo=timezone.utc)
+    assert message.after["text_data"] == "dummy_value"
+    reader.stop()
+
+
+def test_streamed_transactions(cursor: psycopg2.extras.DictCursor, configure_db: None) -> None:
+    if cursor.connection.server_version < 140000:
+        pytest.skip("streaming of in-progress transactions requires PostgreSQL 14")
+    cursor.execute(f"DROP TABLE IF EXISTS public.integration CASCADE; {TEST_TABLE_DDL}")
+    reader = pypgoutput.LogicalReplicationReader(
+        publication_name=PUBLICATION_NAME,
+        slot_name=SLOT_NAME,
+        host=HOST,
+        database=DATABASE_NAME,
+        port=PORT,
+        user=USER,
+        password=PASSWORD,
+        # the minimum, transactions larger than this are streamed before they commit
+        options="-c logical_decoding_work_mem=64kB",
+        streaming=True,
+        stream_spill_threshold=16 * 1024,
+    )
+    insert_rows = """INSERT INTO public.integration (id, json_data, amount, updated_at, text_data)
+        SELECT i, '{"data": 10}', 10.20, '2020-01-01 00:00:00+00', repeat('x', 100) FROM generate_series(%s, %s) AS i;"""
+    # the changes of an aborted streamed transaction are discarded
+    cursor.execute(f"BEGIN; {insert_rows % (1, 5000)} ROLLBACK;")
+    cursor.execute(insert_rows % (1, 5000))
+    cursor.execute("UPDATE public.integration SET text_data = 'after_stream' WHERE id = 1;")
+    tx_ids = set()
+    for expected_id in range(1, 5001):
+        message = next(reader)
+        assert message.op == "I"
+        assert message.after is not None
+        assert message.after["id"] == expected_id
+        tx_ids.add(message.transaction.tx_id)
+    assert len(tx_ids) == 1
+    message = next(reader)
+    assert message.op == "U"
+    assert message.after is not None
+    assert message.after["text_data"] == "after_stream"
+    reader.stop()
+
+
+def test_async_reader(cursor: psycopg2.extras.DictCursor, configure_db: None) -> None:
+    cursor.execute(f"DROP TABLE IF EXISTS public.integration CASCADE; {TEST_TABLE_DDL}")
+    reader = pypgoutput.AsyncLogicalReplicationReader(
+        publication_name=PUBLICATION_NAME,
+        slot_name=SLOT_NAME,
+        host=HOST,
+        database=DATABASE_NAME,
+        port=PORT,
+        user=USER,
+        password=PASSWORD,
+    )
+
+    async def consume(n_events: int) -> typing.List[pypgoutput.reader.AnyChangeEvent]:
+        events = []
+        async for event in reader:
+            events.append(event)
+            if len(events) == n_events:
+                break
+        return events
+
+    async def produce_and_consume() -> typing.List[pypgoutput.reader.AnyChangeEvent]:
+        consumer = asyncio.create_task(consume(n_events=2))
+        # the consumer waits on the replication connection until the changes arrive
+        await asyncio.sleep(0.5)
+        assert not consumer.done()
+        cursor.execute(BASE_INSERT_STATEMENT)
+        cursor.execute("UPDATE public.integration SET text_data = 'new_text_value' WHERE id = 10;")
+        return await asyncio.wait_for(consumer, timeout=10)
+
+    events = asyncio.run(produce_and_consume())
+    assert [event.op for event in events] == ["I", "U"]
+    validate_message_table_schema(message=events[0])
+    assert events[0].after is not None
+    assert events[0].after["text_data"] == "dummy_value"
+    assert events[1].after is not None
+    assert events[1].after["text_data"] == "new_text_value"
+    reader.stop()
+
+
+class FakeReplicationMessage:
+    def __init__(self, data_start: int, payload: bytes) -> None:
+        self.data_start = data_start
+        self.wal_end = data_start
+        self.send_time = datetime(2022, 1, 1, tzinfo=timezone.utc)
+        self.payload = payload
+
+
+class StreamEnd(Exception):
+    pass
+
+
+def fake_async_reader(
+    monkeypatch: pytest.MonkeyPatch,
+    messages: typing.List[typing.Optional[FakeReplicationMessage]],
+    **kwargs: typing.Any,
+) -> pypgoutput.AsyncLogicalReplicationReader:
+    """
+    AsyncLogicalReplicationReader streaming messages from a fake replication connection, ends after the last one.
+    None reports no message available
+    """
+
+    class FakeConnection:
+        def __init__(self, dsn: str) -> None:
+            pass
+
+        def close(self) -> None:
+            pass
+
+    class FakeCursor(FakeReplicationCursor):
+        def __init__(self, conn: FakeConnection) -> None:
+            super().__init__()
+            self.messages = list(messages)
+
+        def start_replication(self, start_lsn: int = 0, **kwargs: typing.Any) -> None:
+            self.start_lsn = start_lsn
+
+        def read_message(self) -> typing.Optional[FakeReplicationMessage]:
+            if not self.messages:
+                raise StreamEnd()
+            return self.messages.pop(0)
+
+        def close(self) -> None:
+            pass
+
+    def setup_catalog(reader: pypgoutput.AsyncLogicalReplicationReader) -> None:
+        reader.database = DATABASE_NAME or "test_db"
+        reader.catalog = CapturedCatalog()
+        reader.catalog.add(relation_id=16385, columns=[CatalogColumn("id", 23, -1, "integer", False)])
+
+    monkeypatch.setattr(psycopg2.extras, "LogicalReplicationConnection", FakeConnection)
+    monkeypatch.setattr(psycopg2.extras, "ReplicationCursor", FakeCursor)
+    monkeypatch.setattr(pypgoutput.async_reader, "check_server_version", lambda **kwargs: None)
+    monkeypatch.setattr(pypgoutput.AsyncLogicalReplicationReader, "setup_catalog", setup_catalog)
+    return pypgoutput.AsyncLogicalReplicationReader(publication_name=PUBLICATION_NAME, slot_name=SLOT_NAME, **kwargs)
+
+
+def insert_transactions(*row_ids: int) -> typing.List[typing.Optional[FakeReplicationMessage]]:
+    """A Relation message and a transaction inserting each row, the transaction of row n commits at LSN 1000 * n"""
+    messages: typing.List[typing.Optional[FakeReplicationMessage]] = [
+        FakeReplicationMessage(100, encode_relation(16385, "public", "integration", [("id", 23, -1, True)]))
+    ]
+    commit_ts = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    for row_id in row_ids:
+        commit_lsn = 1000 * row_id
+        messages.append(FakeReplicationMessage(commit_lsn - 100, encode_begin(commit_lsn, commit_ts, xid=row_id)))
+        messages.append(FakeReplicationMessage(commit_lsn - 50, encode_insert(16385, [str(row_id)])))
+        messages.append(FakeReplicationMessage(commit_lsn, encode_commit(commit_lsn, commit_lsn + 8, commit_ts)))
+    return messages
+
+
+def test_async_reader_processed_lsn(monkeypatch: pytest.MonkeyPatch) -> None:
+    reader = fake_async_reader(monkeypatch, insert_transactions(1, 2))
+
+    async def consume() -> typing.List[typing.Tuple[int, int]]:
+        processed = []
+        async for event in reader:
+            assert event.after is not None
+            processed.append((event.after["id"], reader.processed_lsn))
+        return processed
+
+    # a transaction is processed once the consumer asks for the event after its last one
+    assert asyncio.run(consume()) == [(1, 0), (2, 1008)]
+    assert reader.processed_lsn == 2008
+
+
+def test_async_reader_checkpoint(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path) -> None:
+    checkpoint_path = str(tmp_path / "checkpoint")
+    reader = fake_async_reader(
+        monkeypatch, insert_transactions(1, 2, 3), checkpoint_path=checkpoint_path, checkpoint_interval=0.0
+    )
+    assert reader.cur.start_lsn == 0  # type: ignore[attr-defined]
+
+    async def consume(n_events: typing.Optional[int] = None) -> typing.List[int]:
+        row_ids = []
+        async for event in reader:
+            assert event.after is not None
+            row_ids.append(event.after["id"])
+            if len(row_ids) == n_events:
+                break
+        return row_ids
+
+    # stopped while the second transaction is consumed, the first one is checkpointed
+    assert asyncio.run(consume(n_events=2)) == [1, 2]
+    reader.stop()
+    checkpoint = CheckpointStore(path=checkpoint_path)
+    assert (checkpoint.commit_lsn, checkpoint.end_lsn) == (1000, 1008)
+    checkpoint.close()
+
+    # resumes after the checkpoint, transactions the server sends again are skipped
+    reader = fake_async_reader(monkeypatch, insert_transactions(1, 2, 3), checkpoint_path=checkpoint_path)
+    assert reader.cur.start_lsn == 1008  # type: ignore[attr-defined]
+    assert asyncio.run(consume()) == [2, 3]
+    assert reader.processed_lsn == 3008
+    checkpoint = CheckpointStore(path=checkpoint_path)
+    assert (checkpoint.commit_lsn, checkpoint.end_lsn) == (3000, 3008)
+    checkpoint.close()
+
+    # transactions recorded in memory are flushed when the stream goes idle
+    reader = fake_async_reader(
+        monkeypatch, insert_transactions(4, 5) + [None], checkpoint_path=checkpoint_path, checkpoint_interval=3600.0
+    )
+    idle_positions: typing.List[typing.Tuple[int, int]] = []
+
+    async def wait_for_data() -> None:
+        store = CheckpointStore(path=checkpoint_path)
+        idle_positions.append((store.commit_lsn, store.end_lsn))
+        store.close()
+
+    setattr(reader, "wait_for_data", wait_for_data)
+    assert asyncio.run(consume()) == [4, 5]
+    assert idle_positions == [(5000, 5008)]
+
+    # options which need the extractor process
+    with pytest.raises(ValueError, match="decode_workers"):
+        fake_async_reader(monkeypatch, [], decode_workers=2)
+    with pytest.raises(ValueError, match="capture_path"):
+        fake_async_reader(monkeypatch, [], capture_path=str(tmp_path / "capture.pgo"))
+
+
+class FakeReplicationCursor:
+    def __init__(self) -> None:
+        self.flushed: typing.List[int] = []
+
+    def send_feedback(self, flush_lsn: int = 0, force: bool = False) -> None:
+        self.flushed.append(flush_lsn)
+
+
+def test_feedback_scheduler() -> None:
+    cursor = FakeReplicationCursor()
+    scheduler = pypgoutput.reader.FeedbackScheduler(interval=1.0, max_bytes=1000)
+    scheduler.last_sent = 0.0
+    for lsn in (100, 200, 300):
+        scheduler.sent_commit(lsn)
+
+    # nothing processed yet
+    assert scheduler.seconds_until_due(now=0.5) is None
+    assert scheduler.maybe_send(cursor, now=5.0) is False  # type: ignore[arg-type]
+
+    # acks between commits only confirm the fully processed transactions
+    scheduler.processed(250)
+    assert scheduler.confirmed_lsn == 200
+    # not due until the interval passed
+    assert scheduler.seconds_until_due(now=0.25) == 0.75
+    assert scheduler.maybe_send(cursor, now=0.5) is False  # type: ignore[arg-type]
+    assert scheduler.maybe_send(cursor, now=1.0) is True  # type: ignore[arg-type]
+    assert cursor.flushed == [200]
+
+    # acks beyond the last sent commit never confirm past it
+    scheduler.processed(5000)
+    assert scheduler.confirmed_lsn == 300
+    assert scheduler.maybe_send(cursor, now=1.5) is False  # type: ignore[arg-type]
+    assert scheduler.maybe_send(cursor, now=2.0) is True  # type: ignore[arg-type]
+    assert cursor.flushed == [200, 300]
+
+    # enough WAL confirmed triggers an update before the interval
+    scheduler.sent_commit(1500)
+    scheduler.processed(1500)
+    assert scheduler.maybe_send(cursor, now=2.1) is True  # type: ignore[arg-type]
+    assert cursor.flushed == [200, 300, 1500]
+
+
+def test_idle_feedback() -> None:
+    class IdleCursor(FakeReplicationCursor):
+        def read_message(self) -> None:
+            return None
+
+    pipe_out_conn, pipe_in_conn = multiprocessing.Pipe(duplex=True)
+    extractor = pypgoutput.ExtractRaw(
+        dsn="", publication_name=PUBLICATION_NAME, slot_name=SLOT_NAME, pipe_conn=pipe_in_conn, feedback_interval=0.0
+    )
+    cursor = IdleCursor()
+    extractor.cur = cursor  # type: ignore[assignment]
+    # the last message processed by the reader was a commit
+    extractor.feedback.sent_commit(100)
+    extractor.feedback.processed(100)
+
+    class Idle(Exception):
+        pass
+
+    def wait_for_data(timeout: typing.Optional[float] = None) -> None:
+        raise Idle()
+
+    setattr(extractor, "wait_for_data", wait_for_data)
+    with pytest.raises(Idle):
+        extractor.consume_messages()
+    # confirmed without another message arriving
+    assert cursor.flushed == [100]
+
+
+def test_capture_catalog_connection(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    class FakeConnection:
+        closed = False
+
+        def get_dsn_parameters(self) -> typing.Dict[str, str]:
+            return {"dbname": "test_db"}
+
+        def close(self) -> None:
+            self.closed = True
+
+    class FakeHandler:
+        fail = False
+
+        def __init__(self, dsn: str) -> None:
+            self.conn = FakeConnection()
+            handlers.append(self)
+
+        def fetch_publication_columns(self, publication_name: str) -> typing.List[typing.Any]:
+            if self.fail:
+                raise pypgoutput.utils.QueryError("Error running query")
+            return []
+
+    handlers: typing.List[FakeHandler] = []
+    monkeypatch.setattr(pypgoutput.reader, "SourceDBHandler", FakeHandler)
+    _, pipe_in_conn = multiprocessing.Pipe(duplex=True)
+    extractor = pypgoutput.ExtractRaw(
+        dsn="", publication_name=PUBLICATION_NAME, slot_name=SLOT_NAME, pipe_conn=pipe_in_conn
+    )
+    # the connection stays open while capturing, the catalog of new relations is read from it
+    extractor.start_capture(capture_path=str(tmp_path / "capture.pgo"))
+    assert not handlers[0].conn.closed
+    extractor.close_capture()
+    assert handlers[0].conn.closed
+    assert extractor.capture_writer is None
+
+    # and is closed when the capture fails to start
+    FakeHandler.fail = True
+    with pytest.raises(pypgoutput.utils.QueryError):
+        extractor.start_capture(capture_path=str(tmp_path / "failed.pgo"))
+    assert handlers[1].conn.closed
+    assert extractor.capture_writer is None
+
+
+def test_decode_pool() -> None:
+    def table_schema(type_id: int, type_name: str) -> pypgoutput.reader.TableSchema:
+        return pypgoutput.reader.TableSchema(
+            column_definitions=[
+                pypgoutput.reader.ColumnDefinition(
+                    name="id", part_of_pkey=True, type_id=23, type_name="integer", optional=False
+                ),
+                pypgoutput.reader.ColumnDefinition(
+                    name="value", part_of_pkey=False, type_id=type_id, type_name=type_name, optional=True
+                ),
+            ],
+            db="test_db",
+            schema_name="public",
+            table="test_table",
+            relation_id=16385,
+        )
+
+    def insert(idx: int) -> pypgoutput.reader.ReplicationMessage:
+        value = str(idx).encode("utf-8")
+        payload = b"I\x00\x00@\x01N\x00\x02t\x00\x00\x00\x011t" + len(value).to_bytes(4, "big") + value
+        return pypgoutput.reader.ReplicationMessage(
+            data_start=idx,
+            payload=payload,
+            send_time=datetime.now(timezone.utc),
+            data_size=len(payload),
+            wal_end=idx,
+        )
+
+    schema_registry = pypgoutput.SchemaRegistry()
+    schema_registry.register(table_schema(type_id=23, type_name="integer"))
+    jobs = []
+    for idx in range(20):
+        transaction = pypgoutput.reader.Transaction(tx_id=idx, begin_lsn=idx, commit_ts=datetime.now(timezone.utc))
+        job = pypgoutput.reader.DecodeJob(transaction=transaction)
+        job.add(message=insert(idx), schema_registry=schema_registry)
+        job.commit = pypgoutput.TransactionBatch(
+            xid=idx, begin_lsn=idx, commit_lsn=idx, end_lsn=idx, commit_ts=transaction.commit_ts
+        )
+        jobs.append(job)
+    # the relation changed type, the last job carries the new schema version
+    job.schemas[16385] = (2, table_schema(type_id=25, type_name="text"))
+
+    pool = pypgoutput.reader.DecodePool(workers=2, max_pending=0)
+    try:
+        for job in jobs:
+            pool.submit(job=job)
+        results = list(pool.completed(block=True))
+    finally:
+        pool.shutdown()
+
+    # results come back in submission order
+    assert [commit.end_lsn for commit, _ in results if commit is not None] == list(range(20))
+    events = [event for _, job_events in results for event in job_events]
+    assert [event.transaction.tx_id for event in events] == list(range(20))
+    assert [event.after["value"] for event in events[:-1]] == list(range(19))  # type: ignore[index]
+    assert events[-1].after == {"id": 1, "value": "19"}
+    assert isinstance(events[0], pypgoutput.ChangeEvent)
+    assert events[0].op == "I"
+    assert events[0].table_schema == schema_registry.get(relation_id=16385)
+
+
+def test_decode_workers(cursor: psycopg2.extras.DictCursor, configure_db: None) -> None:
+    cursor.execute(f"DROP TABLE IF EXISTS public.integration CASCADE; {TEST_TABLE_DDL}")
+    reader = pypgoutput.LogicalReplicationReader(
+        publication_name=PUBLICATION_NAME,
+        slot_name=SLOT_NAME,
+        host=HOST,
+        database=DATABASE_NAME,
+        port=PORT,
+        user=USER,
+        password=PASSWORD,
+        batch_size=50,
+        batch_max_latency=0.05,
+        decode_workers=2,
+    )
+    for idx in range(1, 101):
+        cursor.execute(
+            "INSERT INTO public.integration (id, json_data, amount, updated_at, text_data) "
+            f"VALUES ({idx}, '{{}}', {idx}.00, '2020-01-01 00:00:00+00', 'value_{idx}');"
+        )
+    # a schema change after changes in the same transaction
+    cursor.execute(
+        "BEGIN; UPDATE public.integration SET text_data = 'before' WHERE id = 1; "
+        "ALTER TABLE public.integration ADD COLUMN extra integer; "
+        "UPDATE public.integration SET text_data = 'after', extra = 1 WHERE id = 1; COMMIT;"
+    )
+    messages = [next(reader) for _ in range(102)]
+    # change events are yielded in commit order
+    assert [message.after["id"] for message in messages[:100]] == list(range(1, 101))  # type: ignore[index]
+    assert messages[100].after is not None
+    assert "extra" not in messages[100].after
+    assert messages[101].after is not None
+    assert messages[101].after["extra"] == 1
+    assert reader.processed_lsn > 0
+    reader.stop()
+
+    with pytest.raises(ValueError):
+        pypgoutput.LogicalReplicationReader(
+            publication_name=PUBLICATION_NAME, slot_name=SLOT_NAME, host=HOST, decode_workers=2
+        )
+
+
+def test_change_filter(cursor: psycopg2.extras.DictCursor, configure_db: None) -> None:
+    cursor.execute(f"DROP TABLE IF EXISTS public.integration CASCADE; {TEST_TABLE_DDL}")
+    cursor.execute("DROP TABLE IF EXISTS public.filtered; CREATE TABLE public.filtered (id integer primary key);")
+    reader = pypgoutput.LogicalReplicationReader(
+        publication_name=PUBLICATION_NAME,
+        slot_name=SLOT_NAME,
+        host=HOST,
+        database=DATABASE_NAME,
+        port=PORT,
+        user=USER,
+        password=PASSWORD,
+        exclude_tables=["public.filt*"],
+        table_columns={"public.integration": ["id", "text_data"]},
+        ops="IU",
+    )
+    cursor.execute("INSERT INTO public.filtered (id) VALUES (1);")
+    cursor.execute(BASE_INSERT_STATEMENT)
+    cursor.execute("DELETE FROM public.integration WHERE id = 10;")
+    cursor.execute(BASE_INSERT_STATEMENT)
+    cursor.execute("UPDATE public.integration SET text_data = 'new_text_value' WHERE id = 10;")
+    messages = [next(reader) for _ in range(3)]
+    reader.stop()
+    assert [message.op for message in messages] == ["I", "I", "U"]
+    assert messages[0].after == {"id": 10, "text_data": "dummy_value"}
+    assert messages[2].after == {"id": 10, "text_data": "new_text_value"}
+    assert isinstance(messages[2], pypgoutput.ChangeEvent)
+    assert [c.name for c in messages[2].table_schema.column_definitions] == ["id", "text_data"]
+    assert reader.skipped_relations
+    cursor.execute("DROP TABLE public.filtered;")
+
+
+def test_checkpoint(cursor: psycopg2.extras.DictCursor, configure_db: None, tmp_path: pathlib.Path) -> None:
+    cursor.execute(f"DROP TABLE IF EXISTS public.integration CASCADE; {TEST_TABLE_DDL}")
+    checkpoint_path = str(tmp_path / "checkpoint")
+    reader = pypgoutput.LogicalReplicationReader(
+        publication_name=PUBLICATION_NAME,
+        slot_name=SLOT_NAME,
+        host=HOST,
+        database=DATABASE_NAME,
+        port=PORT,
+        user=USER,
+        password=PASSWORD,
+        checkpoint_path=checkpoint_path,
+        checkpoint_interval=0.0,
+    )
+    cursor.execute(BASE_INSERT_STATEMENT)
+    cursor.execute("UPDATE public.integration SET text_data = 'new_text_value' WHERE id = 10;")
+    message = next(reader)
+    assert message.op == "I"
+    message = next(reader)
+    assert message.op == "U"
+    # the insert transaction was consumed when the update was requested
+    assert reader.checkpoint is not None
+    assert reader.checkpoint.commit_lsn < message.transaction.begin_lsn
+    end_lsn = reader.checkpoint.end_lsn
+    assert end_lsn == reader.processed_lsn > 0
+    reader.stop()
+
+    checkpoint = CheckpointStore(path=checkpoint_path)
+    assert checkpoint.end_lsn == end_lsn
+    checkpoint.close()
@@ -0,0 +1,277 @@
+import io
+import json
+import typing
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from pypgoutput import CompactChangeEvent, SchemaRegistry
+from pypgoutput.reader import (
+    AnyChangeEvent,
+    ChangeEvent,
+    ChangeTransformer,
+    ColumnDefinition,
+    ReplicationMessage,
+    TableSchema,
+    Transaction,
+)
+from pypgoutput.serializers import (
+    AvroSerializer,
+    JsonLinesSerializer,
+    MsgpackSerializer,
+    StreamSerializer,
+    avro_canonical_form,
+    avro_fingerprint,
+)
+
+
+def make_schema(value_type_id: int, value_type_name: str) -> TableSchema:
+    return TableSchema(
+        column_definitions=[
+            ColumnDefinition(name="id", part_of_pkey=True, type_id=23, type_name="integer", optional=False),
+            ColumnDefinition(
+                name="value", part_of_pkey=False, type_id=value_type_id, type_name=value_type_name, optional=True
+            ),
+        ],
+        db="test_db",
+        schema_name="public",
+        table="test_table",
+        relation_id=16385,
+    )
+
+
+def make_insert(value: bytes) -> ReplicationMessage:
+    payload = b"I\x00\x00@\x01N\x00\x02t\x00\x00\x00\x011t" + len(value).to_bytes(4, "big") + value
+    return ReplicationMessage(
+        data_start=100,
+        payload=payload,
+        send_time=datetime.now(timezone.utc),
+        data_size=len(payload),
+        wal_end=100,
+    )
+
+
+def test_schema_registry() -> None:
+    registry = SchemaRegistry()
+    assert registry.register(make_schema(23, "integer")) == 1
+    # the same schema sent again keeps its version
+    assert registry.register(make_schema(23, "integer")) == 1
+    assert registry.register(make_schema(1184, "timestamp with time zone")) == 2
+    assert registry.version(16385) == 2
+    assert registry.get(relation_id=16385, version=1).column_definitions[1].type_id == 23
+    assert registry.get(relation_id=16385).column_definitions[1].type_id == 1184
+
+
+def test_stream_serializer_abstract() -> None:
+    class NoFormat(StreamSerializer):
+        pass
+
+    # a serializer without encode_record fails when created, not while encoding
+    with pytest.raises(TypeError):
+        NoFormat(schema_registry=SchemaRegistry())  # type: ignore[abstract]
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "json"])
+def use_orjson(request: pytest.FixtureRequest) -> bool:
+    if request.param:
+        pytest.importorskip("orjson")
+    return bool(request.param)
+
+
+def test_json_lines_compact_events(use_orjson: bool) -> None:
+    transformer = ChangeTransformer(compact_events=True)
+    transaction = Transaction(tx_id=491, begin_lsn=23475352, commit_ts=datetime(2022, 1, 1, tzinfo=timezone.utc))
+    events: typing.List[CompactChangeEvent] = []
+    transformer.set_table_schema(make_schema(23, "integer"))
+    for value in (b"1", b"2"):
+        event = transformer.process_insert(message=make_insert(value), transaction=transaction)
+        assert isinstance(event, CompactChangeEvent)
+        events.append(event)
+    transformer.set_table_schema(make_schema(1184, "timestamp with time zone"))
+    event = transformer.process_insert(message=make_insert(b"2022-01-14 17:22:10.298334+00"), transaction=transaction)
+    assert isinstance(event, CompactChangeEvent)
+    events.append(event)
+
+    # all events share the transaction, the schema is resolved on demand
+    assert events[0].transaction is events[2].transaction
+    assert [event.schema_version for event in events] == [1, 1, 2]
+    assert events[0].after == {"id": 1, "value": 1}
+    full_event = events[2].to_change_event(transformer.schema_registry)
+    assert full_event.table_schema.column_definitions[1].type_name == "timestamp with time zone"
+    assert full_event.after == events[2].after
+
+    serializer = JsonLinesSerializer(schema_registry=transformer.schema_registry)
+    serializer.use_orjson = use_orjson
+    lines = [json.loads(line) for line in serializer.encode(events).decode("utf-8").splitlines()]
+    # a schema record precedes the first event of each schema version
+    assert [line["type"] for line in lines] == ["schema", "change", "change", "schema", "change"]
+    assert lines[0]["version"] == 1
+    assert lines[0]["columns"][1]["type_name"] == "integer"
+    assert lines[1]["after"] == {"id": 1, "value": 1}
+    assert lines[1]["message_id"] == str(events[0].message_id)
+    assert lines[1]["commit_ts"] == "2022-01-01T00:00:00+00:00"
+    assert lines[4]["schema_version"] == 2
+    assert lines[4]["after"]["value"] == "2022-01-14T17:22:10.298334+00:00"
+
+    # schemas are written once per serializer, until reset
+    lines = [json.loads(line) for line in serializer.encode(events[:1]).decode("utf-8").splitlines()]
+    assert [line["type"] for line in lines] == ["change"]
+    serializer.reset()
+    lines = [json.loads(line) for line in serializer.encode(events[:1]).decode("utf-8").splitlines()]
+    assert [line["type"] for line in lines] == ["schema", "change"]
+
+
+WIDE_COLUMNS = [
+    # (name, type_id, type_name, text value, parsed value)
+    ("id", 23, "integer", b"7", 7),
+    ("amount", 1700, "numeric(10,2)", b"-10.20", Decimal("-10.20")),
+    ("ratio", 1700, "numeric", b"0.125", Decimal("0.125")),
+    ("created", 1184, "timestamp with time zone", b"2022-01-14 17:22:10.298334+00", None),
+    ("day", 1082, "date", b"2022-01-14", date(2022, 1, 14)),
+    ("tags", 1007, "integer[]", b"{1,NULL,3}", [1, None, 3]),
+    ("payload", 3802, "jsonb", b'{"a": [1, 2]}', {"a": [1, 2]}),
+    ("data", 17, "bytea", b"\\x0102", b"\x01\x02"),
+    ("location", 600, "point", b"(1,2)", "(1,2)"),
+    ("note", 25, "text", None, None),
+]
+
+
+def wide_events(
+    compact_events: bool = True, values: typing.Optional[typing.Dict[str, bytes]] = None
+) -> typing.Tuple[ChangeTransformer, typing.List[AnyChangeEvent]]:
+    table_schema = TableSchema(
+        column_definitions=[
+            ColumnDefinition(name=name, part_of_pkey=name == "id", type_id=type_id, type_name=type_name, optional=True)
+            for name, type_id, type_name, _, _ in WIDE_COLUMNS
+        ],
+        db="test-db",
+        schema_name="public",
+        table="wide",
+        relation_id=16390,
+    )
+    transformer = ChangeTransformer(compact_events=compact_events)
+    transformer.set_table_schema(table_schema)
+    values = values or dict()
+    payload = b"U\x00\x00@\x06K" + len(WIDE_COLUMNS).to_bytes(2, "big") + b"t\x00\x00\x00\x017" + b"n" * 9
+    payload += b"N" + len(WIDE_COLUMNS).to_bytes(2, "big")
+    for name, _, _, value, _ in WIDE_COLUMNS:
+        value = values.get(name, value)
+        payload += b"n" if value is None else b"t" + len(value).to_bytes(4, "big") + value
+    message = ReplicationMessage(
+        data_start=200,
+        payload=payload,
+        send_time=datetime.now(timezone.utc),
+        data_size=len(payload),
+        wal_end=200,
+    )
+    transaction = Transaction(tx_id=500, begin_lsn=150, commit_ts=datetime(2022, 1, 1, tzinfo=timezone.utc))
+    event = transformer.process_update(message=message, transaction=transaction)
+    assert event is not None
+    return transformer, [event]
+
+
+def test_msgpack_serializer() -> None:
+    msgpack = pytest.importorskip("msgpack")
+    transformer, events = wide_events()
+    serializer = MsgpackSerializer(schema_registry=transformer.schema_registry)
+    records = list(msgpack.Unpacker(io.BytesIO(serializer.encode(events)), raw=False))
+    assert [record["type"] for record in records] == ["schema", "change"]
+    assert records[0]["columns"][1]["type_name"] == "numeric(10,2)"
+    change = records[1]
+    assert change["op"] == "U"
+    assert change["before"] == {"id": 7}
+    assert change["after"]["amount"] == "-10.20"
+    assert change["after"]["data"] == b"\x01\x02"
+    assert change["after"]["tags"] == [1, None, 3]
+    assert change["after"]["created"] == "2022-01-14T17:22:10.298334+00:00"
+
+
+def test_avro_serializer() -> None:
+    fastavro = pytest.importorskip("fastavro")
+    transformer, events = wide_events()
+    serializer = AvroSerializer(schema_registry=transformer.schema_registry)
+    messages = serializer.encode(events)
+    assert len(messages) == 1
+    message = messages[0]
+
+    # single object encoding: marker, fingerprint of the schema, then the record
+    assert message[:2] == b"\xc3\x01"
+    fingerprint = int.from_bytes(message[2:10], "little")
+    schema = serializer.schemas[fingerprint]
+    parsed_schema = fastavro.parse_schema(schema)
+    canonical_form = fastavro.schema.to_parsing_canonical_form(parsed_schema)
+    assert avro_canonical_form(schema) == canonical_form
+    assert fingerprint == avro_fingerprint(canonical_form.encode("utf-8"))
+    # fastavro returns the little endian bytes written in the message as hex
+    assert message[2:10].hex() == fastavro.schema.fingerprint(canonical_form, "CRC-64-AVRO")
+
+    record = fastavro.schemaless_reader(io.BytesIO(message[10:]), parsed_schema)
+    assert record["op"] == "U"
+    assert record["message_id"] == events[0].message_id
+    assert (record["lsn"], record["tx_id"], record["begin_lsn"]) == (200, 500, 150)
+    assert record["commit_ts"] == datetime(2022, 1, 1, tzinfo=timezone.utc)
+    # key only before rows are null in the other columns
+    assert record["before"]["id"] == 7
+    assert record["before"]["amount"] is None
+    after = record["after"]
+    assert after["created"] == datetime(2022, 1, 14, 17, 22, 10, 298334, tzinfo=timezone.utc)
+    for name, _, _, _, parsed in WIDE_COLUMNS:
+        if name not in ("created", "ratio", "payload"):
+            assert after[name] == parsed
+    # numeric without precision and scale, and json, are strings
+    assert after["ratio"] == "0.125"
+    assert json.loads(after["payload"]) == {"a": [1, 2]}
+    assert "test_db.public.wide" == schema["namespace"] + "." + schema["name"]
+
+
+def test_avro_unrepresentable_values() -> None:
+    fastavro = pytest.importorskip("fastavro")
+    transformer, events = wide_events(values={"amount": b"NaN", "day": b"infinity", "tags": b"{{1,2},{3,4}}"})
+    after = events[0].after
+    assert after is not None
+    assert after["amount"].is_nan()
+    serializer = AvroSerializer(schema_registry=transformer.schema_registry)
+    message = serializer.encode(events)[0]
+    schema = fastavro.parse_schema(serializer.schemas[int.from_bytes(message[2:10], "little")])
+    record = fastavro.schemaless_reader(io.BytesIO(message[10:]), schema)
+    # values the Avro types can't represent are written as null, the other columns are kept
+    assert (record["after"]["amount"], record["after"]["day"], record["after"]["tags"]) == (None, None, None)
+    assert record["after"]["id"] == 7
+    assert record["after"]["data"] == b"\x01\x02"
+
+
+def test_serializers_change_events() -> None:
+    pytest.importorskip("msgpack")
+    pytest.importorskip("fastavro")
+    compact_transformer, compact_events = wide_events()
+    transformer, events = wide_events(compact_events=False)
+    assert isinstance(events[0], ChangeEvent)
+    # ChangeEvents are encoded like the equivalent CompactChangeEvents, with the schema versions of the serializer
+    for serializer_type in (JsonLinesSerializer, MsgpackSerializer):
+        compact_serializer = serializer_type(schema_registry=compact_transformer.schema_registry)
+        serializer = serializer_type(schema_registry=SchemaRegistry())
+        assert serializer.encode(events) == compact_serializer.encode(compact_events)
+        assert serializer.encode(events) == compact_serializer.encode(compact_events)
+    avro_serializer = AvroSerializer(schema_registry=SchemaRegistry())
+    compact_avro_serializer = AvroSerializer(schema_registry=compact_transformer.schema_registry)
+    assert avro_serializer.encode(events) == compact_avro_serializer.encode(compact_events)
+    assert avro_serializer.schemas == compact_avro_serializer.schemas
+
+    # anything else is rejected
+    with pytest.raises(TypeError, match="Expected a ChangeEvent or CompactChangeEvent, got dict"):
+        JsonLinesSerializer(schema_registry=SchemaRegistry()).encode([{"op": "I"}])  # type: ignore[list-item]
+    with pytest.raises(TypeError, match="got dict"):
+        avro_serializer.encode([{"op": "I"}])  # type: ignore[list-item]
+
+
+def test_json_lines_big_integers(use_orjson: bool) -> None:
+    transformer, events = wide_events(values={"payload": b'{"n": 1180591620717411303424}'})
+    after = events[0].after
+    assert after is not None and after["payload"] == {"n": 2**70}
+    serializer = JsonLinesSerializer(schema_registry=transformer.schema_registry)
+    serializer.use_orjson = use_orjson
+    # integers beyond 64 bits are not supported by orjson, the row is encoded by json
+    lines = [json.loads(line) for line in serializer.encode(events).decode("utf-8").splitlines()]
+    assert lines[1]["after"]["payload"] == {"n": 2**70}
+    assert lines[1]["after"]["amount"] == "-10.20"
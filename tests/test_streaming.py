@@ -0,0 +1,164 @@
+import pathlib
+import struct
+import typing
+
+import pytest
+
+from pypgoutput import ChangeEvent, ReplayReader, decoders
+from pypgoutput.capture import CaptureWriter
+from pypgoutput.streaming import StreamedTransaction
+from pypgoutput.synthetic import (
+    encode_begin,
+    encode_commit,
+    encode_insert,
+    encode_relation,
+    encode_truncate,
+)
+from pypgoutput.utils import CatalogColumn
+
+INSERT_TEMPLATE = b"I%s\x00\x00@\x01N\x00\x01t\x00\x00\x00\x02%s"
+
+
+def streamed_insert(subxid: int, value: int) -> bytes:
+    return INSERT_TEMPLATE % (struct.pack("!I", subxid), str(value).zfill(2).encode("utf-8"))
+
+
+def replayed_values(
+    streamed_transaction: StreamedTransaction,
+) -> typing.List[typing.Optional[typing.Union[str, bytes]]]:
+    return [decoders.Insert(message.payload).new_tuple.column_data[0].col_data for message in streamed_transaction]
+
+
+def stream_start(xid: int, first_segment: bool = True) -> bytes:
+    return b"S" + struct.pack("!Ib", xid, 1 if first_segment else 0)
+
+
+def stream_commit(xid: int, commit_lsn: int, end_lsn: int) -> bytes:
+    return b"c" + struct.pack("!Ibqqq", xid, 0, commit_lsn, end_lsn, 0)
+
+
+def write_capture(path: str, payloads: typing.List[bytes]) -> None:
+    columns = [CatalogColumn("id", 23, -1, "integer", False)]
+    writer = CaptureWriter(path=path)
+    writer.write_metadata(database="test_db", publication_name="test_pub", slot_name="test_slot", streaming=True)
+    for relation_id in (16385, 16386):
+        writer.write_catalog(relation_id=relation_id, columns=columns)
+    for lsn, payload in enumerate(payloads, start=100):
+        writer.write_message(lsn, lsn, 0, payload)
+    writer.close()
+
+
+@pytest.mark.parametrize("spill_threshold", [None, 100])
+def test_streamed_transaction(spill_threshold: typing.Optional[int]) -> None:
+    streamed_transaction = StreamedTransaction(xid=700, spill_threshold=spill_threshold)
+    for idx in range(10):
+        # changes 5 to 7 are made in a subtransaction
+        subxid = 701 if 5 <= idx <= 7 else 700
+        streamed_transaction.append(data_start=idx, payload=memoryview(streamed_insert(subxid, idx)), schema_version=1)
+    assert streamed_transaction.spilled is (spill_threshold is not None)
+
+    replayed = list(streamed_transaction)
+    assert [message.data_start for message in replayed] == list(range(10))
+    assert {message.schema_version for message in replayed} == {1}
+    assert replayed_values(streamed_transaction) == [str(idx).zfill(2) for idx in range(10)]
+
+    streamed_transaction.abort_subtransaction(701)
+    assert replayed_values(streamed_transaction) == ["00", "01", "02", "03", "04", "08", "09"]
+    streamed_transaction.close()
+    assert not streamed_transaction.spilled
+
+
+@pytest.mark.parametrize("spill_threshold", [None, 10])
+def test_stream_commit_schema_change(tmp_path: pathlib.Path, spill_threshold: typing.Optional[int]) -> None:
+    """Changes streamed before a Relation message are converted with the schema they were made with"""
+    path = str(tmp_path / "streamed.pgo")
+    v1 = [CatalogColumn("id", 23, -1, "integer", False), CatalogColumn("name", 25, -1, "text", True)]
+    # ALTER TABLE ... RENAME name TO title, ADD score integer in the middle of the transaction
+    v2 = [v1[0], CatalogColumn("title", 25, -1, "text", True), CatalogColumn("score", 23, -1, "integer", True)]
+    writer = CaptureWriter(path=path)
+    writer.write_metadata(database="test_db", publication_name="test_pub", slot_name="test_slot", streaming=True)
+    writer.write_catalog(relation_id=16385, columns=v1)
+    lsn = 100
+    for payload, catalog in [
+        (encode_relation(16385, "public", "t", [(c.name, c.type_id, -1, c.name == "id") for c in v1]), None),
+        (stream_start(900), None),
+        (encode_insert(16385, ["1", "x"], xid=900), None),
+        (encode_relation(16385, "public", "t", [(c.name, c.type_id, -1, c.name == "id") for c in v2], xid=900), v2),
+        (encode_insert(16385, ["2", "y", "5"], xid=900), None),
+        (b"E", None),
+        (stream_commit(900, commit_lsn=1000, end_lsn=1064), None),
+    ]:
+        if catalog is not None:
+            writer.write_catalog(relation_id=16385, columns=catalog)
+        writer.write_message(lsn, lsn, 0, payload)
+        lsn += 1
+    writer.close()
+
+    reader = ReplayReader(path=path, stream_spill_threshold=spill_threshold)
+    events = list(reader)
+    assert [event.after for event in events] == [{"id": 1, "name": "x"}, {"id": 2, "title": "y", "score": 5}]
+    assert [c.name for c in typing.cast(ChangeEvent, events[0]).table_schema.column_definitions] == ["id", "name"]
+
+    # the current schema is restored after the replay
+    reader = ReplayReader(path=path, compact_events=True)
+    events = list(reader)
+    assert [event.schema_version for event in events] == [1, 2]
+    assert reader.schema_registry.version(16385) == 2
+    assert [c.name for c in reader.table_schemas[16385].column_definitions] == ["id", "title", "score"]
+
+
+@pytest.mark.parametrize("spill_threshold", [None, 10])
+def test_stream_commit_filtered_ids(tmp_path: pathlib.Path, spill_threshold: typing.Optional[int]) -> None:
+    """Filtered changes of a streamed transaction take their ordinals, ids match those of a regular transaction"""
+    relations = [
+        encode_relation(16385, "public", "kept", [("id", 23, -1, True)]),
+        encode_relation(16386, "public", "skipped", [("id", 23, -1, True)]),
+    ]
+    streamed_path = str(tmp_path / "streamed.pgo")
+    write_capture(
+        streamed_path,
+        relations
+        + [
+            stream_start(900),
+            encode_insert(16386, ["1"], xid=900),
+            encode_insert(16385, ["2"], xid=900),
+            # a filtered change of an aborted subtransaction is not sent in a regular transaction
+            encode_insert(16386, ["3"], xid=901),
+            b"E",
+            b"A" + struct.pack("!II", 900, 901),
+            stream_start(900, first_segment=False),
+            encode_truncate([16386, 16385], xid=900),
+            encode_insert(16386, ["4"], xid=900),
+            encode_insert(16385, ["5"], xid=900),
+            b"E",
+            stream_commit(900, commit_lsn=1000, end_lsn=1064),
+        ],
+    )
+    regular_path = str(tmp_path / "regular.pgo")
+    commit_ts = decoders.convert_pg_ts(0)
+    write_capture(
+        regular_path,
+        relations
+        + [
+            encode_begin(final_lsn=1000, commit_ts=commit_ts, xid=900),
+            encode_insert(16386, ["1"]),
+            encode_insert(16385, ["2"]),
+            encode_truncate([16386, 16385]),
+            encode_insert(16386, ["4"]),
+            encode_insert(16385, ["5"]),
+            encode_commit(commit_lsn=1000, end_lsn=1064, commit_ts=commit_ts),
+        ],
+    )
+
+    def message_ids(path: str, **filters: typing.Any) -> typing.List[typing.Tuple[str, int]]:
+        reader = ReplayReader(path=path, stream_spill_threshold=spill_threshold, **filters)
+        return [(event.op, event.message_id.int & 0xFFFFFFFF) for event in reader]
+
+    for filters in ({}, {"exclude_tables": ["public.skipped"]}, {"ops": "I"}):
+        assert message_ids(streamed_path, **filters) == message_ids(regular_path, **filters)
+    # ordinals of the truncated relations and the inserts
+    assert message_ids(streamed_path, exclude_tables=["public.skipped"]) == [
+        ("I", 1),
+        ("T", 3),
+        ("I", 5),
+    ]
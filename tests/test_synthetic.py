@@ -0,0 +1,93 @@
+import pathlib
+from datetime import datetime, timezone
+
+from pypgoutput import ReplayReader, decoders
+from pypgoutput.capture import CaptureReader
+from pypgoutput.synthetic import (
+    UNCHANGED_TOAST,
+    SyntheticStream,
+    encode_begin,
+    encode_commit,
+    encode_delete,
+    encode_insert,
+    encode_relation,
+    encode_truncate,
+    encode_update,
+)
+from pypgoutput.transport import datetime_to_micros
+
+COMMIT_TS = datetime(2022, 1, 14, 17, 22, 10, 298334, tzinfo=timezone.utc)
+
+
+def test_encode_round_trip() -> None:
+    begin = decoders.Begin(encode_begin(final_lsn=100, commit_ts=COMMIT_TS, xid=7))
+    assert (begin.lsn, begin.commit_ts, begin.tx_xid) == (100, COMMIT_TS, 7)
+    commit = decoders.Commit(encode_commit(commit_lsn=100, end_lsn=164, commit_ts=COMMIT_TS))
+    assert (commit.lsn_commit, commit.lsn, commit.commit_ts) == (100, 164, COMMIT_TS)
+
+    relation = decoders.Relation(
+        encode_relation(16385, "public", "table", [("id", 23, -1, True), ("b", 25, -1, False)])
+    )
+    assert (relation.relation_id, relation.namespace, relation.relation_name) == (16385, "public", "table")
+    assert [(c.part_of_pkey, c.name, c.type_id) for c in relation.columns] == [(1, "id", 23), (0, "b", 25)]
+
+    insert = decoders.Insert(encode_insert(16385, ["1", None, b"\x01"]))
+    assert [(c.col_data_category, c.col_data) for c in insert.new_tuple.column_data] == [
+        ("t", "1"),
+        ("n", None),
+        ("b", b"\x01"),
+    ]
+    update = decoders.Update(encode_update(16385, ["1", UNCHANGED_TOAST], old_values=["1", "a"], key_only=False))
+    assert update.optional_tuple_identifier == "O"
+    assert [c.col_data_category for c in update.new_tuple.column_data] == ["t", "u"]
+    delete = decoders.Delete(encode_delete(16385, ["1", None], xid=9), streamed=True)
+    assert (delete.xid, delete.message_type, delete.old_tuple.column_data[0].col_data) == (9, "K", "1")
+    assert decoders.Truncate(encode_truncate([1, 2])).relation_ids == [1, 2]
+
+
+def test_synthetic_stream() -> None:
+    messages = list(SyntheticStream(n_columns=6, transaction_size=5, n_tables=2, seed=1).messages(n_transactions=3))
+    assert "".join(chr(m[0]) for m in messages) == "RR" + "BIIIIIC" * 3
+    # deterministic for a seed
+    assert messages == list(SyntheticStream(n_columns=6, transaction_size=5, n_tables=2, seed=1).messages(3))
+
+    stream = SyntheticStream(n_columns=6, null_ratio=1.0, ops={"U": 1}, seed=1)
+    update = decoders.Update(stream.change())
+    assert update.old_tuple is None
+    assert [c.col_data_category for c in update.new_tuple.column_data] == ["t"] + ["n"] * 5
+
+
+def test_synthetic_replay(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "synthetic.pgo")
+    stream = SyntheticStream(n_columns=6, transaction_size=10, ops={"I": 2, "U": 1, "D": 1}, seed=1)
+    stream.write_capture(path=path, n_transactions=4)
+    reader = ReplayReader(path=path)
+    events = list(reader)
+    reader.stop()
+    assert len(events) == 40
+    assert {event.op for event in events} == {"I", "U", "D"}
+    inserted = next(event for event in events if event.op == "I")
+    assert inserted.after is not None
+    assert list(inserted.after) == ["id", "column_1", "column_2", "column_3", "column_4", "column_5"]
+    assert isinstance(inserted.after["column_4"], datetime)
+
+
+def test_synthetic_capture(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "synthetic.pgo")
+    stream = SyntheticStream(n_columns=3, transaction_size=3, n_tables=2, seed=1)
+    stream.write_capture(path=path, n_transactions=2)
+    capture_reader = CaptureReader(path=path)
+    messages = [(msg.data_start, msg.wal_end, msg.send_time_micros, bytes(msg.payload)) for msg in capture_reader]
+    capture_reader.close()
+    assert "".join(chr(payload[0]) for _, _, _, payload in messages) == "RR" + "BIIIC" * 2
+    # each message has its own LSN, increasing through the stream
+    lsns = [data_start for data_start, _, _, _ in messages]
+    assert lsns == sorted(set(lsns))
+    assert all(wal_end == data_start for data_start, wal_end, _, _ in messages)
+    # Commit messages are at the commit LSN, after the changes of their transaction
+    commit = decoders.Commit(messages[6][3])
+    assert commit.lsn_commit == messages[6][0]
+    assert decoders.Begin(messages[2][3]).lsn == commit.lsn_commit
+    # sent at the commit time of their transaction, in Unix epoch microseconds
+    assert messages[6][2] == datetime_to_micros(commit.commit_ts)
+    assert messages[-1][2] == datetime_to_micros(stream.commit_ts)
@@ -0,0 +1,147 @@
+import multiprocessing
+import typing
+from datetime import datetime
+
+import pytest
+
+from pypgoutput.reader import ReplicationMessage
+from pypgoutput.transport import (
+    FRAME_HEADER,
+    SharedMemoryRing,
+    datetime_to_micros,
+    decode_frames,
+    encode_frame,
+    micros_to_datetime,
+)
+
+
+@pytest.fixture(scope="function")
+def ring() -> typing.Generator[SharedMemoryRing, None, None]:
+    _ring = SharedMemoryRing(size=256)
+    yield _ring
+    _ring.close()
+    _ring.unlink()
+
+
+def test_ring_read_write(ring: SharedMemoryRing) -> None:
+    assert ring.is_empty()
+    assert ring.read() is None
+    assert ring.try_write(data_start=1, wal_end=2, send_time_micros=3, payload=b"I\x00\x00@\x01")
+    assert ring.try_write(data_start=4, wal_end=5, send_time_micros=6, payload=b"C")
+    assert not ring.is_empty()
+
+    message = ring.read()
+    assert message is not None
+    assert (message.data_start, message.wal_end, message.send_time_micros) == (1, 2, 3)
+    assert bytes(message.payload) == b"I\x00\x00@\x01"
+    assert message.data_size == 5
+    # the space is only released once the next message is read
+    assert ring.tail() == 0
+
+    message = ring.read()
+    assert message is not None
+    assert message.data_start == 4
+    assert bytes(message.payload) == b"C"
+    assert ring.read() is None
+    assert ring.is_empty()
+
+
+def test_ring_wrap_and_backpressure(ring: SharedMemoryRing) -> None:
+    payload = bytes(range(60))
+    frame_size = FRAME_HEADER.size + len(payload)
+    written = 0
+    while ring.try_write(data_start=written, wal_end=0, send_time_micros=0, payload=payload):
+        written += 1
+    # the ring is full, nothing was written
+    assert written == 256 // frame_size
+    assert ring.head() == written * frame_size
+
+    # frames are read back in order across several wraps of the ring
+    next_read = 0
+    for _ in range(20):
+        message = ring.read()
+        assert message is not None
+        assert message.data_start == next_read
+        assert bytes(message.payload) == payload
+        next_read += 1
+        ring.release()
+        assert ring.try_write(data_start=written, wal_end=0, send_time_micros=0, payload=payload)
+        written += 1
+    assert ring.head() > ring.capacity * 2
+
+    with pytest.raises(ValueError):
+        ring.try_write(data_start=0, wal_end=0, send_time_micros=0, payload=bytes(200))
+
+
+def produce(ring_name: str, n_messages: int) -> None:
+    ring = SharedMemoryRing(name=ring_name)
+    for idx in range(n_messages):
+        payload = str(idx).encode("utf-8") * 10
+        while not ring.try_write(data_start=idx, wal_end=idx, send_time_micros=idx, payload=payload):
+            pass
+    ring.close()
+
+
+def test_ring_between_processes() -> None:
+    ring = SharedMemoryRing(size=4096)
+    n_messages = 2000
+    producer = multiprocessing.Process(target=produce, args=(ring.name, n_messages))
+    producer.start()
+    received = 0
+    while received < n_messages:
+        message = ring.read()
+        if message is None:
+            continue
+        assert message.data_start == received
+        assert bytes(message.payload) == str(received).encode("utf-8") * 10
+        del message
+        received += 1
+    ring.release()
+    producer.join(timeout=10)
+    assert producer.exitcode == 0
+    assert ring.is_empty()
+    ring.close()
+    ring.unlink()
+
+
+def test_send_time_round_trip() -> None:
+    send_time = datetime(2022, 1, 14, 17, 22, 10, 298334)
+    assert micros_to_datetime(datetime_to_micros(send_time)) == send_time
+
+
+def test_frames_round_trip() -> None:
+    send_time = datetime(2022, 1, 14, 17, 22, 10, 298334)
+    frames = [
+        encode_frame(data_start=1, wal_end=2, send_time_micros=datetime_to_micros(send_time), payload=b"B" * 20),
+        encode_frame(data_start=3, wal_end=4, send_time_micros=5, payload=b""),
+        encode_frame(data_start=6, wal_end=7, send_time_micros=8, payload=b"I\x00\x00@\x01"),
+    ]
+    assert len(frames[1]) == FRAME_HEADER.size
+    messages = decode_frames(b"".join(frames))
+    assert [(m.data_start, m.wal_end, bytes(m.payload)) for m in messages] == [
+        (1, 2, b"B" * 20),
+        (3, 4, b""),
+        (6, 7, b"I\x00\x00@\x01"),
+    ]
+    assert messages[0].send_time == send_time
+    assert decode_frames(b"") == []
+
+    # a validated debug view of a decoded message
+    view = ReplicationMessage.from_raw(messages[2])
+    assert (view.data_start, view.wal_end, view.payload, view.data_size) == (6, 7, b"I\x00\x00@\x01", 5)
+    assert view.send_time == micros_to_datetime(8)
+
+    with pytest.raises(ValueError, match="truncated frame at offset 28"):
+        decode_frames(frames[1] + frames[2][:-1])
+    with pytest.raises(ValueError, match="truncated frame at offset 0"):
+        decode_frames(frames[0][:10])
+
+
+def test_frames_through_pipe() -> None:
+    out_conn, in_conn = multiprocessing.Pipe(duplex=True)
+    in_conn.send_bytes(b"".join(encode_frame(idx, idx + 1, 0, b"I" * idx) for idx in range(100)))
+    messages = decode_frames(out_conn.recv_bytes())
+    assert [m.data_start for m in messages] == list(range(100))
+    assert all(m.data_size == m.data_start for m in messages)
+    out_conn.close()
+    in_conn.close()
@@ -92,3 +92,118 @@ def test_source_db_handler_column_type(
     result = handler.fetch_column_type(type_id=oid["oid"], atttypmod=-1)
     assert result == "timestamp with time zone"
     handler.close()
+
+
+def test_source_db_handler_relation_columns(
+    cursor: psycopg2.extras.DictCursor, table: typing.Callable[[None], None]
+) -> None:
+    cursor.execute("SELECT 'public.utils'::regclass::oid AS relation_id")
+    row = cursor.fetchone()
+    assert row is not None
+    relation_id = row["relation_id"]
+    handler = pypgoutput.SourceDBHandler(dsn=DSN)
+    result = handler.fetch_relation_columns(relation_id=relation_id)
+    assert [row["column_name"] for row in result] == ["c0", "c1", "c2"]
+    assert [row["data_type"] for row in result] == ["integer", "timestamp with time zone", "text"]
+    assert [row["attnotnull"] for row in result] == [True, False, True]
+    assert all(row["relation_id"] == relation_id for row in result)
+    handler.close()
+
+
+def test_catalog_cache(cursor: psycopg2.extras.DictCursor, table: typing.Callable[[None], None]) -> None:
+    cursor.execute(
+        "DROP PUBLICATION IF EXISTS utils_test_pub; CREATE PUBLICATION utils_test_pub FOR TABLE public.utils;"
+    )
+    cursor.execute("SELECT 'public.utils'::regclass::oid AS relation_id")
+    row = cursor.fetchone()
+    assert row is not None
+    relation_id = row["relation_id"]
+    handler = pypgoutput.SourceDBHandler(dsn=DSN)
+    cache = pypgoutput.CatalogCache(handler=handler)
+    cache.prefetch(publication_name="utils_test_pub")
+    assert list(cache.loaded[relation_id].keys()) == ["c0", "c1", "c2"]
+
+    columns = [("c0", 23, -1), ("c1", 1184, -1), ("c2", 25, -1)]
+    result = cache.get_columns(relation_id=relation_id, table_schema="public", table_name="utils", columns=columns)
+    assert [c.type_name for c in result] == ["integer", "timestamp with time zone", "text"]
+    assert [c.optional for c in result] == [False, True, False]
+    # served from the cache for the same columns
+    assert cache.get_columns(relation_id, "public", "utils", columns) is result
+
+    # a Relation message with differing columns loads the relation again
+    cursor.execute("ALTER TABLE public.utils ADD COLUMN c3 bigint")
+    columns.append(("c3", 20, -1))
+    result = cache.get_columns(relation_id=relation_id, table_schema="public", table_name="utils", columns=columns)
+    assert [c.type_name for c in result] == ["integer", "timestamp with time zone", "text", "bigint"]
+    assert result[3].optional is True
+    cursor.execute("ALTER TABLE public.utils DROP COLUMN c3; DROP PUBLICATION utils_test_pub;")
+    handler.close()
+
+
+class FakeHandler:
+    """Counts catalog queries, the catalog has one relation with columns id (int4) and name (text)"""
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.rows = [
+            {
+                "relation_id": 1,
+                "column_name": "id",
+                "type_id": 23,
+                "atttypmod": -1,
+                "data_type": "integer",
+                "attnotnull": True,
+            },
+            {
+                "relation_id": 1,
+                "column_name": "name",
+                "type_id": 25,
+                "atttypmod": -1,
+                "data_type": "text",
+                "attnotnull": False,
+            },
+        ]
+
+    def fetch_relation_columns(self, relation_id: int) -> typing.List[typing.Dict[str, typing.Any]]:
+        self.queries += 1
+        return [row for row in self.rows if row["relation_id"] == relation_id]
+
+    def fetch_publication_columns(self, publication_name: str) -> typing.List[typing.Dict[str, typing.Any]]:
+        self.queries += 1
+        return self.rows
+
+    def fetch_column_type(self, type_id: int, atttypmod: int) -> str:
+        self.queries += 1
+        return "bigint"
+
+    def fetch_if_column_is_optional(self, table_schema: str, table_name: str, column_name: str) -> bool:
+        self.queries += 1
+        raise pypgoutput.QueryError("column does not exist")
+
+
+def test_catalog_cache_queries() -> None:
+    handler = FakeHandler()
+    cache = pypgoutput.CatalogCache(handler=handler)  # type: ignore[arg-type]
+    columns = [("id", 23, -1), ("name", 25, -1)]
+    result = cache.get_columns(relation_id=1, table_schema="public", table_name="t", columns=columns)
+    assert [(c.name, c.type_name, c.optional) for c in result] == [("id", "integer", False), ("name", "text", True)]
+    assert handler.queries == 1
+    cache.get_columns(relation_id=1, table_schema="public", table_name="t", columns=columns)
+    assert handler.queries == 1
+
+    # prefetched relations need no query at all
+    handler = FakeHandler()
+    cache = pypgoutput.CatalogCache(handler=handler)  # type: ignore[arg-type]
+    cache.prefetch(publication_name="pub")
+    cache.get_columns(relation_id=1, table_schema="public", table_name="t", columns=columns)
+    assert handler.queries == 1
+
+    # a column missing from the catalog falls back to the values in the message
+    columns.append(("dropped", 20, -1))
+    result = cache.get_columns(relation_id=1, table_schema="public", table_name="t", columns=columns)
+    assert handler.queries == 1 + 1 + 2 * 3
+    assert [(c.name, c.type_name, c.optional) for c in result] == [
+        ("id", "bigint", True),
+        ("name", "bigint", True),
+        ("dropped", "bigint", True),
+    ]